@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures how the memory of the parse, transform and serialize stages scales with the
+input size, on the generated corpus of benchmarks/throughput.py.
+
+    python benchmarks/memory.py [--sizes 50,100,200,400] [--earley] [--top 5]
+
+Every size is profiled in this process, one after another, see src.memory.
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.memory import MemoryProfiler, format_report, profile_source
+from throughput import corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the memory of every stage per input size")
+    parser.add_argument("--sizes", default="50,100,200,400", help="Comma separated numbers of generated statements")
+    parser.add_argument("--earley", action="store_true", help="Parse with the Earley parser only, to measure its chart")
+    parser.add_argument("--top", type=int, default=5, help="The number of allocation sites reported per stage")
+    args = parser.parse_args()
+
+    with MemoryProfiler(top=args.top) as profiler:
+        for statements in (int(size) for size in args.sizes.split(",")):
+            profile_source(profiler, "\n".join(corpus(statements)), "{} statements".format(statements), args.earley)
+
+    print(format_report(profiler.records, args.top))
+
+
+if __name__ == '__main__':
+    main()
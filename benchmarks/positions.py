@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures how much --positions adds to parsing and transforming a source.
+
+    python benchmarks/positions.py [--interfaces 1000] [--members 3] [--runs 41]
+
+The source consists of documented interfaces with documented members. Every run
+transforms it once without and once with positions, directly after each other, and
+the median of the ratios of the paired runs is reported.
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.transformation import transform_declarations
+
+TYPES = ["number", "string[]", "Array<string>"]
+
+
+def source(interfaces, members):
+    return "\n".join("/** interface {} */\nexport interface I{} {{\n{}\n}}\n".format(
+        i, i, "\n".join("    /** member {} */\n    m{}: {};".format(j, j, TYPES[j % len(TYPES)]) for j in range(members)))
+        for i in range(interfaces))
+
+
+def measure(text, positions):
+    start = time.perf_counter()
+    transform_declarations(text, positions=positions)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the overhead of positions")
+    parser.add_argument("--interfaces", type=int, default=1000, help="The number of generated interfaces")
+    parser.add_argument("--members", type=int, default=3, help="The number of members of every interface")
+    parser.add_argument("--runs", type=int, default=41, help="The number of paired runs, the median is reported")
+    args = parser.parse_args()
+
+    text = source(args.interfaces, args.members)
+    measure(text, False)
+    measure(text, True)
+
+    ratios = []
+
+    for _ in range(args.runs):
+        without = measure(text, False)
+        ratios.append(measure(text, True) / without)
+
+    print("{} interfaces with {} members, {} runs".format(args.interfaces, args.members, args.runs))
+    print("with positions: {:.2f} times the time without (median), {:.2f} to {:.2f}".format(
+        statistics.median(ratios), min(ratios), max(ratios)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Parses adversarial inputs of growing size, fits how the parse time grows with the
+input size and flags every construct that grows faster than size^threshold.
+
+    python benchmarks/stress.py [--parser auto|lalr|earley] [--threshold 1.5] [construct ...]
+
+The exit code is 1 if any construct is flagged, see src.stress.
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.stress import CONSTRUCTS, PARSERS, run_stress
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures how the parse time of adversarial inputs grows with their size")
+    parser.add_argument("construct", nargs="*", help="The constructs to measure (default: all): " + ", ".join(sorted(CONSTRUCTS)))
+    parser.add_argument("--parser", choices=sorted(PARSERS), default="auto", help="auto: the parser chain used by transform (default), lalr or earley alone")
+    parser.add_argument("--threshold", type=float, default=1.5, help="Flag constructs whose fitted exponent is above (default: 1.5)")
+    parser.add_argument("--start", type=int, default=16, help="The size of the smallest input, e.g. the number of union members")
+    parser.add_argument("--steps", type=int, default=7, help="The number of input sizes")
+    parser.add_argument("--factor", type=int, default=2, help="The growth of the input size per step")
+    parser.add_argument("--repeat", type=int, default=3, help="Parses per size, the best one is used")
+    parser.add_argument("--max-seconds", type=float, default=5.0, help="Stop growing a construct once a parse takes longer")
+    args = parser.parse_args()
+
+    for construct in args.construct:
+        if construct not in CONSTRUCTS:
+            parser.error("Unknown construct {}".format(construct))
+
+    results = run_stress(args.construct, args.parser, args.threshold, start=args.start, steps=args.steps,
+                         factor=args.factor, repeat=args.repeat, max_seconds=args.max_seconds)
+
+    print("{:<18} {:>10} {:>10} {:>9}".format("construct", "max size", "seconds", "exponent"))
+
+    for result in results:
+        exponent = "-" if result["exponent"] is None else "{:.2f}".format(result["exponent"])
+        print("{:<18} {:>10} {:>10.4f} {:>9}{}{}".format(
+            result["construct"], result["sizes"][-1] if result["sizes"] else "-",
+            result["durations"][-1] if result["durations"] else 0.0, exponent,
+            "  FLAGGED" if result["flagged"] else "", "  " + result["error"] if result["error"] else ""))
+
+    flagged = [result["construct"] for result in results if result["flagged"]]
+
+    if flagged:
+        sys.stderr.write("Exponent above {} for {}\n".format(args.threshold, ", ".join(flagged)))
+
+    return 1 if flagged else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures the parser throughput on a generated corpus of typical declarations.
+
+    python benchmarks/throughput.py [--statements 2000] [--repeat 3]
+
+Every statement of the corpus is parsed with each of the parsers, the best of the
+repeats is reported in statements and kilobytes per second.
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import fastpath
+from src.parser import tsParser, tsLalrParser
+
+TYPES = ["string", "number", "boolean", "Date", "Message", "string[]", "Array<string>", "A | B", "{ a: number; b: string }"]
+
+
+def interface(rand, i):
+    members = "\n".join("    /** member {} */\n    {}{}: {};".format(j, "m" + str(j), rand.choice(["", "?"]), rand.choice(TYPES))
+                        for j in range(rand.randint(2, 8)))
+    return "/** interface {} */\nexport interface I{} {{\n{}\n}}".format(i, i, members)
+
+
+def function(rand, i):
+    params = ", ".join("p{}: {}".format(j, rand.choice(TYPES[:5])) for j in range(rand.randint(0, 4)))
+    body = "\n".join("    const v{} = call(p0, {{ key: {} }});".format(j, j) for j in range(rand.randint(1, 10)))
+    return "/** function {} */\nexport function f{}({}): {} {{\n{}\n}}".format(i, i, params, rand.choice(["void", "Promise<string>", "string[]"]), body)
+
+
+def namespace(rand, i):
+    return "export namespace N{} {{\n{}\n{}\n}}".format(i, interface(rand, i), function(rand, i))
+
+
+def import_stmt(rand, i):
+    return 'import {{ A{}, B{} }} from "./module{}";'.format(i, i, i)
+
+
+def corpus(statements, seed=1):
+    rand = random.Random(seed)
+    generators = [interface, function, namespace, import_stmt]
+    return [rand.choice(generators)(rand, i) for i in range(statements)]
+
+
+def measure(parse, texts, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for text in texts:
+            parse(text)
+
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the parser throughput")
+    parser.add_argument("--statements", type=int, default=2000, help="The number of generated statements")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    texts = corpus(args.statements)
+    size = sum(len(text) for text in texts) / 1024.0
+
+    parsers = [
+        ("earley (tsParser)", tsParser.parse),
+        ("lalr (tsLalrParser)", tsLalrParser.parse),
+        ("parse_statement", fastpath.parse_statement)
+    ]
+
+    print("{} statements, {:.0f} KB".format(len(texts), size))
+
+    for name, parse in parsers:
+        duration = measure(parse, texts, args.repeat)
+        print("{:<22} {:8.3f}s {:10.0f} statements/s {:8.0f} KB/s".format(name, duration, len(texts) / duration, size / duration))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Measures the compiled payload validators against walking the declarations.
+
+    python benchmarks/validators.py [--payloads 20000] [--repeat 5]
+
+Every payload is checked once by the generated predicate (Validators.is_valid) and
+once by the walker that validate() uses, the best of the repeats is reported in
+payloads per second together with the speed-up of the compiled validators.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.inheritance import InheritanceResolver
+from src.transformation import transform_declarations
+from src.validators import Validators, _Walker
+
+INTERFACES = """
+interface Envelope {
+    id: number;
+    sender: string | null;
+    sent?: Date;
+}
+
+interface Message extends Envelope {
+    kind: "request" | "response";
+    tags?: string[];
+    headers: Record<string, string>;
+    payload: { name: string; args: Array<string>; };
+    parts: Part[];
+}
+
+interface Part {
+    name: string;
+    size: number;
+    optional?: boolean;
+}
+"""
+
+
+def payload(i):
+    return {
+        "id": i,
+        "sender": None if i % 3 else "sender{}".format(i),
+        "kind": "request" if i % 2 else "response",
+        "tags": ["a", "b"],
+        "headers": {"content-type": "json"},
+        "payload": {"name": "call", "args": ["x", "y", "z"]},
+        "parts": [{"name": "p{}".format(j), "size": j} for j in range(i % 5)]
+    }
+
+
+def measure(check, payloads, repeat):
+    best = None
+
+    for _ in range(repeat):
+        start = time.perf_counter()
+
+        for value in payloads:
+            check(value)
+
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the compiled payload validators")
+    parser.add_argument("--payloads", type=int, default=20000, help="The number of generated payloads")
+    parser.add_argument("--repeat", type=int, default=5, help="The number of runs, the best one is reported")
+    args = parser.parse_args()
+
+    declarations = transform_declarations(INTERFACES)
+    validators = Validators(declarations)
+    walker = _Walker(InheritanceResolver(declarations))
+    payloads = [payload(i) for i in range(args.payloads)]
+
+    if not all(validators.is_valid("Message", value) for value in payloads):
+        raise SystemExit("The generated payloads do not match the interface")
+
+    compiled = measure(lambda value: validators.is_valid("Message", value), payloads, args.repeat)
+    walked = measure(lambda value: walker.interface("Message", value, "Message"), payloads, args.repeat)
+
+    print("{} payloads".format(len(payloads)))
+    print("{:<10} {:8.3f}s {:10.0f} payloads/s".format("compiled", compiled, len(payloads) / compiled))
+    print("{:<10} {:8.3f}s {:10.0f} payloads/s".format("walker", walked, len(payloads) / walked))
+    print("speed-up   {:.1f}x".format(walked / compiled))
+
+
+if __name__ == '__main__':
+    main()
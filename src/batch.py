@@ -0,0 +1,331 @@
+import io
+import os
+import time
+import hashlib
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+
+from src.limits import ChartGuard, ParseAborted, ParseTimeout, ChartLimitExceeded, time_limit, limit_memory
+from src.parser import tsParser
+from src.transformation import transform, transform_tolerant
+
+# Time the parent grants a worker on top of the timeout before it is killed. The
+# worker normally aborts itself when its own timer fires, the parent only steps in
+# if the worker does not respond at all (e.g. it is stuck outside of Python code).
+KILL_GRACE_PERIOD = 5.0
+
+
+def format_output(formatted_jsons):
+    """
+    Joins the JSON strings of the declarations of one file into a JSON array.
+    """
+    return "[\n" + ",\n".join(formatted_jsons) + "\n]\n"
+
+
+def process_file(path, timeout=None, max_chart_items=None, tolerant=False, positions=False, content=None):
+    """
+    Parses and transforms a single file within the configured limits.
+
+    Parameters:
+    path (str): The path of the typescript file.
+    timeout (float): Wall-clock limit in seconds, None for no limit.
+    max_chart_items (int): Maximum number of Earley items, None for no limit.
+    tolerant (bool): Skip declarations that can not be parsed instead of failing the file.
+    positions (bool): Add the spans of the declarations and members to the output.
+    content (str): The content of the file if it was already read, see read_source.
+
+    Returns:
+    dict: The result of the file. "status" is one of "ok", "timeout", "ambiguity",
+    "memory" or "error", "reason" describes the failure. "declarations" holds the
+    transformed declarations and "errors" the declarations skipped in tolerant mode.
+    """
+    result = {
+        "file": path,
+        "status": "ok",
+        "reason": None,
+        "declarations": [],
+        "errors": [],
+        "size": None,
+        "duration": None,
+        "chart_items": None
+    }
+    started = time.time()
+    guard = ChartGuard(tsParser, max_chart_items)
+
+    try:
+        if content is None:
+            with open(path, "r") as var:
+                content = var.read()
+
+        result["size"] = len(content)
+
+        with time_limit(timeout), guard:
+            if tolerant:
+                result["declarations"], result["errors"] = transform_tolerant(content, positions=positions)
+            else:
+                result["declarations"] = transform(content, positions=positions)
+    except ParseTimeout as e:
+        result["status"], result["reason"] = "timeout", str(e)
+    except ChartLimitExceeded as e:
+        result["status"], result["reason"] = "ambiguity", str(e)
+    except MemoryError:
+        result["status"], result["reason"] = "memory", "Exceeded the memory limit"
+    except Exception as e:
+        cause = getattr(e, "orig_exc", e)
+
+        if isinstance(cause, MemoryError):
+            result["status"], result["reason"] = "memory", "Exceeded the memory limit"
+        else:
+            result["status"], result["reason"] = "error", str(e).strip().split("\n")[0]
+
+    if result["status"] != "ok":
+        result["declarations"] = []
+
+    result["duration"] = time.time() - started
+    result["chart_items"] = guard.items
+    return result
+
+
+def _worker_main(conn, memory_limit, max_chart_items, tolerant, positions):
+    limit_memory(memory_limit)
+
+    while True:
+        task = conn.recv()
+
+        if task is None:
+            break
+
+        path, timeout, content = task
+
+        try:
+            result = process_file(path, timeout, max_chart_items, tolerant, positions, content)
+        except ParseAborted as e:
+            # the timer fired after the file was processed, but before it was disarmed
+            result = {"file": path, "status": "timeout", "reason": str(e), "declarations": [], "errors": []}
+
+        conn.send(result)
+
+
+class _Worker:
+    def __init__(self, memory_limit, max_chart_items, tolerant, positions):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_main,
+                                               args=(child_conn, memory_limit, max_chart_items, tolerant, positions),
+                                               daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.path = None
+        self.started = None
+
+    def assign(self, path, timeout, content=None):
+        self.path = path
+        self.started = time.time()
+        self.conn.send((path, timeout, content))
+
+    def release(self):
+        path, started = self.path, self.started
+        self.path = self.started = None
+        return path, started
+
+    def kill(self):
+        self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, EOFError):
+            pass
+        self.process.join()
+        self.conn.close()
+
+
+def _failure(path, status, reason, started):
+    return {
+        "file": path,
+        "status": status,
+        "reason": reason,
+        "declarations": [],
+        "errors": [],
+        "size": None,
+        "duration": time.time() - started,
+        "chart_items": None
+    }
+
+
+def iter_batch(paths, jobs=None, timeout=None, memory_limit=None, max_chart_items=None, tolerant=False, positions=False):
+    """
+    Processes files in worker processes and yields the result of every file as soon as it is done.
+
+    Every worker enforces the memory limit on itself and aborts a file once it runs
+    out of time or the Earley chart grows past max_chart_items. A worker that does not
+    come back within KILL_GRACE_PERIOD after the timeout, or that dies, is replaced by
+    a new one and the file is reported as failed. A single file can thus never stall
+    the whole batch.
+
+    Workers are only started as long as there are files left. If paths is a deque, it
+    is not copied, so that the caller can append files while consuming the results.
+
+    Parameters:
+    paths (list): The files to process.
+    jobs (int): Maximum number of worker processes, defaults to the number of CPUs.
+    timeout (float): Per-file wall-clock limit in seconds.
+    memory_limit (float): Per-worker memory limit in megabytes.
+    max_chart_items (int): Per-file limit of the Earley chart size.
+    tolerant (bool): Skip declarations that can not be parsed instead of failing the file.
+    positions (bool): Add the spans of the declarations and members to the output.
+
+    Returns:
+    generator: The results as returned by process_file, in order of completion.
+    """
+    pending = paths if isinstance(paths, deque) else deque(paths)
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    spawn = lambda: _Worker(memory_limit, max_chart_items, tolerant, positions)
+    workers = []
+
+    try:
+        while True:
+            for worker in workers:
+                if worker.path is None and pending:
+                    worker.assign(pending.popleft(), timeout)
+
+            while pending and len(workers) < jobs:
+                workers.append(spawn())
+                workers[-1].assign(pending.popleft(), timeout)
+
+            busy = [worker for worker in workers if worker.path is not None]
+
+            if not busy:
+                break
+
+            wait_for = None
+
+            if timeout:
+                deadline = min(worker.started for worker in busy) + timeout + KILL_GRACE_PERIOD
+                wait_for = max(0.0, deadline - time.time())
+
+            ready = wait([worker.conn for worker in busy], wait_for)
+
+            for index, worker in enumerate(workers):
+                if worker.path is None:
+                    continue
+
+                if worker.conn in ready:
+                    try:
+                        result = worker.conn.recv()
+                    except (EOFError, OSError):
+                        path, started = worker.release()
+                        worker.kill()
+                        workers[index] = spawn()
+                        yield _failure(path, "crashed", "Worker exited with code {}".format(worker.process.exitcode), started)
+                    else:
+                        worker.release()
+                        yield result
+                elif timeout and time.time() - worker.started > timeout + KILL_GRACE_PERIOD:
+                    path, started = worker.release()
+                    worker.kill()
+                    workers[index] = spawn()
+                    yield _failure(path, "timeout", "Worker did not respond within {}s and was killed".format(timeout), started)
+    finally:
+        for worker in workers:
+            if worker.path is None:
+                worker.stop()
+            else:
+                worker.kill()
+
+
+def read_source(path):
+    """
+    The read stage of a batch pipeline (see src.pipeline): reads a file ahead of its
+    parse, so that the worker processes do not wait for the disk.
+
+    Returns:
+    dict: The "file", its "content" and the "hash" of the bytes the content was
+    decoded from (see sqlite_store.file_hash), so that the manifest records the
+    version of the file that was parsed. The content is None if the file can not be
+    read, the worker then reports the error when it reads the file itself.
+    """
+    task = {"file": path, "content": None, "hash": None}
+
+    try:
+        with open(path, "rb") as var:
+            data = var.read()
+
+        task["hash"] = hashlib.sha256(data).hexdigest()
+        # decoded like open(path, "r"), with the default encoding and newlines
+        task["content"] = io.TextIOWrapper(io.BytesIO(data)).read()
+    except (OSError, ValueError):
+        pass
+
+    return task
+
+
+class ParseHandler:
+    """
+    The parse stage of a batch pipeline (see src.pipeline): every thread of the stage
+    sends the files read by read_source to its own worker process and waits for the
+    result, with the same limits as iter_batch.
+
+    The worker is started with the first file. If it does not come back within
+    KILL_GRACE_PERIOD after the timeout, or dies, it is killed, the file is reported as
+    failed and the next file is given to a new worker.
+
+    Example:
+    >>> pipeline.stage("read", read_source, workers=2)
+    >>> pipeline.stage("parse", make_handler=lambda: ParseHandler(timeout=10), workers=8)
+    """
+
+    def __init__(self, timeout=None, memory_limit=None, max_chart_items=None, tolerant=False, positions=False):
+        self.timeout = timeout
+        self.spawn = lambda: _Worker(memory_limit, max_chart_items, tolerant, positions)
+        self.worker = None
+
+    def __call__(self, task):
+        worker = self.worker = self.worker or self.spawn()
+        worker.assign(task["file"], self.timeout, task["content"])
+
+        if not worker.conn.poll(self.timeout + KILL_GRACE_PERIOD if self.timeout else None):
+            path, started = worker.release()
+            self._replace(worker)
+            return _failure(path, "timeout", "Worker did not respond within {}s and was killed".format(self.timeout), started)
+
+        try:
+            result = worker.conn.recv()
+        except (EOFError, OSError):
+            path, started = worker.release()
+            self._replace(worker)
+            return _failure(path, "crashed", "Worker exited with code {}".format(worker.process.exitcode), started)
+
+        worker.release()
+        return result
+
+    def _replace(self, worker):
+        worker.kill()
+
+        if self.worker is worker:
+            self.worker = None
+
+    def close(self):
+        worker, self.worker = self.worker, None
+
+        if worker is None:
+            return
+
+        if worker.path is None:
+            worker.stop()
+        else:
+            worker.kill()
+
+
+def run_batch(paths, jobs=None, timeout=None, memory_limit=None, max_chart_items=None, tolerant=False, positions=False):
+    """
+    Same as iter_batch, but returns the results in the order of the given paths.
+    """
+    results = {}
+
+    for result in iter_batch(paths, jobs, timeout, memory_limit, max_chart_items, tolerant, positions):
+        results[result["file"]] = result
+
+    return [results[path] for path in paths]
@@ -0,0 +1,126 @@
+from bisect import bisect_right
+
+from lark import Lark, Token, Tree
+
+from src.scanner import extract_comments
+
+# Rules that take the block comment directly preceding them as their description
+DESCRIBED = ("int", "enum", "ns_decl", "class_decl", "class_prop_decl", "method_decl", "attribute_decl",
+             "function_decl", "typedef")
+# Rules that contain code, their comments do not describe any declaration
+CODE = ("function_decl", "method_decl")
+_WHITESPACE = " \t\r\n"
+
+
+def _span(tree):
+    # keywords like "readonly" or "[]" are filtered from the tree, only the empty subtrees
+    # they turned into keep their positions, which propagate_positions skips
+    start, end = tree.meta.start_pos, tree.meta.end_pos
+    node = tree
+
+    while node.children and isinstance(node.children[0], Tree) and not node.children[0].meta.empty:
+        node = node.children[0]
+        start = min(start, node.meta.start_pos)
+
+    node = tree
+
+    while node.children and isinstance(node.children[-1], Tree) and not node.children[-1].meta.empty:
+        node = node.children[-1]
+        end = max(end, node.meta.end_pos)
+
+    return start, end
+
+
+def attach_comments(tree, text, comments):
+    """
+    Attaches the comments collected by extract_comments to the declarations of a parse
+    tree, as the grammar's optional comment rules did.
+
+    A block comment becomes the "comment" subtree of the declaration it directly
+    precedes, if several do, the last one is used. A line comment becomes the
+    "inline_comment" subtree of the member it directly follows. Comments within
+    function bodies and all others are dropped.
+
+    Parameters:
+    tree (Tree): The parse tree of the blanked text, built with propagate_positions.
+    text (str): The blanked text.
+    comments (list): The comments, see extract_comments.
+
+    Returns:
+    Tree: The tree itself.
+    """
+    if not comments:
+        return tree
+
+    starts = {}
+    ends = {}
+    code = []
+    stack = [tree]
+
+    while stack:
+        node = stack.pop()
+
+        if node.data in DESCRIBED and not node.meta.empty:
+            start, end = _span(node)
+            # the outermost declaration starting at a position is found first
+            starts.setdefault(start, node)
+
+            if node.data == "typedef":
+                ends[end] = node
+
+            if node.data in CODE:
+                code.append((start, end))
+
+        stack.extend(reversed([child for child in node.children if isinstance(child, Tree)]))
+
+    # functions do not nest, so their spans are disjoint
+    code.sort()
+    code_starts = [code_start for code_start, code_end in code]
+    descriptions = {}
+    inline_comments = {}
+
+    for kind, start, end, value in comments:
+        i = bisect_right(code_starts, start) - 1
+
+        if i >= 0 and start < code[i][1]:
+            continue
+
+        if kind == "comment":
+            pos = end
+
+            while pos < len(text) and text[pos] in _WHITESPACE:
+                pos += 1
+
+            if pos in starts:
+                descriptions[id(starts[pos])] = (starts[pos], value)
+        else:
+            pos = start
+
+            while pos > 0 and text[pos - 1] in _WHITESPACE:
+                pos -= 1
+
+            if pos in ends and id(ends[pos]) not in inline_comments:
+                inline_comments[id(ends[pos])] = (ends[pos], value)
+
+    for node, value in descriptions.values():
+        node.children.insert(0, Tree("comment", [Token("COMMENT", value)]))
+
+    for node, value in inline_comments.values():
+        node.children.append(Tree("inline_comment", [Token("INLINE_COMMENT", value)]))
+
+    return tree
+
+
+class CommentLark(Lark):
+    """
+    A Lark parser that collects comments into a side table instead of parsing them.
+
+    The comments are blanked out before parsing, so the grammar does not have to allow
+    an optional comment in front of every rule, which multiplies the states of the
+    Earley parser, and attached to the tree by position afterwards, see attach_comments.
+    The parser has to be built with propagate_positions=True.
+    """
+
+    def parse(self, text, start=None):
+        text, comments = extract_comments(text)
+        return attach_comments(super().parse(text, start), text, comments)
@@ -0,0 +1,411 @@
+import re
+
+from lark import Tree, Token
+from lark.exceptions import LarkError
+
+from src.parser import tsParser, tsLalrParser
+from src.positions import declaration_start
+from src.scanner import split_declarations
+
+_TOKEN = re.compile(r"""
+      (?P<ws>\s+)
+    | (?P<comment>/\*(?:.|\s)*?\*/)
+    | (?P<inline_comment>//.*\n)
+    | (?P<array>\[\](?![a-zA-Z0-9_."{}\[\]]))
+    | (?P<word>[a-zA-Z0-9_."]+)
+    | (?P<punct>[{}\[\]()<>:;,|?=])
+""", re.X)
+
+_CNAME = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*$")
+
+_KEYWORDS = {"export", "interface", "enum", "extends", "const", "readonly", "namespace", "class", "function", "import"}
+
+
+class Unsupported(Exception):
+    """
+    Raised by the fast path for any input outside of the subset it understands.
+    """
+
+
+def _tokenize(text):
+    tokens = []
+    pos = 0
+
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+
+        if match is None:
+            raise Unsupported("Unsupported character {!r}".format(text[pos]))
+
+        kind = match.lastgroup
+
+        if kind != "ws":
+            value = match.group()
+            tokens.append((value if kind == "punct" else kind, value, pos))
+
+        pos = match.end()
+
+    return tokens
+
+
+class _FastParser:
+    """
+    Recursive descent parser for plain interface and enum declarations.
+
+    It builds exactly the parse tree the Earley parser builds for the same input, so
+    that the tree can be handed to TsToJson unchanged. Whenever the input leaves the
+    supported subset, or an input could be resolved differently by the Earley parser,
+    Unsupported is raised.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.separator = None
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        return self.tokens[index][0] if index < len(self.tokens) else None
+
+    def next(self, kind=None):
+        if self.pos >= len(self.tokens):
+            raise Unsupported("Unexpected end of input")
+
+        token = self.tokens[self.pos]
+
+        if kind is not None and token[0] != kind:
+            raise Unsupported("Expected {} but found {!r}".format(kind, token[1]))
+
+        self.pos += 1
+        return token
+
+    def accept(self, kind):
+        if self.peek() == kind:
+            return self.next()
+        return None
+
+    def token(self, type_, token):
+        return Token(type_, token[1], token[2])
+
+    def keyword(self, value):
+        if self.peek() == "word" and self.tokens[self.pos][1] == value:
+            return self.next()
+        return None
+
+    def cname(self):
+        token = self.next("word")
+
+        if not _CNAME.match(token[1]) or token[1] in _KEYWORDS:
+            raise Unsupported("Unsupported name {!r}".format(token[1]))
+
+        return self.token("CNAME", token)
+
+    def asciistr(self):
+        return self.token("ASCIISTR", self.next("word"))
+
+    def comment(self):
+        token = self.accept("comment")
+        return Tree("comment", [self.token("COMMENT", token)]) if token else None
+
+    def declaration(self):
+        children = []
+        comment = self.comment()
+
+        if comment:
+            children.append(comment)
+
+        export = self.keyword("export")
+
+        if export:
+            children.append(self.token("EXPORT", export))
+
+        if self.keyword("interface"):
+            tree = self.interface(children)
+        elif self.keyword("enum"):
+            tree = self.enum(children)
+        else:
+            raise Unsupported("Not an interface or enum")
+
+        if self.pos != len(self.tokens):
+            raise Unsupported("Trailing input")
+
+        return tree
+
+    def interface(self, children):
+        children.append(self.token("INTERFACE", self.tokens[self.pos - 1]))
+        children.append(self.cname())
+
+        if self.keyword("extends"):
+            extends = [self.cname()]
+
+            while self.accept(","):
+                extends.append(self.cname())
+
+            children.append(Tree("extends", extends))
+
+        separator = self.next("{")[0]
+
+        while not self.accept("}"):
+            # "a: T, const b: U" is read by the Earley parser as an array literal "T, const"
+            if separator == "," and self.peek() == "word" and self.peek(1) not in (":", "?"):
+                raise Unsupported("Ambiguous attribute after comma")
+
+            # "a: T (b: U): V" is read as "a" with an empty type followed by the method "T"
+            if separator is None and self.peek() == "(":
+                raise Unsupported("Ambiguous anonymous function")
+
+            children.append(self.typedef())
+            separator = self.separator
+
+        return Tree("int", children)
+
+    def enum(self, children):
+        children.append(self.token("ENUM", self.tokens[self.pos - 1]))
+        children.append(self.cname())
+        self.next("{")
+
+        while not self.accept("}"):
+            children.append(self.asciistr())
+            self.next("=")
+            children.append(self.asciistr())
+            self.accept(",")
+
+        return Tree("enum", children)
+
+    def typedef(self):
+        children = []
+        comment = self.comment()
+
+        if comment:
+            children.append(comment)
+
+        if self.peek() == "word" and self.tokens[self.pos][1] in ("const", "readonly"):
+            if self.peek(1) not in ("word", "[", "("):
+                raise Unsupported("Keyword used as attribute name")
+
+            children.append(Tree("const" if self.next()[1] == "const" else "readonly", []))
+
+        children.append(self.identifier())
+
+        if self.accept("?"):
+            children.append(Tree("optional", []))
+
+        self.next(":")
+        children.append(self.tstype(member=True))
+
+        self.separator = self.accept(";") or self.accept(",")
+
+        if self.separator:
+            self.separator = self.separator[0]
+
+        inline_comment = self.accept("inline_comment")
+
+        if inline_comment:
+            children.append(Tree("inline_comment", [self.token("INLINE_COMMENT", inline_comment)]))
+
+        return Tree("typedef", children)
+
+    def identifier(self):
+        if self.accept("["):
+            children = [self.cname()]
+            self.next(":")
+            children.append(self.tstype())
+            self.next("]")
+            return Tree("identifier", children)
+
+        if self.peek() == "(":
+            return Tree("identifier", [self.function()])
+
+        name = self.cname()
+
+        if self.peek() == "(":
+            return Tree("identifier", [name, self.function()])
+
+        return Tree("identifier", [name])
+
+    def function(self):
+        self.next("(")
+        children = []
+
+        while True:
+            children.append(self.cname())
+            self.next(":")
+            children.append(self.tstype())
+
+            if not self.accept(","):
+                break
+
+        self.next(")")
+        return Tree("function", children)
+
+    def tstype(self, member=False):
+        kind = self.peek()
+
+        if kind == "|":
+            return Tree("tstype", [self.union_type()])
+
+        if kind == "{":
+            return Tree("tstype", [self.object_type(member)])
+
+        if kind != "word":
+            raise Unsupported("Unsupported type")
+
+        children = [self.asciistr()]
+        kind = self.peek()
+
+        if kind == "array":
+            children.append(self.token("ASCIISTROBJ", self.next()))
+        elif kind == "|":
+            children.append(self.union_type())
+        elif kind == "<":
+            children.append(self.generic_type())
+
+        if self.peek() in ("array", "|", "<", "word"):
+            raise Unsupported("Unsupported type")
+
+        return Tree("tstype", children)
+
+    def union_type(self):
+        children = []
+
+        while self.accept("|"):
+            children.append(self.asciistr())
+
+            if self.accept("array"):
+                children.append(Tree("isarray", []))
+
+        return Tree("union_type", children)
+
+    def generic_type(self):
+        self.next("<")
+        children = [self.tstype()]
+
+        while self.accept(","):
+            children.append(self.tstype())
+
+        self.next(">")
+        return Tree("generic_type", children)
+
+    def object_type(self, member=False):
+        brace = self.next("{")
+        properties = []
+
+        if self.peek() == "}":
+            raise Unsupported("Empty object type")
+
+        while True:
+            separator = None
+            name = self.asciistr()
+            self.next(":")
+            properties.append(Tree("object_property", [name, self.tstype()]))
+
+            if self.peek() not in (",", ";"):
+                break
+
+            separators = 0
+
+            while self.peek() in (",", ";"):
+                separator = self.next()[0]
+                separators += 1
+
+            if self.peek() == "}":
+                break
+
+            if separators > 1:
+                raise Unsupported("Several separators between properties")
+
+        self.next("}")
+
+        # A lone "{" is also an ASCIISTROBJ for the Earley parser, which can then read the
+        # properties as attributes of the interface, unless a ";" closes the last property.
+        if member and self.text[brace[2] + 1:brace[2] + 2].isspace() and separator != ";":
+            raise Unsupported("Ambiguous object type")
+
+        return Tree("object_type", [Tree("object_properties", properties)])
+
+
+def parse_declaration(text):
+    """
+    Parses a single top-level statement with the fast path.
+
+    Parameters:
+    text (str): The source of one top-level statement.
+
+    Returns:
+    Tree: The parse tree of the declaration as the Earley parser would build it.
+
+    Raises:
+    Unsupported: If the statement is not a plain interface or enum.
+    """
+    try:
+        return _FastParser(text).declaration()
+    except RecursionError:
+        # types nested too deeply for the recursive descent are left to the Earley parser
+        raise Unsupported("Nested too deeply")
+
+
+def parse_statement(text, earley=tsParser, lalr=tsLalrParser):
+    """
+    Parses a single top-level statement, with the fast path if possible, with
+    tsLalrParser if the statement is in its language and with tsParser otherwise.
+
+    Parameters:
+    text (str): The source of the statement.
+    earley, lalr (Lark): Other instances of tsParser and tsLalrParser, see ParserPool.
+
+    Returns:
+    list: The children of the start rule.
+    """
+    try:
+        return [parse_declaration(text)]
+    except Unsupported:
+        pass
+
+    try:
+        return lalr.parse(text).children
+    except LarkError:
+        return earley.parse(text).children
+
+
+def parse(text, earley=tsParser, lalr=tsLalrParser, spans=None):
+    """
+    Drop-in replacement for tsParser.parse.
+
+    The source is split into its top-level statements. Plain interfaces and enums are
+    parsed by the hand-written fast path, every other statement by tsLalrParser or
+    tsParser, see parse_statement. If any statement fails, the whole source is parsed
+    by tsParser, so that errors are reported exactly as before.
+
+    Parameters:
+    text (str): The typescript source.
+    earley, lalr (Lark): Other instances of tsParser and tsLalrParser, see ParserPool.
+    spans (list): If given, (offset, start, end) is appended for every child of the
+    tree: the offset the positions of its tokens are relative to and the span of the
+    declaration within text, without its description.
+
+    Returns:
+    Tree: The tree of the start rule.
+    """
+    children = []
+    found = []
+
+    try:
+        for start, end in split_declarations(text):
+            statement = parse_statement(text[start:end], earley, lalr)
+            children.extend(statement)
+
+            if spans is not None:
+                found.extend([(start, declaration_start(text, start), end)] * len(statement))
+    except LarkError:
+        tree = earley.parse(text)
+
+        if spans is not None:
+            spans.extend((0, child.meta.start_pos, child.meta.end_pos) for child in tree.children)
+
+        return tree
+
+    if spans is not None:
+        spans.extend(found)
+
+    return Tree("start", children)
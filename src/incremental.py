@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+
+from src.util import declaration_name, numbered_keys
+
+MANIFEST = ".ts_interface_parser.json"
+MANIFEST_VERSION = 1
+# The modules that determine the output of a source, see parser_version
+PARSER_MODULES = ("parser.py", "comments.py", "scanner.py", "fastpath.py", "transformation.py", "positions.py", "util.py")
+
+_parser_version = None
+
+
+def _hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def declaration_keys(declarations):
+    """
+    Returns a stable key for every declaration of a file: its name, numbered if the
+    name occurs more than once (e.g. imports, which have no name).
+    """
+    return numbered_keys(declaration_name(declaration) for declaration in declarations)
+
+
+def parser_version():
+    """
+    Returns a hash of the grammars and the code that transforms their trees, which
+    changes whenever an upgrade may change the output of an unchanged source.
+    """
+    global _parser_version
+
+    if _parser_version is None:
+        digest = hashlib.sha256()
+
+        for module in PARSER_MODULES:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), module), "rb") as var:
+                digest.update(var.read())
+
+        _parser_version = digest.hexdigest()
+
+    return _parser_version
+
+
+def output_key(options=None):
+    """
+    Returns the key of the outputs written by this version of the parser with the given
+    options that affect the output (e.g. tolerant or positions).
+    """
+    return _hash(json.dumps({"parser": parser_version(), "options": options or {}}, sort_keys=True))
+
+
+class OutputManifest:
+    """
+    Remembers the sources and declarations of the previous runs that wrote to an output directory.
+
+    For every source file the manifest keeps the hash of its content and the hash of
+    every declaration written for it. Sources that did not change are not parsed again,
+    and outputs are only rewritten if one of their declarations was added, changed or
+    removed, so that their modification time only changes along with their content.
+
+    Every source also records the key of the parser version and options it was written
+    with (see output_key), a source written with another key is processed again.
+    """
+
+    def __init__(self, output, name=MANIFEST, options=None):
+        self.path = os.path.join(output, name)
+        self.output = output
+        self.key = output_key(options)
+        self.files = {}
+
+        if os.path.isfile(self.path):
+            with open(self.path, "r") as var:
+                data = json.load(var)
+
+            if data.get("version") == MANIFEST_VERSION:
+                self.files = data["files"]
+
+    def is_current(self, source, source_hash, output):
+        """
+        Returns whether a source is unchanged since it was written to the same output,
+        by the same parser version with the same options.
+        """
+        entry = self.files.get(source)
+        return (entry is not None and entry["source_hash"] == source_hash and entry["output"] == output and
+                entry.get("key") == self.key)
+
+    def update(self, source, source_hash, output, formatted_jsons):
+        """
+        Records the declarations of a source.
+
+        Parameters:
+        source (str): The key of the source, e.g. its path relative to the input root.
+        source_hash (str): The hash of the content of the source.
+        output (str): The path of the output file, relative to the output directory.
+        formatted_jsons (list): The JSON strings of the declarations.
+
+        Returns:
+        dict: The keys of the "added", "changed" and "removed" declarations, whether
+        the output has to be "written" and the output the source was "moved_from" if it
+        was written to another one before, e.g. in another format.
+        """
+        previous = self.files.get(source, {})
+        before = previous.get("declarations", {})
+        keys = declaration_keys([json.loads(j) for j in formatted_jsons])
+        after = dict(zip(keys, (_hash(j) for j in formatted_jsons)))
+
+        delta = {
+            "added": [k for k in keys if k not in before],
+            "changed": [k for k in keys if k in before and before[k] != after[k]],
+            "removed": [k for k in before if k not in after]
+        }
+        delta["written"] = (bool(delta["added"] or delta["changed"] or delta["removed"]) or
+                            list(before) != keys or previous.get("output") != output)
+        delta["moved_from"] = previous["output"] if previous and previous["output"] != output else None
+
+        self.files[source] = {"source_hash": source_hash, "output": output, "key": self.key, "declarations": after}
+        return delta
+
+    def remove(self, source):
+        """
+        Forgets a source.
+
+        Returns:
+        list: The keys of its declarations.
+        """
+        entry = self.files.pop(source, None)
+        return [] if entry is None else list(entry["declarations"])
+
+    def save(self):
+        os.makedirs(self.output, exist_ok=True)
+
+        with open(self.path + ".tmp", "w") as var:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, var, indent=4, sort_keys=True)
+
+        os.replace(self.path + ".tmp", self.path)
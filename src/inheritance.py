@@ -0,0 +1,197 @@
+from src.util import iter_interfaces, interface_members
+
+
+class InheritanceCycle(Exception):
+    """
+    Raised if an interface (indirectly) extends itself.
+    """
+
+    def __init__(self, chain):
+        self.chain = chain
+        super().__init__("Cyclic inheritance: {}".format(" -> ".join(chain)))
+
+
+class InheritanceResolver:
+    """
+    Resolves the "extends" lists of transformed interfaces.
+
+    The resolver keeps a table of all interfaces of a project, which may be spread over
+    several files. The flattened members of an interface are computed once and reused
+    for every following lookup, until the interface or one of its (indirect) base
+    interfaces changes. Only those entries are invalidated then.
+
+    Example:
+    >>> resolver = InheritanceResolver()
+    >>> resolver.update_file("a.ts", transform_declarations(content))
+    >>> resolver.flattened("Message")
+    """
+
+    def __init__(self, declarations=None):
+        self.interfaces = {}
+        self.sources = {}
+        self.dependents = {}
+        self.cache = {}
+
+        if declarations:
+            self.update(declarations)
+
+    def __contains__(self, name):
+        return name in self.interfaces
+
+    def __iter__(self):
+        return iter(self.interfaces)
+
+    def __len__(self):
+        return len(self.interfaces)
+
+    def set_interface(self, name, body):
+        """
+        Adds or replaces an interface and invalidates everything that depends on it.
+        """
+        self.remove_interface(name)
+        self.interfaces[name] = body
+
+        for base in body.get("extends", []):
+            self.dependents.setdefault(base, set()).add(name)
+
+    def remove_interface(self, name):
+        self.invalidate(name)
+        body = self.interfaces.pop(name, None)
+
+        if body is None:
+            return
+
+        for base in body.get("extends", []):
+            dependents = self.dependents.get(base)
+
+            if dependents is not None:
+                dependents.discard(name)
+
+                if not dependents:
+                    del self.dependents[base]
+
+    def update(self, declarations):
+        """
+        Adds or replaces all interfaces of a list of transformed declarations.
+
+        Returns:
+        list: The names of the interfaces.
+        """
+        names = []
+
+        for name, body in iter_interfaces(declarations):
+            self.set_interface(name, body)
+            names.append(name)
+
+        return names
+
+    def update_file(self, source, declarations):
+        """
+        Replaces the interfaces of a file, interfaces no longer declared by it are removed.
+        """
+        names = self.update(declarations)
+
+        for name in self.sources.get(source, set()).difference(names):
+            self.remove_interface(name)
+
+        self.sources[source] = set(names)
+
+    def remove_file(self, source):
+        for name in self.sources.pop(source, set()):
+            self.remove_interface(name)
+
+    def invalidate(self, name):
+        """
+        Drops the cached members of an interface and of all interfaces that extend it.
+        """
+        pending = [name]
+        seen = set()
+
+        while pending:
+            current = pending.pop()
+
+            if current in seen:
+                continue
+
+            seen.add(current)
+            self.cache.pop(current, None)
+            pending.extend(self.dependents.get(current, ()))
+
+    def bases(self, name):
+        """
+        Returns the names of all (indirect) base interfaces of an interface, nearest first.
+        Base interfaces that are not part of the table are included, but not resolved.
+        """
+        result = []
+        pending = list(self.interfaces[name].get("extends", []))
+
+        while pending:
+            base = pending.pop(0)
+
+            if base in result or base == name:
+                continue
+
+            result.append(base)
+
+            if base in self.interfaces:
+                pending.extend(self.interfaces[base].get("extends", []))
+
+        return result
+
+    def flattened(self, name):
+        """
+        Returns the attributes of an interface including the inherited ones.
+
+        Attributes declared by an interface override inherited ones of the same name and
+        later base interfaces override earlier ones. Base interfaces that are not part
+        of the table (e.g. declared by a library) are skipped.
+
+        The returned dictionary is shared by all callers and must not be modified.
+
+        Raises:
+        KeyError: If the interface is unknown.
+        InheritanceCycle: If the interface extends itself.
+        """
+        members = self.cache.get(name)
+
+        if members is None:
+            members = self._resolve(name)
+
+        return members
+
+    def _resolve(self, name):
+        # depth first with an explicit stack instead of recursion, so that hierarchies of
+        # any depth are resolved, the chain of interfaces being resolved detects cycles
+        chain = [name]
+        on_chain = {name}
+        pending = [iter(self.interfaces[name].get("extends", []))]
+
+        while pending:
+            base = next(pending[-1], None)
+
+            if base is None:
+                pending.pop()
+                current = chain.pop()
+                on_chain.discard(current)
+                self.cache[current] = self._merge(current)
+            elif base in self.interfaces and base not in self.cache:
+                if base in on_chain:
+                    raise InheritanceCycle(chain[chain.index(base):] + [base])
+
+                chain.append(base)
+                on_chain.add(base)
+                pending.append(iter(self.interfaces[base].get("extends", [])))
+
+        return self.cache[name]
+
+    def _merge(self, name):
+        # the members of all base interfaces in the table are resolved already
+        body = self.interfaces[name]
+        members = {}
+
+        for base in body.get("extends", []):
+            if base in self.interfaces:
+                members.update(self.cache[base])
+
+        members.update(interface_members(body))
+        return members
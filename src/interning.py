@@ -0,0 +1,102 @@
+from lark import Token
+
+
+class InternTable:
+    """
+    Deduplicates identifier strings and type expressions across a whole run.
+
+    A single table is meant to be shared by every TsToJson instance of a run, so that
+    the same type names ("string", "number", "Promise", ...) and the same type lists
+    (["boolean[]"], ["string", "number"], ...) are stored only once, no matter how many
+    files and declarations they appear in. Additionally the table memoizes the result
+    of TsToJson.tstype keyed by the source text of the type expression.
+
+    The interned type lists are shared between all declarations that use them and
+    must therefore never be mutated by the caller.
+    """
+
+    def __init__(self):
+        self._strings = {}
+        self._types = {}
+        self._tstypes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._strings) + len(self._types)
+
+    def intern_string(self, value):
+        """
+        Returns the canonical instance of the given string.
+
+        Parameters:
+        value (str): A string or lark.Token.
+
+        Returns:
+        str: A plain string that is shared by all equal values interned before.
+        """
+        value = str(value)
+        return self._strings.setdefault(value, value)
+
+    def intern_type(self, type_list):
+        """
+        Returns the canonical instance of a type list as produced by TsToJson.tstype.
+
+        Lists that contain anything else than strings (e.g. conjunctions) are
+        returned unchanged.
+
+        Parameters:
+        type_list (list): The list of type names.
+
+        Returns:
+        list: A list that is shared by all equal type lists interned before.
+        """
+        if not all(type(x) == str for x in type_list):
+            return type_list
+
+        key = tuple(type_list)
+        canonical = self._types.get(key)
+
+        if canonical is None:
+            canonical = [self.intern_string(x) for x in type_list]
+            self._types[key] = canonical
+
+        return canonical
+
+    def tstype_key(self, elements):
+        """
+        Builds the memoization key of a tstype rule from its (already transformed) children.
+
+        Parameters:
+        elements (list): The children handed to TsToJson.tstype.
+
+        Returns:
+        tuple: The source text of the type expression split into its tokens, or None if
+        the expression contains nested structures that can not be memoized by text.
+        """
+        key = []
+
+        for element in elements:
+            if isinstance(element, Token):
+                key.append(str(element))
+            elif type(element) == list and all(type(x) == str for x in element):
+                key.append(tuple(element))
+            else:
+                return None
+
+        return tuple(key)
+
+    def lookup_tstype(self, key):
+        type_list = self._tstypes.get(key)
+
+        if type_list is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return type_list
+
+    def store_tstype(self, key, type_list):
+        type_list = self.intern_type(type_list)
+        self._tstypes[key] = type_list
+        return type_list
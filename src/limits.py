@@ -0,0 +1,106 @@
+import signal
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+class ParseAborted(BaseException):
+    """
+    Base class of the exceptions that abort a parse because a configured limit was hit.
+
+    They derive from BaseException so that neither Lark's transformer, which wraps
+    every Exception raised in a callback, nor handlers for parse errors (e.g. the
+    tolerant mode) swallow them.
+    """
+
+
+class ParseTimeout(ParseAborted):
+    pass
+
+
+class ChartLimitExceeded(ParseAborted):
+    pass
+
+
+class ChartGuard:
+    """
+    Aborts an Earley parse as soon as the chart grows past a threshold.
+
+    Ambiguous rules can make the number of Earley items explode long before the parse
+    finishes. The guard wraps the predictor/completer of the given Lark parser, counts
+    the items added to the chart at every position of the input and raises
+    ChartLimitExceeded once the total exceeds max_items.
+
+    Example:
+    >>> with ChartGuard(tsParser, 1000000) as guard:
+    ...     tsParser.parse(content)
+    >>> guard.items
+    """
+
+    def __init__(self, lark_parser, max_items):
+        self.earley = lark_parser.parser.parser
+        self.max_items = max_items
+        self.items = 0
+
+    def __enter__(self):
+        self.items = 0
+        original = type(self.earley).predict_and_complete
+
+        def predict_and_complete(i, to_scan, columns, transitives):
+            original(self.earley, i, to_scan, columns, transitives)
+            self.items += len(columns[i]) + len(to_scan)
+
+            if self.max_items is not None and self.items > self.max_items:
+                raise ChartLimitExceeded("Earley chart exceeded {} items at offset {}".format(self.max_items, i))
+
+        self.earley.predict_and_complete = predict_and_complete
+        return self
+
+    def __exit__(self, *exc):
+        del self.earley.predict_and_complete
+        return False
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Raises ParseTimeout in the current (main) thread once the wall-clock time is up.
+
+    Does nothing if seconds is None or the platform does not support interval timers.
+    """
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def on_alarm(signum, frame):
+        raise ParseTimeout("Exceeded the time limit of {}s".format(seconds))
+
+    previous = signal.signal(signal.SIGALRM, on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def limit_memory(megabytes):
+    """
+    Caps the address space of the current process, so that allocations beyond the
+    limit raise MemoryError. Does nothing if megabytes is None or the platform does
+    not support resource limits.
+    """
+    if not megabytes or resource is None:
+        return
+
+    limit = int(megabytes * 1024 * 1024)
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
@@ -0,0 +1,255 @@
+import gc
+import os
+import sys
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from lark import Tree
+
+from src import fastpath
+from src.parser import tsParser
+from src.transformation import TsToJson
+from src.util import format_json
+
+
+def current_rss():
+    """
+    Returns the resident set size of the process in bytes, None if the platform does not tell.
+    """
+    try:
+        with open("/proc/self/statm", "r") as var:
+            return int(var.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes, None if the platform does not tell.
+    """
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+class RssSampler:
+    """
+    Samples the resident set size of the process in a background thread.
+
+    tracemalloc only sees the allocations of Python, the RSS also covers the
+    interpreter, extension modules and the fragmentation of the allocator.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        rss = current_rss()
+
+        if rss is not None and (self.peak is None or rss > self.peak):
+            self.peak = rss
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return self.peak
+
+
+class MemoryProfiler:
+    """
+    Measures the memory used by the stages of a run with tracemalloc and RSS sampling.
+
+    Every stage is recorded with the size of its input, the "peak" memory allocated
+    while it ran, the memory it "retained" afterwards (both in bytes, relative to the
+    start of the stage), the peak RSS of the process and the source lines that
+    allocated most of the retained memory.
+
+    Example:
+    >>> with MemoryProfiler() as profiler:
+    ...     with profiler.stage("parse", len(content)):
+    ...         tree = tsParser.parse(content)
+    >>> print(format_report(profiler.records))
+    """
+
+    def __init__(self, top=10, frames=1, interval=0.005):
+        self.top = top
+        self.frames = frames
+        self.interval = interval
+        self.records = []
+        self._started = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+
+        return self
+
+    def __exit__(self, *exc):
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+        return False
+
+    def _sites(self, before):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, threading.__file__),
+            tracemalloc.Filter(False, __file__)
+        ])
+        sites = []
+
+        for stat in snapshot.compare_to(before, "lineno")[:self.top]:
+            if stat.size_diff <= 0:
+                continue
+
+            frame = stat.traceback[0]
+            sites.append({"site": "{}:{}".format(frame.filename, frame.lineno), "size": stat.size_diff, "count": stat.count_diff})
+
+        return sites
+
+    @contextmanager
+    def stage(self, name, size, source=None):
+        """
+        Records the memory of the code run within the context as one stage.
+
+        Parameters:
+        name (str): The name of the stage, e.g. "parse".
+        size (int): The size of the input of the stage, e.g. the length of the source.
+        source (str): The input, e.g. the path of the file.
+        """
+        gc.collect()
+        before = tracemalloc.take_snapshot() if self.top else None
+
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+
+        # before Python 3.9 the peak can not be reset and covers all earlier stages
+        start, _ = tracemalloc.get_traced_memory()
+        sampler = RssSampler(self.interval)
+        sampler.start()
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            sampler.stop()
+            _, peak = tracemalloc.get_traced_memory()
+            gc.collect()
+            current, _ = tracemalloc.get_traced_memory()
+
+            self.records.append({
+                "stage": name,
+                "source": source,
+                "size": size,
+                "duration": duration,
+                "peak": max(peak - start, 0),
+                "retained": current - start,
+                "rss_peak": sampler.peak,
+                "top": self._sites(before) if self.top else []
+            })
+
+
+def profile_source(profiler, content, source=None, earley=False):
+    """
+    Parses and transforms a source as transform_declarations does, with one stage of
+    the profiler for the parse, the transformation and the JSON serialization.
+
+    Parameters:
+    profiler (MemoryProfiler): The profiler recording the stages.
+    content (str): The typescript source.
+    source (str): The name of the source in the records, e.g. its path.
+    earley (bool): Parse with tsParser only instead of the fast path and the LALR parser.
+
+    Returns:
+    list: The transformed declarations.
+    """
+    size = len(content)
+
+    with profiler.stage("parse", size, source):
+        tree = tsParser.parse(content) if earley else fastpath.parse(content)
+
+    transformer = TsToJson()
+
+    with profiler.stage("transform", size, source):
+        declarations = [transformer.transform(child) for child in tree.children if isinstance(child, Tree)]
+
+    del tree
+
+    with profiler.stage("serialize", size, source):
+        formatted = [format_json(declaration) for declaration in declarations]
+
+    del formatted
+    return declarations
+
+
+def _kb(value):
+    return "-" if value is None else "{:.0f}".format(value / 1024.0)
+
+
+def format_report(records, top=5):
+    """
+    Formats the records of a profiler as a table, one row per stage and input, followed
+    by the peak memory per input byte of every stage and the largest allocation sites.
+    """
+    lines = ["{:<12} {:>10} {:>10} {:>12} {:>10} {:>10}  {}".format(
+        "stage", "input KB", "peak KB", "retained KB", "RSS MB", "seconds", "source")]
+
+    for record in sorted(records, key=lambda r: (r["size"], r["source"] or "")):
+        lines.append("{:<12} {:>10} {:>10} {:>12} {:>10} {:>10.3f}  {}".format(
+            record["stage"], _kb(record["size"]), _kb(record["peak"]), _kb(record["retained"]),
+            "-" if record["rss_peak"] is None else "{:.1f}".format(record["rss_peak"] / 1024.0 / 1024.0),
+            record["duration"], record["source"] or ""))
+
+    stages = []
+
+    for record in records:
+        if record["stage"] not in stages:
+            stages.append(record["stage"])
+
+    lines.append("")
+
+    for stage in stages:
+        selected = [r for r in records if r["stage"] == stage]
+        size = sum(r["size"] for r in selected)
+        ratio = sum(r["peak"] for r in selected) / float(size) if size else 0.0
+        sites = {}
+
+        for record in selected:
+            for site in record["top"]:
+                sites[site["site"]] = sites.get(site["site"], 0) + site["size"]
+
+        lines.append("{}: max peak {} KB, {:.1f} peak bytes per input byte".format(
+            stage, _kb(max(r["peak"] for r in selected)), ratio))
+
+        for site, site_size in sorted(sites.items(), key=lambda i: -i[1])[:top]:
+            lines.append("    {:>10} KB  {}".format(_kb(site_size), site))
+
+    rss = peak_rss()
+
+    if rss is not None:
+        lines.append("")
+        lines.append("peak RSS of the process: {:.1f} MB".format(rss / 1024.0 / 1024.0))
+
+    return "\n".join(lines)
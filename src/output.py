@@ -0,0 +1,417 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from src.batch import format_output
+
+ARCHIVE = "declarations.jsonl"
+INDEX_SUFFIX = ".idx"
+
+_UNSAFE = re.compile(r"[^\w.#-]")
+
+
+def _umask():
+    mask = os.umask(0o022)
+    os.umask(mask)
+    return mask
+
+
+# The mode of the outputs, as open() creates them. Determined once, since setting the
+# umask to read it is not safe while writer threads create files.
+FILE_MODE = 0o666 & ~_umask()
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def fsync_directory(directory):
+    """
+    Flushes the entries of a directory, e.g. files renamed into it, to disk. Does
+    nothing where directories can not be opened (Windows).
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, text, durable=False):
+    """
+    Writes a file by renaming a temporary file into place, so that readers never see a
+    partially written file. The file gets the mode open() would give it, not the
+    owner-only mode of the temporary file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+
+    try:
+        with os.fdopen(fd, "w") as var:
+            var.write(text)
+
+            if durable:
+                var.flush()
+                os.fsync(var.fileno())
+
+        os.chmod(tmp_path, FILE_MODE)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    if durable:
+        fsync_directory(directory)
+
+
+def _remove(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+class JsonOutput:
+    """
+    Writes the declarations of every source as one JSON array to <output>/<source>.json
+
+    Every file is renamed into place once it is written. If durable is set, it is
+    flushed to disk before.
+    """
+
+    # Whether several threads may write the outputs of different sources at once
+    parallel_writes = True
+
+    def __init__(self, output, durable=False):
+        self.output = output
+        self.durable = durable
+
+    def location(self, source):
+        return source + ".json"
+
+    def _remove_moved(self, delta):
+        # the output the source was written to before in another format, the archive of
+        # the jsonl format is shared by all sources and not removed
+        moved_from = delta and delta.get("moved_from")
+
+        if moved_from and not moved_from.endswith(".jsonl"):
+            _remove(os.path.join(self.output, moved_from))
+
+    def has(self, source, keys=None):
+        """
+        Returns whether the output of a source exists, with all of the declarations in
+        keys if they are given, e.g. the ones the manifest recorded for it.
+        """
+        return os.path.isfile(os.path.join(self.output, self.location(source)))
+
+    def write(self, source, formatted_jsons, keys, delta=None):
+        """
+        Writes the declarations of a source.
+
+        Parameters:
+        source (str): The path of the source relative to the input root.
+        formatted_jsons (list): The JSON strings of its declarations.
+        keys (list): The keys of the declarations, see declaration_keys.
+        delta (dict): The changes since the last run (see OutputManifest.update), None to
+        write everything. If "rewrite" is set, e.g. since the output was deleted, all
+        declarations are written as well.
+        """
+        self._remove_moved(delta)
+
+        if delta is None or delta["written"]:
+            write_atomic(os.path.join(self.output, self.location(source)), format_output(formatted_jsons), self.durable)
+
+    def keep(self, source):
+        """
+        Keeps the output of a source that did not change since the last run.
+        """
+
+    def remove(self, source):
+        _remove(os.path.join(self.output, self.location(source)))
+
+    def close(self):
+        pass
+
+    def abort(self):
+        """
+        Discards what was not written yet, e.g. after a failed batch. The outputs that
+        were renamed into place already are kept.
+        """
+
+
+class DeclarationOutput(JsonOutput):
+    """
+    Writes every declaration to its own file <output>/<source>/<key>.json
+
+    Files are written in batches: the content of a whole batch is written to temporary
+    files first, which are then renamed into place. If durable is set, every temporary
+    file is flushed to disk before the renames, and the directories after them. Only
+    the declarations that were added or changed since the last run are written, all of
+    them if the source was written in another format before or its output is incomplete.
+    """
+
+    parallel_writes = False
+
+    def __init__(self, output, durable=False, batch_size=512):
+        super().__init__(output, durable)
+        self.batch_size = batch_size
+        self.pending = []
+
+    def location(self, source):
+        return source
+
+    def has(self, source, keys=None):
+        return os.path.isdir(os.path.join(self.output, source)) and all(os.path.isfile(self.path(source, key)) for key in keys or [])
+
+    def path(self, source, key):
+        return os.path.join(self.output, source, _UNSAFE.sub("_", key) + ".json")
+
+    def write(self, source, formatted_jsons, keys, delta=None):
+        self._remove_moved(delta)
+
+        if delta is None or delta.get("moved_from") or delta.get("rewrite"):
+            _remove(os.path.join(self.output, source))
+            written = set(keys)
+        else:
+            written = set(delta["added"] + delta["changed"])
+
+            for key in delta["removed"]:
+                _remove(self.path(source, key))
+
+        for key, formatted_json in zip(keys, formatted_jsons):
+            if key in written:
+                self.pending.append((self.path(source, key), formatted_json + "\n"))
+
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        staged = []
+
+        try:
+            directories = set()
+
+            for path, text in self.pending:
+                directory = os.path.dirname(path)
+
+                if directory not in directories:
+                    os.makedirs(directory, exist_ok=True)
+                    directories.add(directory)
+
+                # a fixed temporary name is much cheaper than mkstemp, an output
+                # directory must not be written by two batches at once anyway
+                tmp_path = os.path.join(directory, "." + os.path.basename(path) + ".tmp")
+                staged.append((tmp_path, path))
+
+                with open(tmp_path, "w") as var:
+                    var.write(text)
+
+                    if self.durable:
+                        var.flush()
+                        os.fsync(var.fileno())
+
+            for tmp_path, path in staged:
+                os.replace(tmp_path, path)
+
+            if self.durable:
+                for directory in directories:
+                    fsync_directory(directory)
+        except BaseException:
+            for tmp_path, path in staged:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+
+        self.pending = []
+
+    def close(self):
+        self.flush()
+
+    def abort(self):
+        self.pending = []
+
+
+class JsonlOutput(JsonOutput):
+    """
+    Writes all declarations to a single JSON lines archive with a sidecar offset index.
+
+    Every line of the archive is a compact JSON object with the "source", the "key" and
+    the "declaration" itself. The index maps every source to the offsets and lengths of
+    its lines, see JsonlArchive. Archive and index are written to temporary files and
+    renamed into place on close. The lines of sources that did not change since the
+    last run are copied from the previous archive without decoding them.
+    """
+
+    parallel_writes = False
+
+    def __init__(self, output, durable=False, name=ARCHIVE):
+        super().__init__(output, durable)
+        self.name = name
+        self.path = os.path.join(output, name)
+        self.previous = None
+        self.entries = {}
+
+        if os.path.isfile(self.path + INDEX_SUFFIX):
+            try:
+                self.previous = JsonlArchive(self.path)
+            except (ArchiveError, OSError, ValueError):
+                # an archive that does not match its index is rewritten from scratch
+                pass
+
+        os.makedirs(output, exist_ok=True)
+        fd, self.tmp_path = tempfile.mkstemp(dir=output, prefix=".", suffix=".tmp")
+        os.chmod(self.tmp_path, FILE_MODE)
+        self.archive = os.fdopen(fd, "wb", buffering=1024 * 1024)
+
+    def location(self, source):
+        return self.name
+
+    def has(self, source, keys=None):
+        return self.previous is not None and source in self.previous and set(keys or []).issubset(self.previous.keys(source))
+
+    def _append(self, source, key, line):
+        offset = self.archive.tell()
+        self.archive.write(line)
+        self.entries.setdefault(source, []).append([key, offset, len(line)])
+
+    def write(self, source, formatted_jsons, keys, delta=None):
+        prefix = ', "key": {}, "source": {}}}\n'
+        source_json = json.dumps(source)
+
+        for key, formatted_json in zip(keys, formatted_jsons):
+            # JSON strings can not contain line breaks, so the lines of the indented JSON
+            # can be joined without decoding it
+            compact = "".join(line.strip() for line in formatted_json.split("\n"))
+            line = '{"declaration": ' + compact + prefix.format(json.dumps(key), source_json)
+            self._append(source, key, line.encode("utf-8"))
+
+    def keep(self, source):
+        for key, line in self.previous.raw(source):
+            self._append(source, key, line)
+
+    def remove(self, source):
+        pass
+
+    def close(self):
+        size = self.archive.tell()
+
+        if self.durable:
+            self.archive.flush()
+            os.fsync(self.archive.fileno())
+
+        self.archive.close()
+
+        if self.previous is not None:
+            self.previous.close()
+
+        index = {"archive_size": size, "sources": self.entries}
+        os.replace(self.tmp_path, self.path)
+        write_atomic(self.path + INDEX_SUFFIX, json.dumps(index, sort_keys=True), self.durable)
+
+    def abort(self):
+        self.archive.close()
+
+        if self.previous is not None:
+            self.previous.close()
+
+        _remove(self.tmp_path)
+
+
+class JsonlArchive:
+    """
+    Random access to the declarations of a JSON lines archive through its offset index.
+
+    Example:
+    >>> archive = JsonlArchive("out/declarations.jsonl")
+    >>> archive.get("src/messages.ts", "Message")
+    """
+
+    def __init__(self, path):
+        with open(path + INDEX_SUFFIX, "r") as var:
+            index = json.load(var)
+
+        self.file = open(path, "rb")
+        self.file.seek(0, os.SEEK_END)
+
+        if self.file.tell() != index["archive_size"]:
+            self.file.close()
+            raise ArchiveError("The index of {} does not match the archive".format(path))
+
+        self.sources = index["sources"]
+        self.offsets = {(source, key): (offset, length)
+                        for source, entries in self.sources.items() for key, offset, length in entries}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __contains__(self, source):
+        return source in self.sources
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def close(self):
+        self.file.close()
+
+    def keys(self, source):
+        return [key for key, offset, length in self.sources[source]]
+
+    def _read(self, offset, length):
+        self.file.seek(offset)
+        return self.file.read(length)
+
+    def raw(self, source):
+        """
+        Returns (key, line) of every declaration of a source, the lines are not decoded.
+        """
+        return [(key, self._read(offset, length)) for key, offset, length in self.sources.get(source, [])]
+
+    def get(self, source, key):
+        """
+        Returns a single declaration.
+
+        Raises:
+        KeyError: If the archive does not contain the declaration.
+        """
+        offset, length = self.offsets[(source, key)]
+        return json.loads(self._read(offset, length).decode("utf-8"))["declaration"]
+
+    def declarations(self, source):
+        return [json.loads(line.decode("utf-8"))["declaration"] for key, line in self.raw(source)]
+
+
+def merge_archives(output, paths, name=ARCHIVE):
+    """
+    Combines several archives, e.g. those of the shards of a batch, into output/name.
+    """
+    writer = JsonlOutput(output, name=name)
+
+    try:
+        for path in paths:
+            with JsonlArchive(path) as archive:
+                for source in archive.sources:
+                    for key, line in archive.raw(source):
+                        writer._append(source, key, line)
+
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+
+FORMATS = {
+    "json": JsonOutput,
+    "declarations": DeclarationOutput,
+    "jsonl": JsonlOutput
+}
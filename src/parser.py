@@ -1,27 +1,32 @@
 from lark import Lark
 
-tsParser = Lark(r"""
+from src.comments import CommentLark
+
+# Comments are not part of the grammar, an optional comment in front of every rule
+# multiplies the states of the Earley parser. CommentLark collects them before parsing
+# and attaches them to the declarations afterwards.
+TS_GRAMMAR = r"""
     start: (import_stmt | function_decl | int | enum | ns_decl | class_decl)*
 
-    int: comment? EXPORT? INTERFACE CNAME extends? "{" typedef* "}"
+    int: EXPORT? INTERFACE CNAME extends? "{" typedef* "}"
     
-    enum: comment? EXPORT? ENUM CNAME "{" (ASCIISTR "=" ASCIISTR ","?)* "}"
+    enum: EXPORT? ENUM CNAME "{" (ASCIISTR "=" ASCIISTR ","?)* "}"
     
-    ns_decl: comment? EXPORT? NS CNAME "{" (function_decl | int | enum | class_decl)* "}"
-    class_decl: comment? EXPORT? CLASS CNAME "{" class_prop_decl* "}"
+    ns_decl: EXPORT? NS CNAME "{" (function_decl | int | enum | class_decl)* "}"
+    class_decl: EXPORT? CLASS CNAME "{" class_prop_decl* "}"
     
-    class_prop_decl: comment? visibility? STATIC? (method_decl | attribute_decl)*
-    method_decl: comment? visibility? ASYNC? CNAME "(" params? ")" return_type? "{" _function_body "}"
-    attribute_decl: comment? visibility? CNAME (":" tstype)? "="? ASCIISTR? ("(" ")")? ";"? 
+    class_prop_decl: visibility? STATIC? (method_decl | attribute_decl)*
+    method_decl: visibility? ASYNC? CNAME "(" params? ")" return_type? "{" _function_body "}"
+    attribute_decl: visibility? CNAME (":" tstype)? "="? ASCIISTR? ("(" ")")? ";"? 
 
-    function_decl: comment? EXPORT? ASYNC? "function" CNAME "(" params? ")" return_type? "{" _function_body "}"
+    function_decl: EXPORT? ASYNC? "function" CNAME "(" params? ")" return_type? "{" _function_body "}"
     params: param ("," param)*
     param: CNAME ("?")? (":" tstype)? ["=" ASCIISTROBJ]
 
     return_type: ":" (ASCIISTR generic_type? | array_type | union_type | object_type | generic_type | array_literal)*
     generic_type: "<" tstype ("," tstype)* ">"
     tstype: ASCIISTR? (ASCIISTROBJ | union_type | array_literal | object_type | generic_type)?
-    union_type: "|" (ASCIISTR union_type)? isarray? ASCIISTR?
+    union_type: ("|" ASCIISTR isarray?)+
 
     object_type: "{" object_properties "}"
     object_properties: (object_property ((","|";") object_property)* (","|";")*)?
@@ -30,7 +35,7 @@ tsParser = Lark(r"""
     array_type: ASCIISTR "[]" | array_type "[]"
     array_literal: (ASCIISTROBJ ("," ASCIISTROBJ)*)?
 
-    typedef : comment? prefix? identifier optional? ":" tstype (";" | ",")? inline_comment?
+    typedef : prefix? identifier optional? ":" tstype (";" | ",")?
 
     identifier : CNAME function?
             | "[" CNAME ":" tstype "]"
@@ -49,10 +54,6 @@ tsParser = Lark(r"""
 
     optional : "?"
 
-    comment: /\/\*((.|\s)*?)\*\//
-
-    inline_comment: /\/\/.*\n/
-
     isarray : "[]"
 
     conjunction : "(" CNAME ( "&" CNAME)* ")"
@@ -90,4 +91,117 @@ tsParser = Lark(r"""
     %import common._STRING_ESC_INNER
     %ignore WS
     %ignore NEWLINE
-    """, start='start')
\ No newline at end of file
+    """
+TS_OPTIONS = {"start": "start", "propagate_positions": True}
+
+# The same language as tsParser, for the LALR parser with the contextual lexer.
+#
+# The contextual lexer only tries the terminals the parser accepts in its current state,
+# so terminals may overlap as long as they never compete within one state: CNAME names
+# declarations, members and parameters, ASCIISTR types and enum values, and the two never
+# occur in the same state. ASCIISTROBJ is only used for parameter defaults, array
+# suffixes of types have their own terminal. Keywords have the priority of CNAME, so an
+# identifier like "constant" is lexed as a whole and only an exact match is retyped to
+# the keyword. Rule and token names match tsParser and the transformed output is the
+# same. Unlike tsParser, the grammar parses comments itself: this costs the deterministic
+# parser nothing, while the positions needed to attach them afterwards would. Inputs
+# that need Earley's ambiguity, e.g. classes or untyped members, are not accepted and
+# have to be parsed by tsParser.
+LALR_GRAMMAR = r"""
+    start: (import_stmt | function_decl | int | enum | ns_decl)*
+
+    int: comment? EXPORT? INTERFACE CNAME extends? "{" typedef* "}"
+
+    enum: comment? EXPORT? ENUM CNAME "{" (ASCIISTR "=" ASCIISTR ","?)* "}"
+
+    ns_decl: comment? EXPORT? NS CNAME "{" (function_decl | int | enum)* "}"
+
+    function_decl: comment? EXPORT? ASYNC? "function" CNAME "(" params? ")" return_type? "{" _function_body "}"
+    params: param ("," param)*
+    param: CNAME "?"? (":" tstype)? ("=" ASCIISTROBJ)?
+
+    // tsParser splits a union of more than two types ambiguously, those are left to it
+    return_type: ":" object_type
+               | ":" _return_item+ return_union?
+               | ":" return_union
+    _return_item: ASCIISTR | array_type | generic_type
+    return_union: "|" ASCIISTR isarray? -> union_type
+
+    generic_type: "<" tstype ("," tstype)* ">"
+    tstype: ASCIISTR (ARRAY | union_type | generic_type)?
+          | union_type
+          | object_type
+          | generic_type
+    union_type: ("|" ASCIISTR isarray?)+
+
+    object_type: "{" object_properties "}"
+    object_properties: object_property ((","|";") object_property)* (","|";")*
+    object_property: ASCIISTR ":" tstype
+
+    array_type: ASCIISTR "[]" | array_type "[]"
+
+    typedef : comment? prefix? identifier optional? ":" tstype (";" | ",")? inline_comment?
+
+    identifier : CNAME function?
+            | "[" CNAME ":" tstype "]"
+            | function
+
+    function : "(" CNAME ":" tstype ("," CNAME ":" tstype)* ")"
+
+    prefix : "const" -> const
+            | "readonly" -> readonly
+
+    extends : "extends" CNAME ("," CNAME)*
+
+    optional : "?"
+
+    comment: /\/\*((.|\s)*?)\*\//
+
+    inline_comment: /\/\/.*\n/
+
+    isarray : "[]"
+
+    NS: "namespace"
+    ENUM: "enum"
+    INTERFACE: "interface"
+    EXPORT: "export"
+    ASYNC: "async"
+
+    import_stmt: IMPORT (import_items) FROM ESCAPED_STRING ";"
+    import_items: ("*" AS CNAME) | ("{" import_item ("," import_item)* "}")
+    import_item: CNAME
+
+    IMPORT: "import"
+    AS: "as"
+    FROM: "from"
+
+    ASCIISTR: /[a-zA-Z0-9_.\"]+/
+    ASCIISTROBJ: /[a-zA-Z0-9_.{}\[\]\"]+/
+    // "[]" directly followed by more of an ASCIISTROBJ is left to tsParser
+    ARRAY.2: /(\[\])+(?![a-zA-Z0-9_.{}\[\]\"])/
+
+    _function_body : balanced_braces
+
+    balanced_braces: (inner_code | "{" balanced_braces "}")*
+    inner_code: /[^{}]+/
+
+    %import common.CNAME
+    %import common.WS
+    %import common.NEWLINE
+    %import common.ESCAPED_STRING
+    %ignore WS
+    %ignore NEWLINE
+    """
+LALR_OPTIONS = {"start": "start", "parser": "lalr", "lexer": "contextual"}
+
+
+def build_ts_parser():
+    return CommentLark(TS_GRAMMAR, **TS_OPTIONS)
+
+
+def build_lalr_parser():
+    return Lark(LALR_GRAMMAR, **LALR_OPTIONS)
+
+
+tsParser = build_ts_parser()
+tsLalrParser = build_lalr_parser()
@@ -0,0 +1,238 @@
+import queue
+import threading
+import time
+
+# Seconds between the checks of a blocked thread whether the pipeline was closed
+_POLL_INTERVAL = 0.1
+_DONE = object()
+
+
+class _Raised:
+    def __init__(self, exception):
+        self.exception = exception
+
+
+class _Stage:
+    def __init__(self, name, function, workers, make_handler):
+        self.name = name
+        self.function = function
+        self.workers = max(1, workers)
+        self.make_handler = make_handler
+        self.running = 0
+        self.items = 0
+        self.busy = 0.0
+
+
+class Pipeline:
+    """
+    Runs items through a chain of stages, every stage in its own threads, connected by
+    bounded queues.
+
+    Every stage takes the items in the order the previous stage put them, so that
+    reading the next files, waiting for the worker processes that parse them and
+    writing the outputs of the previous ones overlap. A stage that falls behind fills
+    its input queue, which then blocks the stage in front of it and in turn the
+    source of the items: at most capacity items wait in front of every stage, however
+    fast the others are, and the throughput is that of the slowest stage. The stages
+    are scaled independently by their number of threads. Threads hold the GIL while
+    they run Python code, so the stages are meant for I/O and for waiting on other
+    processes, CPU-bound work belongs into worker processes.
+
+    Example:
+    >>> pipeline = Pipeline(capacity=8)
+    >>> pipeline.stage("read", read, workers=2)
+    >>> pipeline.stage("parse", make_handler=lambda: ParseHandler(...), workers=8)
+    >>> pipeline.stage("write", write, workers=2)
+    >>> for result in pipeline.run(paths):
+    >>>     ...
+    >>> sys.stderr.write(pipeline.format_utilization() + "\\n")
+
+    Parameters:
+    capacity (int): The maximum number of items in every queue.
+    """
+
+    def __init__(self, capacity=16):
+        self.capacity = max(1, capacity)
+        self.stages = []
+        self.wall = None
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+        self._handlers = []
+        self._open = set()
+
+    def stage(self, name, function=None, workers=1, make_handler=None):
+        """
+        Appends a stage. Its function is called with every item and returns the item
+        passed on to the next stage. If the function raises, the exception is raised
+        by run, once the items in front of it are consumed.
+
+        Parameters:
+        name (str): The name of the stage in the utilization report.
+        function (callable): The function of the stage.
+        workers (int): The number of threads of the stage.
+        make_handler (callable): Instead of function, creates the function of every
+        thread, e.g. to give every thread its own worker process. If the function has
+        a close method, it is called once the thread is done or the pipeline closed.
+
+        Returns:
+        Pipeline: The pipeline itself.
+        """
+        self.stages.append(_Stage(name, function, workers, make_handler))
+        return self
+
+    def _put(self, target, item):
+        while not self._closed.is_set():
+            try:
+                target.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+
+        return False
+
+    def _get(self, source):
+        while not self._closed.is_set():
+            try:
+                return source.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+
+        return _DONE
+
+    def _close(self, handler):
+        # a handler is closed by its thread, or by run if the pipeline is closed early
+        with self._lock:
+            if id(handler) not in self._open:
+                return
+
+            self._open.discard(id(handler))
+
+        if hasattr(handler, "close"):
+            handler.close()
+
+    def _feed(self, items, target):
+        try:
+            for item in items:
+                if not self._put(target, item):
+                    return
+        except Exception as e:
+            self._put(target, _Raised(e))
+
+        for _ in range(self.stages[0].workers):
+            self._put(target, _DONE)
+
+    def _work(self, stage, handler, source, target, successors):
+        try:
+            while True:
+                item = self._get(source)
+
+                if item is _DONE:
+                    break
+
+                if not isinstance(item, _Raised):
+                    started = time.time()
+
+                    try:
+                        item = handler(item)
+                    except Exception as e:
+                        item = _Raised(e)
+
+                    with self._lock:
+                        stage.busy += time.time() - started
+                        stage.items += 1
+
+                if not self._put(target, item):
+                    break
+        finally:
+            self._close(handler)
+
+            with self._lock:
+                stage.running -= 1
+                last = stage.running == 0
+
+            if last:
+                for _ in range(successors):
+                    self._put(target, _DONE)
+
+    def run(self, items):
+        """
+        Runs the items through the stages.
+
+        Closing the generator before it is exhausted stops all stages, items still in
+        the pipeline are dropped.
+
+        Parameters:
+        items (iterable): The items, only taken from as fast as the first stage accepts them.
+
+        Returns:
+        generator: The results of the last stage, in order of completion.
+        """
+        queues = [queue.Queue(self.capacity) for _ in range(len(self.stages) + 1)]
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+        self._closed.clear()
+        self._handlers = []
+        started = time.time()
+
+        for i, stage in enumerate(self.stages):
+            stage.running, stage.items, stage.busy = stage.workers, 0, 0.0
+            successors = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+
+            for _ in range(stage.workers):
+                handler = stage.make_handler() if stage.make_handler is not None else stage.function
+                self._handlers.append(handler)
+                self._open.add(id(handler))
+                threads.append(threading.Thread(target=self._work, args=(stage, handler, queues[i], queues[i + 1], successors),
+                                                daemon=True))
+
+        for thread in threads:
+            thread.start()
+
+        complete = False
+
+        try:
+            while True:
+                item = queues[-1].get()
+
+                if item is _DONE:
+                    complete = True
+                    break
+
+                if isinstance(item, _Raised):
+                    raise item.exception
+
+                yield item
+        finally:
+            if not complete:
+                self._closed.set()
+
+                # e.g. stop the worker processes a thread is waiting for
+                for handler in self._handlers:
+                    self._close(handler)
+
+            for thread in threads:
+                thread.join()
+
+            self.wall = time.time() - started
+
+    def utilization(self):
+        """
+        Returns (name, workers, items, share of the time its threads were busy) of every stage.
+        """
+        wall = self.wall or 0.0
+        return [(stage.name, stage.workers, stage.items, stage.busy / (stage.workers * wall) if wall > 0 else 0.0)
+                for stage in self.stages]
+
+    def format_utilization(self):
+        """
+        Describes how busy the stages of the last run were, the busiest one limits the throughput.
+        """
+        stages = self.utilization()
+
+        if not stages:
+            return "pipeline: no stages"
+
+        bottleneck = max(stages, key=lambda s: s[3])
+        return "pipeline: {}, bottleneck: {}".format(
+            ", ".join("{} {:.0%} of {} thread{}".format(name, busy, workers, "s" if workers > 1 else "")
+                      for name, workers, items, busy in stages),
+            bottleneck[0])
@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+from contextlib import contextmanager
+
+from lark import Tree
+
+from src import fastpath
+from src.parser import build_lalr_parser, build_ts_parser
+from src.transformation import TsToJson
+
+MODES = ("shared", "free_threaded")
+
+
+class PoolExhausted(Exception):
+    pass
+
+
+def gil_enabled():
+    """
+    Returns False on a free-threaded build of CPython running without the GIL.
+    """
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+class Parsers:
+    """
+    One set of parser instances, used by one thread at a time.
+
+    The instances are built from the grammars and options of src.parser through Lark's
+    public constructor, so that they share no state with tsParser and tsLalrParser.
+    """
+
+    def __init__(self):
+        self.earley = build_ts_parser()
+        self.lalr = build_lalr_parser()
+
+    def parse(self, text):
+        """
+        Parses a source like fastpath.parse, with the parsers of this set.
+        """
+        return fastpath.parse(text, self.earley, self.lalr)
+
+
+class _Stripe:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parsers = Parsers()
+
+
+class ParserPool:
+    """
+    Hands every thread exclusive use of a set of parser instances while it parses.
+
+    The module-level tsParser and tsLalrParser must not be used by several threads at
+    once: a parse keeps its state in the parser, and ChartGuard hooks into it. The
+    pool builds its own instances instead, see Parsers, and their number is capped by
+    max_instances (default: the number of CPUs).
+
+    In "shared" mode the instances are built on demand and kept in one free list, a
+    thread that finds none free while max_instances are in use waits for one. In
+    "free_threaded" mode, suited to CPython built without the GIL, all instances are
+    built up front and each one has its own lock: a thread tries the instance picked by
+    its thread id first and then the others, so that threads running in parallel do
+    not contend on a single lock. By default the mode is chosen by whether the GIL is
+    enabled.
+
+    Example:
+    >>> pool = ParserPool(max_instances=4)
+    >>> pool.transform_declarations(content)
+    >>> with pool.parsers() as parsers:
+    ...     tree = parsers.earley.parse(content)
+    """
+
+    def __init__(self, max_instances=None, mode=None, timeout=None):
+        if mode is None:
+            mode = "shared" if gil_enabled() else "free_threaded"
+
+        if mode not in MODES:
+            raise ValueError("Unknown mode {!r}, expected one of {}".format(mode, ", ".join(MODES)))
+
+        self.mode = mode
+        self.max_instances = max_instances or os.cpu_count() or 1
+        self.timeout = timeout
+        self.created = 0
+        self._free = []
+        self._condition = threading.Condition()
+        self._stripes = [_Stripe() for _ in range(self.max_instances)] if mode == "free_threaded" else []
+
+        if mode == "free_threaded":
+            self.created = self.max_instances
+
+    def _acquire_shared(self):
+        with self._condition:
+            while not self._free and self.created >= self.max_instances:
+                if not self._condition.wait(self.timeout):
+                    raise PoolExhausted("All {} parser instances are in use".format(self.max_instances))
+
+            if self._free:
+                return self._free.pop()
+
+            self.created += 1
+
+        try:
+            return Parsers()
+        except BaseException:
+            with self._condition:
+                self.created -= 1
+                self._condition.notify()
+            raise
+
+    def _release_shared(self, parsers):
+        with self._condition:
+            self._free.append(parsers)
+            self._condition.notify()
+
+    def _acquire_stripe(self):
+        first = threading.get_ident() % len(self._stripes)
+
+        for i in range(len(self._stripes)):
+            stripe = self._stripes[(first + i) % len(self._stripes)]
+
+            if stripe.lock.acquire(blocking=False):
+                return stripe
+
+        stripe = self._stripes[first]
+
+        if not stripe.lock.acquire(timeout=-1 if self.timeout is None else self.timeout):
+            raise PoolExhausted("All {} parser instances are in use".format(self.max_instances))
+
+        return stripe
+
+    @contextmanager
+    def parsers(self):
+        """
+        Lends a set of parser instances (see Parsers) to the calling thread for the
+        duration of the context.
+
+        Raises:
+        PoolExhausted: If no instance became free within the timeout of the pool.
+        """
+        if self.mode == "free_threaded":
+            stripe = self._acquire_stripe()
+
+            try:
+                yield stripe.parsers
+            finally:
+                stripe.lock.release()
+        else:
+            parsers = self._acquire_shared()
+
+            try:
+                yield parsers
+            finally:
+                self._release_shared(parsers)
+
+    def parse(self, text):
+        """
+        Thread-safe fastpath.parse.
+        """
+        with self.parsers() as parsers:
+            return parsers.parse(text)
+
+    def transform_declarations(self, interface_data, intern_table=None):
+        """
+        Thread-safe transform_declarations. The instance is only held while parsing, an
+        intern table must not be shared between threads.
+        """
+        tree = self.parse(interface_data)
+        transformer = TsToJson(intern_table)
+        return [transformer.transform(child) for child in tree.children if isinstance(child, Tree)]
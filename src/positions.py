@@ -0,0 +1,152 @@
+import re
+from bisect import bisect_right
+
+from lark import Token
+
+from src.util import declaration_kind
+
+_NEWLINE = re.compile(r"\n")
+# Whitespace and comments in front of a declaration, the description is not part of its span
+_LEADING = re.compile(r"(?:\s+|/\*.*?\*/|//[^\n]*)*", re.S)
+# Brackets that close a type, array suffixes and separators within object types, which
+# are not tokens in the tree
+_CLOSING = re.compile(r"\s*(\[\]|[>}\])]|[;,])")
+_BRACKETS = re.compile(r"[<>{}\[\]()]")
+_OPENING = re.compile(r"[<{\[(]")
+_CLOSING_BRACKET = re.compile(r"[>}\])]")
+_COMMENTS = ("comment", "inline_comment")
+# The key of the spans in the output, no valid identifier, so that it cannot collide
+# with the name of a member
+SPAN = "@span"
+
+
+class LineIndex:
+    """
+    Maps offsets within a source to lines and columns by binary search over the offsets
+    at which its lines start.
+
+    The index is built once per source in a single pass, every lookup then takes time
+    logarithmic in the number of lines, unlike counting the line breaks in front of
+    every offset, see scanner.line_and_column.
+
+    Example:
+    >>> index = LineIndex(content)
+    >>> index.line_and_column(120)
+    (4, 17)
+    """
+
+    def __init__(self, text):
+        self.starts = [0]
+        self.starts.extend(match.end() for match in _NEWLINE.finditer(text))
+
+    def line_and_column(self, pos):
+        """
+        Returns the 1-based line and column of an offset.
+        """
+        line = bisect_right(self.starts, pos)
+        return line, pos - self.starts[line - 1] + 1
+
+    def span(self, start, end):
+        """
+        Returns [line, column, end line, end column] of the text from offset start up to
+        (excluding) offset end, as found in the output.
+        """
+        return list(self.line_and_column(start) + self.line_and_column(end))
+
+
+def declaration_start(text, start):
+    """
+    Returns the offset of the first token of the statement starting at offset start,
+    skipping its description and other comments.
+    """
+    return _LEADING.match(text, start).end()
+
+
+def set_span(declaration, span):
+    """
+    Adds the span of a transformed top-level declaration to it. Interfaces keep it in
+    their body, since the name is the only key of the declaration itself.
+    """
+    if declaration_kind(declaration) == "interface" and isinstance(next(iter(declaration.values()), None), dict):
+        next(iter(declaration.values()))[SPAN] = span
+    else:
+        declaration[SPAN] = span
+
+
+def _edge_token(tree, last):
+    pending = [tree]
+
+    while pending:
+        node = pending.pop()
+
+        if isinstance(node, Token):
+            if node.pos_in_stream is not None:
+                return node
+        elif node.data not in _COMMENTS:
+            pending.extend(node.children if last else reversed(node.children))
+
+    return None
+
+
+class SourcePositions:
+    """
+    The positions of the members of one top-level declaration, see PositionedTsToJson.
+
+    Only the parse trees of the Earley parser carry positions for every rule, the fast
+    path and the LALR parser only set them on their tokens. The span of a member thus
+    runs from its name (or the bracket of an index signature) to the end of its type,
+    without keywords like "readonly", its description and its separator. Brackets,
+    which are no tokens in the tree, are added by matching the ones opened within the
+    member.
+
+    Parameters:
+    text (str): The whole source.
+    index (LineIndex): The index of the source.
+    offset (int): The offset of the statement the tokens of the trees are relative to.
+    """
+
+    def __init__(self, text, index, offset=0):
+        self.text = text
+        self.index = index
+        self.offset = offset
+
+    def tree_span(self, tree):
+        """
+        Returns the span of a subtree, see LineIndex.span, None if it has no tokens.
+        """
+        first = _edge_token(tree, False)
+
+        if first is None:
+            return None
+
+        last = _edge_token(tree, True)
+        text = self.text
+        starts = self.index.starts
+        start = self.offset + first.pos_in_stream
+        end = self.offset + last.pos_in_stream + len(last)
+        line = bisect_right(starts, start)
+
+        # an index signature starts at its bracket, on the line of its key
+        bracket = text.rfind("[", starts[line - 1], start)
+
+        if bracket >= 0 and (bracket == start - 1 or text[bracket + 1:start].isspace()):
+            start = bracket
+
+        depth = 0
+
+        if _BRACKETS.search(text, start, end):
+            depth = len(_OPENING.findall(text, start, end)) - len(_CLOSING_BRACKET.findall(text, start, end))
+
+        while True:
+            match = _CLOSING.match(text, end)
+
+            if match is None or match.group(1) != "[]" and depth <= 0:
+                break
+
+            if match.group(1) in (">", "}", "]", ")"):
+                depth -= 1
+
+            end = match.end()
+
+        end_line = bisect_right(starts, end)
+        return [line, start - starts[line - 1] + 1, end_line, end - starts[end_line - 1] + 1]
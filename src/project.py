@@ -0,0 +1,210 @@
+import json
+import os
+import re
+from collections import deque
+
+from src.batch import iter_batch
+from src.inheritance import InheritanceResolver
+from src.util import declaration_name
+
+# Extensions tried, in this order, for an import specifier without one.
+EXTENSIONS = (".ts", ".tsx", ".d.ts")
+
+# Import specifiers of statements the grammar does not support (e.g. single quotes or
+# "import type"), which are only found in the skipped declarations of the tolerant mode.
+_IMPORT = re.compile(r"""(?<![\w$.])(?:import|export)\b[^;'"]*?(?:\bfrom\s*)?(["'])([^"']+)\1""")
+
+
+def resolve_import(importer, specifier):
+    """
+    Resolves an import specifier to a local file, like the typescript compiler does.
+
+    Parameters:
+    importer (str): The path of the importing file.
+    specifier (str): The module path of the import, e.g. "./messages".
+
+    Returns:
+    str: The normalized path of the imported file, None if the specifier does not refer
+    to a relative path (e.g. a package) or the file does not exist.
+    """
+    if not specifier.startswith("./") and not specifier.startswith("../"):
+        return None
+
+    base = os.path.normpath(os.path.join(os.path.dirname(importer), specifier))
+    candidates = [base + extension for extension in EXTENSIONS]
+
+    if base.endswith(".js"):
+        candidates.insert(0, base[:-3] + ".ts")
+    if base.endswith(".ts") or base.endswith(".tsx"):
+        candidates.insert(0, base)
+
+    candidates.extend(os.path.join(base, "index" + extension) for extension in EXTENSIONS)
+
+    for candidate in candidates:
+        if os.path.isfile(candidate):
+            return candidate
+
+    return None
+
+
+def symbol_names(declaration):
+    """
+    Returns the names a transformed top-level declaration defines.
+    """
+    name = declaration_name(declaration)
+    return [] if name is None else [name]
+
+
+class Project:
+    """
+    A typescript project loaded by following the imports of its entry files.
+
+    Attributes:
+    files (dict): The batch result (see process_file) of every file, by path.
+    imports (dict): The local files every file imports.
+    external (dict): The import specifiers of every file that are not local files.
+    order (list): All files, every file after the files it imports (unless they import each other).
+    symbols (dict): Maps every top-level name to the path of the file declaring it.
+    duplicates (dict): Maps names declared by several files to these files.
+    resolver (InheritanceResolver): The interfaces of all files.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.imports = {}
+        self.external = {}
+        self.order = []
+        self.symbols = {}
+        self.duplicates = {}
+        self.resolver = InheritanceResolver()
+
+    def declarations(self, path):
+        return self.files[path]["declarations"]
+
+    def symbol(self, name):
+        """
+        Returns the declaration of a top-level name, None if it is not declared by any file.
+        """
+        path = self.symbols.get(name)
+
+        if path is None:
+            return None
+
+        for declaration in self.declarations(path):
+            if name in symbol_names(declaration):
+                return declaration
+
+    def failed(self):
+        return [result for result in self.files.values() if result["status"] != "ok"]
+
+
+def _specifiers(result):
+    specifiers = [declaration["import"][1:-1] for declaration in result["declarations"] if "import" in declaration]
+
+    if result["errors"]:
+        with open(result["file"], "r") as var:
+            content = var.read()
+
+        for error in result["errors"]:
+            specifiers.extend(match.group(2) for match in _IMPORT.finditer(content, error["start"], error["end"]))
+
+    return specifiers
+
+
+def _topological_order(imports, discovered):
+    order = []
+    state = {}
+
+    for root in discovered:
+        if root in state:
+            continue
+
+        state[root] = "open"
+        stack = [(root, iter(imports.get(root, [])))]
+
+        while stack:
+            path, children = stack[-1]
+            child = next(children, None)
+
+            if child is None:
+                stack.pop()
+                state[path] = "done"
+                order.append(path)
+            elif child not in state:
+                # an "open" child is part of an import cycle and is not waited for
+                state[child] = "open"
+                stack.append((child, iter(imports.get(child, []))))
+
+    return order
+
+
+def load_project(entries, jobs=None, timeout=None, memory_limit=None, max_chart_items=None, tolerant=False):
+    """
+    Loads the entry files and all local files they (indirectly) import.
+
+    The files are parsed in parallel worker processes as in a batch. Every file is
+    queued as soon as the first file importing it is parsed, and parsed only once no
+    matter how many files import it. Once all files are parsed, the symbol table is
+    filled in dependency order, so that a file's declarations are registered after
+    those of the files it imports and a name declared twice resolves to the first one.
+
+    Parameters:
+    entries (list): The entry files of the project.
+    jobs, timeout, memory_limit, max_chart_items, tolerant: See iter_batch.
+
+    Returns:
+    Project: The loaded project.
+    """
+    project = Project()
+    discovered = []
+    pending = deque()
+
+    for entry in entries:
+        path = os.path.normpath(entry)
+
+        if path not in pending:
+            discovered.append(path)
+            pending.append(path)
+
+    seen = set(discovered)
+
+    for result in iter_batch(pending, jobs, timeout, memory_limit, max_chart_items, tolerant):
+        path = result["file"]
+        result["declarations"] = [json.loads(declaration) for declaration in result["declarations"]]
+        project.files[path] = result
+        project.imports[path] = []
+        project.external[path] = []
+
+        if result["status"] != "ok":
+            continue
+
+        for specifier in _specifiers(result):
+            imported = resolve_import(path, specifier)
+
+            if imported is None:
+                project.external[path].append(specifier)
+                continue
+
+            if imported not in project.imports[path]:
+                project.imports[path].append(imported)
+
+            if imported not in seen:
+                seen.add(imported)
+                discovered.append(imported)
+                pending.append(imported)
+
+    project.order = _topological_order(project.imports, discovered)
+
+    for path in reversed(project.order):
+        # in reverse, so that the first declaration of an interface replaces later ones
+        project.resolver.update_file(path, project.declarations(path))
+
+    for path in project.order:
+        for declaration in project.declarations(path):
+            for name in symbol_names(declaration):
+                if name in project.symbols:
+                    project.duplicates.setdefault(name, [project.symbols[name]]).append(path)
+                else:
+                    project.symbols[name] = path
+
+    return project
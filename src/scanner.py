@@ -0,0 +1,133 @@
+import re
+
+_TOKEN = re.compile(r"""
+      (?P<comment>/\*.*?\*/)
+    | (?P<line_comment>//[^\n]*)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+    | (?P<open>\{)
+    | (?P<close>\})
+    | (?P<semicolon>;)
+    | (?P<word>[A-Za-z_$][\w$]*)
+    | (?P<other>\S)
+""", re.S | re.X)
+# Keywords that start a declaration, a statement that lacks its semicolon ends in front of them
+_DECLARATION_KEYWORDS = frozenset(("interface", "enum", "function", "namespace", "class", "export", "import", "type",
+                                   "const", "declare"))
+# Tokens after which a keyword on the next line still belongs to the same statement
+_CONTINUATIONS = frozenset(("export", "declare", "default", "async", "abstract", "=", ":", ",", "(", "|", "&", "<", "."))
+
+
+def split_declarations(text):
+    """
+    Splits a typescript source into the spans of its top-level statements.
+
+    The scanner only keeps track of braces, string literals and comments, so it is
+    much cheaper than parsing. A new statement starts with the first token following
+    the beginning of the file, a semicolon or a closing brace on the top level, unless
+    it is an opening brace, a semicolon or the "from" of an import that continues the
+    previous statement. A statement also ends in front of a declaration keyword on the
+    top level at the start of a line, so that a statement without its semicolon, which
+    the grammar does not understand anyway, does not swallow the declaration after it.
+    A block comment directly preceding a statement belongs to that statement, since
+    the grammar uses it as description of the declaration. Other comments between
+    statements are not part of any span.
+
+    Parameters:
+    text (str): The typescript source.
+
+    Returns:
+    list: (start, end) offsets of every top-level statement, in order of appearance.
+    """
+    spans = []
+    depth = 0
+    at_statement_start = True
+    comment_start = None
+    previous = None
+
+    for match in _TOKEN.finditer(text):
+        kind = match.lastgroup
+
+        if kind == "comment":
+            if depth == 0 and comment_start is None:
+                comment_start = match.start()
+            continue
+        elif kind == "line_comment":
+            continue
+
+        if (depth == 0 and not at_statement_start and kind == "word" and match.group() in _DECLARATION_KEYWORDS and
+                previous.group() not in _CONTINUATIONS and "\n" in text[previous.end():match.start()]):
+            at_statement_start = True
+
+        if at_statement_start and kind not in ("open", "semicolon") and match.group() != "from" or not spans:
+            spans.append([match.start() if comment_start is None else comment_start, None])
+
+        if kind == "open":
+            depth += 1
+        elif kind == "close" and depth > 0:
+            depth -= 1
+
+        spans[-1][1] = match.end()
+        at_statement_start = depth == 0 and kind in ("close", "semicolon")
+        comment_start = None
+        previous = match
+
+    return [tuple(span) for span in spans]
+
+
+def line_and_column(text, pos):
+    """
+    Returns the 1-based line and column of an offset within text.
+    """
+    line = text.count("\n", 0, pos) + 1
+    column = pos - (text.rfind("\n", 0, pos) + 1) + 1
+    return line, column
+
+
+# Comments and the string literals that may contain comment markers, everything else is
+# skipped by the regular expression engine
+_COMMENT = re.compile(r"""
+      (?P<comment>/\*.*?\*/)
+    | (?P<inline_comment>//[^\n]*\n?)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`)
+""", re.S | re.X)
+
+
+def extract_comments(text):
+    """
+    Collects the comments of a typescript source into a side table and blanks them out.
+
+    Every character of a comment is replaced by a space, line breaks are kept, so the
+    offsets, lines and columns of the remaining text do not change. Line comments
+    include their line break, as the grammar's inline comments did.
+
+    Parameters:
+    text (str): The typescript source.
+
+    Returns:
+    tuple: The blanked text and a list of (kind, start, end, value) of every comment in
+    order of appearance, kind is "comment" or "inline_comment".
+    """
+    if "/*" not in text and "//" not in text:
+        return text, []
+
+    comments = []
+    pieces = []
+    last = 0
+
+    for match in _COMMENT.finditer(text):
+        kind = match.lastgroup
+
+        if kind == "string":
+            continue
+
+        value = match.group()
+        comments.append((kind, match.start(), match.end(), value))
+        pieces.append(text[last:match.start()])
+        pieces.append(re.sub(r"[^\n]", " ", value))
+        last = match.end()
+
+    if not comments:
+        return text, []
+
+    pieces.append(text[last:])
+    return "".join(pieces), comments
@@ -0,0 +1,205 @@
+import heapq
+import json
+import os
+import re
+
+from src.output import write_atomic
+from src.scanner import extract_comments, split_declarations
+
+TIMINGS = ".ts_interface_parser.timings.json"
+TIMINGS_VERSION = 1
+
+# Seconds per byte of the statements of every kind, before they are scaled to the
+# machine by the recorded durations. Interfaces and enums mostly take the fast path,
+# functions, namespaces and imports the LALR parser, classes and everything else the
+# Earley parser.
+COSTS = {
+    "interface": 1e-6,
+    "enum": 1e-6,
+    "import": 2e-6,
+    "function": 1.5e-6,
+    "namespace": 1.5e-6,
+    "class": 1e-4,
+    "other": 3e-5
+}
+# Seconds per file for starting the parse, reading and writing it
+OVERHEAD = 0.002
+
+_KIND = re.compile(r"\s*(?:(?:export|declare|default|async|abstract)\s+)*(\w+)")
+
+
+def prescan(text):
+    """
+    Counts the bytes of the statements of a source by their kind, see COSTS.
+
+    Only the top-level statements are looked at, found by the scanner, which is much
+    cheaper than parsing.
+    """
+    text = extract_comments(text)[0]
+    constructs = {}
+
+    for start, end in split_declarations(text):
+        match = _KIND.match(text, start, end)
+        kind = match.group(1) if match and match.group(1) in COSTS else "other"
+        constructs[kind] = constructs.get(kind, 0) + end - start
+
+    return constructs
+
+
+def prescan_estimate(constructs):
+    """
+    Returns the expected duration of a file from its constructs, see prescan, before
+    it is scaled to the machine.
+    """
+    return OVERHEAD + sum(COSTS.get(kind, COSTS["other"]) * size for kind, size in constructs.items())
+
+
+class TimingDatabase:
+    """
+    Remembers the size and parse duration of every file of the previous batches.
+
+    Files that were processed before are expected to take as long as the last time,
+    scaled by their change in size. Other files are estimated from a prescan of their
+    constructs, scaled by how much longer or shorter the files recorded so far took
+    than their prescan estimate.
+
+    Example:
+    >>> timings = TimingDatabase("out/" + TIMINGS)
+    >>> estimates = {path: timings.estimate(path, path) for path in paths}
+    >>> timings.record(path, result["duration"])
+    >>> timings.save()
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.files = {}
+        self.sizes = {}
+        self.constructs = {}
+        self._scale = None
+
+        if path is not None and os.path.isfile(path):
+            try:
+                with open(path, "r") as var:
+                    data = json.load(var)
+            except ValueError:
+                # the timings only speed up a batch, a broken file is started over
+                data = {}
+
+            if data.get("version") == TIMINGS_VERSION:
+                self.files = data["files"]
+
+    def scale(self):
+        """
+        Returns the ratio of the recorded durations to their prescan estimates, 1.0 if
+        there are no recorded files with constructs.
+        """
+        if self._scale is None:
+            measured = [(entry["duration"], prescan_estimate(entry["constructs"]))
+                        for entry in self.files.values() if entry.get("constructs")]
+            expected = sum(e for d, e in measured)
+            self._scale = sum(d for d, e in measured) / expected if expected > 0 else 1.0
+
+        return self._scale or 1.0
+
+    def estimate(self, key, path):
+        """
+        Returns the expected parse duration of a file in seconds.
+
+        Parameters:
+        key (str): The key of the file, e.g. its path relative to the input root.
+        path (str): The path to read the file from.
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            # the batch reports the file as failed
+            return 0.0
+
+        entry = self.files.get(key)
+        self.sizes[key] = size
+
+        if entry is not None:
+            return entry["duration"] * size / entry["size"] if entry["size"] else entry["duration"]
+
+        try:
+            with open(path, "r") as var:
+                self.constructs[key] = prescan(var.read())
+        except (OSError, ValueError):
+            self.constructs[key] = {"other": size}
+
+        return self.scale() * prescan_estimate(self.constructs[key])
+
+    def record(self, key, duration, size=None):
+        """
+        Records the parse duration of a file, its size is taken from estimate unless given.
+        """
+        size = self.sizes.get(key) if size is None else size
+
+        if duration is None or size is None:
+            return
+
+        entry = {"size": size, "duration": duration}
+        constructs = self.constructs.pop(key, None) or self.files.get(key, {}).get("constructs")
+
+        if constructs:
+            entry["constructs"] = constructs
+
+        self.files[key] = entry
+        self._scale = None
+
+    def save(self):
+        if self.path is not None:
+            write_atomic(self.path, json.dumps({"version": TIMINGS_VERSION, "files": self.files}, sort_keys=True))
+
+
+def lpt_order(paths, estimates):
+    """
+    Orders the files by their expected duration, longest first (longest processing time
+    first scheduling), so that no large file is started while the other workers run
+    out of files. Ties keep their order.
+    """
+    return [path for index, path in sorted(enumerate(paths), key=lambda i: (-estimates[i[1]], i[0]))]
+
+
+def makespan(durations, jobs):
+    """
+    Returns the wall-clock time in which jobs workers process files of the given
+    durations, if every file goes to the next free worker in the given order.
+    """
+    workers = [0.0] * max(1, min(jobs, len(durations)))
+
+    for duration in durations:
+        heapq.heapreplace(workers, workers[0] + duration)
+
+    return max(workers)
+
+
+def parallel_efficiency(durations, jobs, wall):
+    """
+    Returns the share of the wall-clock time the workers spent processing files, 1.0
+    if no worker was ever idle.
+    """
+    workers = max(1, min(jobs, len(durations)))
+    return sum(durations) / (workers * wall) if wall > 0 else 1.0
+
+
+def format_efficiency(durations, jobs, wall, unscheduled=None):
+    """
+    Describes the parallel efficiency of a batch.
+
+    Parameters:
+    durations (list): The durations of the files in seconds, in the order they were started.
+    jobs (int): The number of workers.
+    wall (float): The wall-clock time of the batch in seconds.
+    unscheduled (list): The durations in the order the files were given, to compare
+    the expected wall-clock times with and without scheduling, see makespan.
+    """
+    workers = max(1, min(jobs, len(durations)))
+    text = "parallel efficiency {:.0%} ({:.2f}s of parsing in {:.2f}s on {} workers)".format(
+        parallel_efficiency(durations, jobs, wall), sum(durations), wall, workers)
+
+    if unscheduled is not None:
+        text += ", {:.2f}s expected in this order and {:.2f}s in the given order".format(
+            makespan(durations, jobs), makespan(unscheduled, jobs))
+
+    return text
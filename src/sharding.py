@@ -0,0 +1,197 @@
+import glob
+import hashlib
+import json
+import os
+import re
+
+MANIFEST = "manifest.json"
+PARTIAL_MANIFEST = "manifest.shard-{}-of-{}.json"
+# Every file a shard writes to the shared output directory carries its shard in the
+# name, e.g. partial manifests, incremental manifests, timings and archives
+_SHARD_FILE = re.compile(r"\.shard-\d+-of-(\d+)(?:\.|$)")
+
+
+class ShardError(Exception):
+    pass
+
+
+def parse_shard(spec):
+    """
+    Parses a shard specification "INDEX/COUNT", where INDEX is 0-based.
+
+    Returns:
+    tuple: (index, count)
+    """
+    try:
+        index, count = (int(i) for i in spec.split("/"))
+    except ValueError:
+        raise ShardError("Invalid shard {!r}, expected INDEX/COUNT".format(spec))
+
+    if count < 1 or not 0 <= index < count:
+        raise ShardError("Invalid shard {!r}, INDEX must be between 0 and COUNT - 1".format(spec))
+
+    return index, count
+
+
+def _key(path):
+    # the same file has to map to the same shard on every machine and platform
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def shard_by_hash(paths, count):
+    """
+    Assigns every file to a shard by a stable hash of its path.
+
+    Returns:
+    list: The files of every shard.
+    """
+    shards = [[] for _ in range(count)]
+
+    for path in paths:
+        digest = hashlib.sha1(_key(path).encode("utf-8")).digest()
+        shards[int.from_bytes(digest[:8], "big") % count].append(path)
+
+    return shards
+
+
+def shard_by_size(paths, count):
+    """
+    Assigns the files to shards of about the same total size.
+
+    The largest file goes to the shard with the smallest total size so far (longest
+    processing time first), ties are broken by path and shard number, so that every
+    machine computes the same assignment for the same files.
+
+    Returns:
+    list: The files of every shard, in the order of the given paths.
+    """
+    loads = [0] * count
+    assignment = {}
+
+    for size, key, path in sorted(((os.path.getsize(p), _key(p), p) for p in paths), key=lambda i: (-i[0], i[1])):
+        shard = loads.index(min(loads))
+        loads[shard] += size
+        assignment[path] = shard
+
+    shards = [[] for _ in range(count)]
+
+    for path in paths:
+        shards[assignment[path]].append(path)
+
+    return shards
+
+
+STRATEGIES = {
+    "hash": shard_by_hash,
+    "size": shard_by_size
+}
+
+
+def select_shard(paths, index, count, strategy="size"):
+    """
+    Returns the files of one shard.
+
+    Every machine has to be given the same files, spelled the same way, to get a
+    disjoint and complete partition.
+    """
+    unique = list(dict.fromkeys(paths))
+    return STRATEGIES[strategy](unique, count)[index]
+
+
+def remove_other_runs(output, count):
+    """
+    Removes the files that the shards of a run with another number of shards left in
+    the output directory, which would otherwise keep merge from ever succeeding.
+
+    Returns:
+    list: The names of the removed files.
+    """
+    removed = []
+
+    for name in sorted(os.listdir(output)):
+        match = _SHARD_FILE.search(name)
+
+        if match is not None and int(match.group(1)) != count and os.path.isfile(os.path.join(output, name)):
+            os.remove(os.path.join(output, name))
+            removed.append(name)
+
+    return removed
+
+
+def write_partial_manifest(output, index, count, strategy, total, files):
+    """
+    Writes the manifest of one shard to the output directory. The files of earlier
+    runs with another number of shards are removed, see remove_other_runs.
+
+    Parameters:
+    output (str): The output directory shared by all shards.
+    index, count (int): The shard.
+    strategy (str): The sharding strategy.
+    total (int): The number of files of all shards.
+    files (dict): Maps the path of every processed file to its entry.
+
+    Returns:
+    str: The path of the manifest.
+    """
+    path = os.path.join(output, PARTIAL_MANIFEST.format(index, count))
+    manifest = {"shard": index, "count": count, "strategy": strategy, "total": total, "files": files}
+
+    with open(path + ".tmp", "w") as var:
+        json.dump(manifest, var, indent=4, sort_keys=True)
+
+    os.replace(path + ".tmp", path)
+    remove_other_runs(output, count)
+    return path
+
+
+def merge_manifests(output):
+    """
+    Combines the partial manifests of all shards into output/manifest.json.
+
+    Raises:
+    ShardError: If a shard is missing, the shards disagree on the partition or a file
+    was processed by more than one shard.
+
+    Returns:
+    dict: The merged manifest.
+    """
+    partials = []
+
+    for path in sorted(glob.glob(os.path.join(output, PARTIAL_MANIFEST.format("*", "*")))):
+        with open(path, "r") as var:
+            partials.append(json.load(var))
+
+    if not partials:
+        raise ShardError("No partial manifests in {}".format(output))
+
+    settings = {(p["count"], p["strategy"], p["total"]) for p in partials}
+
+    if len(settings) != 1:
+        raise ShardError("The partial manifests belong to different runs: {}".format(sorted(settings)))
+
+    count, strategy, total = settings.pop()
+    found = sorted(p["shard"] for p in partials)
+    missing = sorted(set(range(count)).difference(found))
+
+    if missing:
+        raise ShardError("Missing shards {} of {}".format(", ".join(str(i) for i in missing), count))
+
+    files = {}
+
+    for partial in sorted(partials, key=lambda p: p["shard"]):
+        for path, entry in partial["files"].items():
+            if path in files:
+                raise ShardError("{} was processed by shards {} and {}".format(path, files[path]["shard"], partial["shard"]))
+
+            files[path] = dict(entry, shard=partial["shard"])
+
+    if len(files) != total:
+        raise ShardError("The shards processed {} of {} files".format(len(files), total))
+
+    manifest = {"count": count, "strategy": strategy, "total": total, "files": files}
+
+    with open(os.path.join(output, MANIFEST + ".tmp"), "w") as var:
+        json.dump(manifest, var, indent=4, sort_keys=True)
+
+    os.replace(os.path.join(output, MANIFEST + ".tmp"), os.path.join(output, MANIFEST))
+    return manifest
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import sqlite3
+import time
+
+from src.util import declaration_kind, declaration_name
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    hash TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS declarations (
+    id INTEGER PRIMARY KEY,
+    file_id INTEGER NOT NULL REFERENCES files(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    namespace TEXT,
+    name TEXT,
+    kind TEXT NOT NULL,
+    json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS members (
+    id INTEGER PRIMARY KEY,
+    declaration_id INTEGER NOT NULL REFERENCES declarations(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    optional INTEGER NOT NULL,
+    readonly INTEGER NOT NULL,
+    function INTEGER NOT NULL,
+    indexed INTEGER NOT NULL,
+    json TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS types (
+    declaration_id INTEGER NOT NULL REFERENCES declarations(id) ON DELETE CASCADE,
+    member_id INTEGER REFERENCES members(id) ON DELETE CASCADE,
+    role TEXT NOT NULL,
+    type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS declarations_name ON declarations(name);
+CREATE INDEX IF NOT EXISTS declarations_kind ON declarations(kind);
+CREATE INDEX IF NOT EXISTS declarations_file ON declarations(file_id);
+CREATE INDEX IF NOT EXISTS members_declaration ON members(declaration_id);
+CREATE INDEX IF NOT EXISTS types_type ON types(type);
+CREATE INDEX IF NOT EXISTS types_declaration ON types(declaration_id);
+CREATE INDEX IF NOT EXISTS types_member ON types(member_id);
+"""
+
+
+def file_hash(path):
+    """
+    Returns the sha256 hex digest of the content of a file.
+    """
+    with open(path, "rb") as var:
+        return hashlib.sha256(var.read()).hexdigest()
+
+
+def type_names(type_spec):
+    """
+    Returns the names of the types an attribute refers to, without array brackets,
+    including the types of the attributes of object types.
+    """
+    names = []
+
+    if isinstance(type_spec, dict):
+        for member in type_spec.values():
+            if isinstance(member, dict):
+                names.extend(type_names(member.get("type", [])))
+        return names
+
+    for item in type_spec:
+        if isinstance(item, dict):
+            names.extend(type_names(item))
+            continue
+
+        name = item
+
+        while name.endswith("[]"):
+            name = name[:-2]
+
+        if name and name not in names:
+            names.append(name)
+
+    return names
+
+
+class DeclarationStore:
+    """
+    Stores transformed declarations in an indexed SQLite database.
+
+    Every file is stored with the hash of its content, so that unchanged files can be
+    skipped. The rows of a file are replaced as a whole within one transaction.
+
+    Example:
+    >>> with DeclarationStore("declarations.db") as store:
+    ...     if not store.is_current(path, file_hash(path)):
+    ...         store.update_file(path, file_hash(path), transform_declarations(content))
+    ...     store.interfaces_using("Message")
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        self.connection.close()
+
+    def hashes(self):
+        """
+        Returns the stored hash of every file by path.
+        """
+        return dict(self.connection.execute("SELECT path, hash FROM files"))
+
+    def is_current(self, path, content_hash):
+        row = self.connection.execute("SELECT hash FROM files WHERE path = ?", (path,)).fetchone()
+        return row is not None and row[0] == content_hash
+
+    def update_file(self, path, content_hash, declarations):
+        self.update_files([(path, content_hash, declarations)])
+
+    def update_files(self, files):
+        """
+        Replaces the declarations of several files in a single transaction.
+
+        Parameters:
+        files (iterable): (path, content hash, declarations) of every file, where
+        declarations are the dictionaries returned by TsToJson.
+
+        Returns:
+        int: The number of files that changed, files with an unchanged hash are skipped.
+        """
+        hashes = self.hashes()
+        updated = 0
+
+        with self.connection:
+            for path, content_hash, declarations in files:
+                if hashes.get(path) == content_hash:
+                    continue
+
+                self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                file_id = self.connection.execute("INSERT INTO files (path, hash, updated) VALUES (?, ?, ?)",
+                                                  (path, content_hash, time.time())).lastrowid
+                self._insert_declarations(file_id, declarations, None)
+                updated += 1
+
+        return updated
+
+    def remove_file(self, path):
+        with self.connection:
+            self.connection.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def _insert_declarations(self, file_id, declarations, namespace):
+        for position, declaration in enumerate(declarations):
+            kind = declaration_kind(declaration)
+
+            if kind == "namespace":
+                name = declaration["name"]
+                self._insert_declarations(file_id, declaration.get("content", []), name if namespace is None else namespace + "." + name)
+                continue
+
+            name = declaration_name(declaration)
+
+            declaration_id = self.connection.execute(
+                "INSERT INTO declarations (file_id, position, namespace, name, kind, json) VALUES (?, ?, ?, ?, ?, ?)",
+                (file_id, position, namespace, name, kind, json.dumps(declaration, sort_keys=True))).lastrowid
+
+            if kind == "interface" and isinstance(declaration[name], dict):
+                self._insert_members(declaration_id, declaration[name])
+
+    def _insert_members(self, declaration_id, body):
+        types = [(declaration_id, None, "extends", base) for base in body.get("extends", [])]
+
+        for name, member in body.items():
+            if not isinstance(member, dict):
+                continue
+
+            member_id = self.connection.execute(
+                "INSERT INTO members (declaration_id, name, optional, readonly, function, indexed, json) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (declaration_id, name, bool(member.get("optional")), bool(member.get("readonly")),
+                 bool(member.get("function")), "indexed" in member, json.dumps(member, sort_keys=True))).lastrowid
+
+            types.extend((declaration_id, member_id, "member", t) for t in type_names(member.get("type", [])))
+
+            for parameter in member.get("parameters", {}).values():
+                types.extend((declaration_id, member_id, "parameter", t) for t in type_names(parameter.get("type", [])))
+
+            if "indexed" in member:
+                types.extend((declaration_id, member_id, "index", t) for t in type_names(member["indexed"].get("type", [])))
+
+        self.connection.executemany("INSERT INTO types (declaration_id, member_id, role, type) VALUES (?, ?, ?, ?)", types)
+
+    def declarations_named(self, name, kind=None):
+        """
+        Returns (path, namespace, declaration) of every declaration with the given name.
+        """
+        query = "SELECT f.path, d.namespace, d.json FROM declarations d JOIN files f ON f.id = d.file_id WHERE d.name = ?"
+        parameters = [name]
+
+        if kind is not None:
+            query += " AND d.kind = ?"
+            parameters.append(kind)
+
+        return [(path, namespace, json.loads(data)) for path, namespace, data in self.connection.execute(query, parameters)]
+
+    def interfaces_using(self, type_name, roles=None):
+        """
+        Returns (path, interface name, member name) for every use of a type by an interface.
+
+        Parameters:
+        type_name (str): The name of the type, e.g. "Message".
+        roles (list): Restrict the uses to "member", "parameter", "index" or "extends"
+        types. The member name is None for "extends".
+        """
+        query = ("SELECT f.path, d.name, m.name FROM types t "
+                 "JOIN declarations d ON d.id = t.declaration_id "
+                 "JOIN files f ON f.id = d.file_id "
+                 "LEFT JOIN members m ON m.id = t.member_id "
+                 "WHERE t.type = ?")
+        parameters = [type_name]
+
+        if roles:
+            query += " AND t.role IN ({})".format(", ".join("?" for _ in roles))
+            parameters.extend(roles)
+
+        return list(self.connection.execute(query + " ORDER BY f.path, t.rowid", parameters))
@@ -0,0 +1,171 @@
+import gc
+import math
+import time
+
+from src import fastpath
+from src.parser import tsParser, tsLalrParser
+
+
+def long_union(n):
+    return "interface A {{ a: {}; }}".format(" | ".join("T{}".format(i) for i in range(n)))
+
+
+def return_union(n):
+    return "function f(): {} {{}}".format(" | ".join("T{}".format(i) for i in range(n)))
+
+
+def deep_generics(n):
+    return "interface A {{ a: {}string{}; }}".format("Array<" * n, ">" * n)
+
+
+def huge_comment(n):
+    return "/**\n{} */\ninterface A {{ a: string; }}".format("".join(" * line {} of the documentation\n".format(i) for i in range(n)))
+
+
+def optional_params(n):
+    return "function f({}): void {{}}".format(", ".join("p{}?: string".format(i) for i in range(n)))
+
+
+def brace_heavy_body(n):
+    return "function f(a: number): void {{\n{}}}".format("".join("    if (a > {0}) {{ call({{ key: {0} }}); }}\n".format(i) for i in range(n)))
+
+
+def long_enum(n):
+    return "enum E {{ {} }}".format(", ".join("A{0} = {0}".format(i) for i in range(n)))
+
+
+def many_members(n):
+    return "interface A {{\n{}}}".format("".join("    /** member */\n    m{}?: string[];\n".format(i) for i in range(n)))
+
+
+# Generators of adversarial inputs, every one returns a source that grows linearly with n
+CONSTRUCTS = {
+    "long_union": long_union,
+    "return_union": return_union,
+    "deep_generics": deep_generics,
+    "huge_comment": huge_comment,
+    "optional_params": optional_params,
+    "brace_heavy_body": brace_heavy_body,
+    "long_enum": long_enum,
+    "many_members": many_members
+}
+
+PARSERS = {
+    "auto": fastpath.parse,
+    "lalr": tsLalrParser.parse,
+    "earley": tsParser.parse
+}
+
+
+def fit_exponent(sizes, durations, min_duration=0.0):
+    """
+    Fits durations = c * sizes^k by least squares on the logarithms.
+
+    Durations below min_duration are dominated by constant costs and ignored, as long as
+    two points remain.
+
+    Returns:
+    float: The exponent k, None for less than two distinct sizes.
+    """
+    points = [(math.log(s), math.log(d)) for s, d in zip(sizes, durations) if s > 0 and d > 0]
+    significant = [(math.log(s), math.log(d)) for s, d in zip(sizes, durations) if s > 0 and d >= max(min_duration, 1e-12)]
+
+    if len(set(x for x, y in significant)) >= 2:
+        points = significant
+
+    if len(set(x for x, y in points)) < 2:
+        return None
+
+    mean_x = sum(x for x, y in points) / len(points)
+    mean_y = sum(y for x, y in points) / len(points)
+
+    return (sum((x - mean_x) * (y - mean_y) for x, y in points) /
+            sum((x - mean_x) ** 2 for x, y in points))
+
+
+def measure(parse, text, repeat=3):
+    """
+    Returns the best wall-clock time of repeated parses of a text in seconds, the
+    garbage collector is disabled while parsing, as by timeit.
+    """
+    best = None
+    enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            parse(text)
+            duration = time.perf_counter() - started
+            best = duration if best is None else min(best, duration)
+    finally:
+        if enabled:
+            gc.enable()
+
+    return best
+
+
+def scale(construct, parse, start=16, steps=7, factor=2, repeat=3, max_seconds=5.0, min_duration=0.001):
+    """
+    Parses inputs of a construct of growing size and fits the complexity exponent.
+
+    The size n of the construct starts at start and is multiplied by factor for every
+    step. The growth stops early once a single parse takes longer than max_seconds.
+    Parses faster than min_duration are not used for the fit, see fit_exponent.
+
+    Parameters:
+    construct (str): The name of the construct, see CONSTRUCTS.
+    parse (callable): The parser, see PARSERS.
+
+    Returns:
+    dict: The "construct", the "sizes" of the inputs in characters, the "durations"
+    in seconds and the fitted "exponent", None if the construct could not be measured.
+    "error" holds the reason if a parse failed.
+    """
+    result = {"construct": construct, "sizes": [], "durations": [], "exponent": None, "error": None}
+    n = start
+
+    for _ in range(steps):
+        text = CONSTRUCTS[construct](n)
+
+        try:
+            duration = measure(parse, text, repeat)
+        except Exception as e:
+            result["error"] = "n={}: {}".format(n, str(e).strip().split("\n")[0])
+            break
+
+        result["sizes"].append(len(text))
+        result["durations"].append(duration)
+
+        if duration > max_seconds:
+            break
+
+        n *= factor
+
+    result["exponent"] = fit_exponent(result["sizes"], result["durations"], min_duration)
+    return result
+
+
+def run_stress(constructs=None, parser="auto", threshold=1.5, **kwargs):
+    """
+    Measures the scaling of every construct and flags those that grow faster than
+    size^threshold.
+
+    Parameters:
+    constructs (list): The names of the constructs, all of CONSTRUCTS by default.
+    parser (str): The parser, see PARSERS.
+    threshold (float): The largest acceptable exponent.
+    kwargs: Passed on to scale.
+
+    Returns:
+    list: The result of scale for every construct, with "flagged" set if its exponent
+    is above the threshold.
+    """
+    results = []
+
+    for construct in constructs or sorted(CONSTRUCTS):
+        result = scale(construct, PARSERS[parser], **kwargs)
+        result["flagged"] = result["exponent"] is not None and result["exponent"] > threshold
+        results.append(result)
+
+    return results
@@ -1,11 +1,70 @@
-import json
+import re
 import lark
 
 from lark import Transformer, Tree, Token
-from src.util import extract_function_or_class_name, extract_documentation, extract_parameters, extract_return_type, parse_pretty_tree
-from src.parser import tsParser
+from lark.exceptions import LarkError, UnexpectedInput
+from lark.visitors import Discard
+from src.util import extract_function_or_class_name, extract_documentation, extract_parameters, extract_return_type, parse_pretty_tree, declaration_tree_name, numbered_keys, format_json
+from src import fastpath
+from src.positions import SPAN, LineIndex, SourcePositions, declaration_start, set_span
+from src.scanner import split_declarations
+
+class NonRecursiveTransformer(Transformer):
+    """
+    Transformer that walks the tree with an explicit stack instead of recursion.
+
+    Lark's Transformer recurses once per tree level, so deeply nested types exhaust the
+    interpreter stack. This transformer first flattens the tree into post-order and
+    then reduces it bottom-up, which takes time linear in the number of nodes and
+    constant stack depth. The user callbacks are called exactly as by Transformer.
+    """
+
+    _DISCARDED = object()
+
+    def transform(self, tree):
+        reverse_postfix = []
+        pending = [tree]
+
+        while pending:
+            node = pending.pop()
+            reverse_postfix.append(node)
+
+            if isinstance(node, Tree):
+                pending.extend(node.children)
+
+        stack = []
+
+        for node in reversed(reverse_postfix):
+            if isinstance(node, Tree):
+                size = len(node.children)
+                children = [c for c in stack[len(stack) - size:] if c is not self._DISCARDED] if size else []
+                del stack[len(stack) - size:]
+
+                try:
+                    stack.append(self._call_userfunc(node, children))
+                except Discard:
+                    stack.append(self._DISCARDED)
+            elif self.__visit_tokens__ and isinstance(node, Token):
+                try:
+                    stack.append(self._call_userfunc_token(node))
+                except Discard:
+                    stack.append(self._DISCARDED)
+            else:
+                stack.append(node)
+
+        return stack[0]
+
+
+class TsToJson(NonRecursiveTransformer):
+    def __init__(self, intern_table=None, visit_tokens=False):
+        super().__init__(visit_tokens)
+        self.intern_table = intern_table
+
+    def _intern(self, value):
+        if self.intern_table is None:
+            return str(value)
+        return self.intern_table.intern_string(value)
 
-class TsToJson(Transformer):
     def comment(self, elements):
         return {"description": str("\n".join([x.strip() for x in elements[0].replace("*", "").replace("/", "").split("\n") if x != ""]))}
 
@@ -25,12 +84,25 @@ class TsToJson(Transformer):
         }
 
     def tstype(self, elements):
+        key = None
+
+        if self.intern_table is not None:
+            key = self.intern_table.tstype_key(elements)
+
+            if key is not None:
+                memoized = self.intern_table.lookup_tstype(key)
+
+                if memoized is not None:
+                    return {"type": memoized}
+
         ret_val = []
         ret_dict = {}
 
         for element in elements:
             if type(element) == lark.lexer.Token and element.type == "CNAME":
                 ret_val.append(str(element))
+            elif type(element) == list:
+                ret_val.extend(element)
             elif type(element) == lark.tree.Tree and element.data == "conjunction":
                 cs = [str(child) for child in element.children]
                 ret_val.append({"conjunction": cs})
@@ -43,9 +115,36 @@ class TsToJson(Transformer):
 
         if len(ret_val) == 0:
             return {"type": ret_dict}
+        elif key is not None:
+            return {"type": self.intern_table.store_tstype(key, ret_val)}
         else:
             return {"type": ret_val}
 
+    def union_type(self, elements):
+        members = []
+
+        for element in elements:
+            if type(element) == lark.tree.Tree and element.data == "isarray":
+                members[-1] = members[-1] + "[]"
+            else:
+                members.append(self._intern(element))
+
+        return members
+
+    def object_property(self, elements):
+        return {self._intern(elements[0]): elements[1]}
+
+    def object_properties(self, elements):
+        properties = {}
+
+        for element in elements:
+            properties.update(element)
+
+        return properties
+
+    def object_type(self, elements):
+        return elements[0]
+
     def class_decl(self, elements):
         name = extract_function_or_class_name(elements)
         description = extract_documentation(elements)
@@ -122,9 +221,9 @@ class TsToJson(Transformer):
         if len(elements) > 1 and type(elements[1]) == dict and "params" in elements[1]:
             return {"name": str(elements[0]), "params": elements[1]["params"]}
         elif len(elements) == 1:
-            return str(elements[0])
+            return self._intern(elements[0])
 
-        return {"indexed": True, "name": str(elements[0]), "type": elements[1]}
+        return {"indexed": True, "name": self._intern(elements[0]), "type": elements[1]}
 
     def typedef(self, elements):
         ret_dict = {}
@@ -160,7 +259,7 @@ class TsToJson(Transformer):
         return {name: ret_dict}
 
     def enum(self, elements):
-        elements = [i for i in elements if not str(i) == "export" and not str(i) == "interface"]
+        elements = [i for i in elements if not (isinstance(i, Token) and i in ("export", "interface"))]
 
         descr = None
         extends = None
@@ -168,14 +267,14 @@ class TsToJson(Transformer):
 
         if type(elements[0]) == dict and "description" in elements[0]:
             descr = elements[0]["description"]
-            name = str(elements[1])
+            name = self._intern(elements[1])
             start_index = 2
         elif type(elements[1]) == lark.tree.Tree and elements[1].data == "extends":
-            name = str(elements[0])
-            extends = [str(i) for i in elements[1].children]
+            name = self._intern(elements[0])
+            extends = [self._intern(i) for i in elements[1].children]
             start_index = 2
         else:
-            name = str(elements[0])
+            name = self._intern(elements[0])
 
         if name is None:
             raise Exception("Has no name")
@@ -200,7 +299,7 @@ class TsToJson(Transformer):
         return ret_val
 
     def int(self, elements):
-        elements = [i for i in elements if not str(i) == "export" and not str(i) == "interface"]
+        elements = [i for i in elements if not (isinstance(i, Token) and i in ("export", "interface"))]
 
         descr = None
         name = None
@@ -209,14 +308,14 @@ class TsToJson(Transformer):
 
         if type(elements[0]) == dict and "description" in elements[0]:
             descr = elements[0]["description"]
-            name = str(elements[1])
+            name = self._intern(elements[1])
             start_index = 2
         elif type(elements[1]) == lark.tree.Tree and elements[1].data == "extends":
-            name = str(elements[0])
-            extends = [str(i) for i in elements[1].children]
+            name = self._intern(elements[0])
+            extends = [self._intern(i) for i in elements[1].children]
             start_index = 2
         else:
-            name = str(elements[0])
+            name = self._intern(elements[0])
 
         if name is None:
             raise Exception("Has no name")
@@ -239,16 +338,241 @@ class TsToJson(Transformer):
         return ret_val
 
 
-def transform(interface_data, debug=False):
-    out_jsons = []
-    tree = tsParser.parse(interface_data)
+class PositionedTsToJson(TsToJson):
+    """
+    TsToJson that adds the span of every member, see SourcePositions. The positions
+    of the declaration have to be set before it is transformed.
+    """
+
+    def __init__(self, intern_table=None, visit_tokens=False, positions=None):
+        super().__init__(intern_table, visit_tokens)
+        self.positions = positions
+        self._spans = None
+
+    def transform(self, tree):
+        # members are not nested and transformed in order of appearance, so their spans
+        # are taken from the tree up front instead of checking every node
+        members = []
+        pending = [tree]
+
+        while pending:
+            node = pending.pop()
+
+            if node.data == "typedef":
+                members.append(node)
+            elif node.data in ("int", "ns_decl"):
+                pending.extend(reversed([child for child in node.children if isinstance(child, Tree)]))
+
+        self._spans = iter([self.positions.tree_span(member) for member in members])
+        return super().transform(tree)
+
+    def typedef(self, elements):
+        result = super().typedef(elements)
+        span = next(self._spans, None)
+
+        if span is not None:
+            next(iter(result.values()))[SPAN] = span
+
+        return result
+
+
+def transform_declarations(interface_data, debug=False, intern_table=None, positions=False):
+    """
+    Parses the typescript source and transforms every top-level declaration.
+
+    Parameters:
+    interface_data (str): The typescript source.
+    debug (bool): Pretty print the parse tree of every declaration.
+    intern_table (InternTable): Optional table shared across a run to deduplicate names and types.
+    positions (bool): Add the span of every top-level declaration and member, see LineIndex.span.
 
-    for cTree in tree.children:
+    Returns:
+    list: One dictionary per top-level declaration.
+    """
+    declarations = []
+    spans = [] if positions else None
+    tree = fastpath.parse(interface_data, spans=spans)
+    transformer = PositionedTsToJson(intern_table) if positions else TsToJson(intern_table)
+    index = LineIndex(interface_data) if positions else None
+
+    for i, cTree in enumerate(tree.children):
         if debug:
             print(cTree.pretty())
 
         if isinstance(cTree, Tree):
-            transformed = json.dumps(TsToJson().transform(cTree), indent=4, sort_keys=True)
-            out_jsons.append(transformed)
+            if positions:
+                offset, start, end = spans[i]
+                transformer.positions = SourcePositions(interface_data, index, offset)
+
+            declarations.append(transformer.transform(cTree))
+
+            if positions:
+                set_span(declarations[-1], index.span(start, end))
+
+    return declarations
+
+
+def transform(interface_data, debug=False, intern_table=None, positions=False):
+    return [format_json(declaration)
+            for declaration in transform_declarations(interface_data, debug, intern_table, positions)]
+
+
+class LazyDeclarations:
+    """
+    Sequence and mapping view over the top-level declarations of a source, which
+    transforms every declaration only the first time it is accessed and caches it.
+
+    As a sequence it holds the declarations in the order of transform_declarations,
+    as a mapping it maps the key of every declaration (its name, numbered if the name
+    occurs more than once, see numbered_keys) to the declaration. Iterating the view
+    yields the declarations, like a list.
+
+    Example:
+    >>> declarations = parse_lazy(content)
+    >>> declarations["Message"], declarations[0], len(declarations)
+    """
+
+    def __init__(self, trees, intern_table=None):
+        self.trees = trees
+        self.transformer = TsToJson(intern_table)
+        self.cache = {}
+        self._keys = numbered_keys(declaration_tree_name(tree) for tree in trees)
+        self._index = {key: i for i, key in enumerate(self._keys)}
+
+    def _declaration(self, index):
+        if index not in self.cache:
+            self.cache[index] = self.transformer.transform(self.trees[index])
+
+        return self.cache[index]
+
+    def __len__(self):
+        return len(self.trees)
+
+    def __getitem__(self, item):
+        if isinstance(item, str):
+            return self._declaration(self._index[item])
+
+        if isinstance(item, slice):
+            return [self._declaration(i) for i in range(*item.indices(len(self.trees)))]
+
+        if item < 0:
+            item += len(self.trees)
+
+        if not 0 <= item < len(self.trees):
+            raise IndexError("declaration index out of range")
+
+        return self._declaration(item)
+
+    def __iter__(self):
+        for index in range(len(self.trees)):
+            yield self._declaration(index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def keys(self):
+        return list(self._keys)
+
+    def items(self):
+        for index, key in enumerate(self._keys):
+            yield key, self._declaration(index)
+
+    def get(self, key, default=None):
+        return self[key] if key in self._index else default
+
+    def formatted(self, item):
+        """
+        Returns a declaration, by index or key, as JSON string as transform does.
+        """
+        return format_json(self[item])
+
+    @property
+    def transformed(self):
+        """
+        The number of declarations that were transformed so far.
+        """
+        return len(self.cache)
+
+
+def parse_lazy(interface_data, intern_table=None):
+    """
+    Parses a source, but transforms its declarations only when they are accessed.
+
+    The whole source is parsed up front, so syntax errors are raised as by
+    transform_declarations, but TsToJson and format_json only run for the declarations
+    that are actually used, e.g. a few interfaces of a huge bundle.
+
+    Parameters:
+    interface_data (str): The typescript source.
+    intern_table (InternTable): Optional table shared across a run to deduplicate names and types.
+
+    Returns:
+    LazyDeclarations: The view over the top-level declarations.
+    """
+    tree = fastpath.parse(interface_data)
+    return LazyDeclarations([child for child in tree.children if isinstance(child, Tree)], intern_table)
+
+
+def transform_declarations_tolerant(interface_data, debug=False, intern_table=None, positions=False):
+    """
+    Like transform_declarations, but a declaration that can not be parsed or transformed
+    does not fail the whole file.
+
+    The source is split into its top-level statements by a cheap scanner and every
+    statement is parsed on its own, so a syntax error only discards the statement it
+    occurs in and parsing resumes at the next top-level declaration. Every statement is
+    parsed exactly once.
+
+    Parameters:
+    interface_data (str): The typescript source.
+    debug (bool): Pretty print the parse tree of every declaration.
+    intern_table (InternTable): Optional table shared across a run to deduplicate names and types.
+    positions (bool): Add the span of every top-level declaration and member, see LineIndex.span.
+
+    Returns:
+    tuple: The list of transformed declarations and a list of errors. Every error is a
+    dictionary with the span of the failed statement ("start", "end"), the "line" and
+    "column" of the failure and the "reason".
+    """
+    declarations = []
+    errors = []
+    transformer = PositionedTsToJson(intern_table) if positions else TsToJson(intern_table)
+    index = LineIndex(interface_data) if positions else None
+
+    for start, end in split_declarations(interface_data):
+        error_pos = start
 
-    return out_jsons
\ No newline at end of file
+        if positions:
+            transformer.positions = SourcePositions(interface_data, index, start)
+
+        try:
+            for cTree in fastpath.parse_statement(interface_data[start:end]):
+                if debug:
+                    print(cTree.pretty())
+
+                if isinstance(cTree, Tree):
+                    declarations.append(transformer.transform(cTree))
+
+                    if positions:
+                        set_span(declarations[-1], index.span(declaration_start(interface_data, start), end))
+        except LarkError as e:
+            if isinstance(e, UnexpectedInput) and e.pos_in_stream is not None:
+                error_pos = start + e.pos_in_stream
+
+            # the index is only built once a file has errors, or spans anyway
+            index = index or LineIndex(interface_data)
+            line, column = index.line_and_column(error_pos)
+            errors.append({
+                "start": start,
+                "end": end,
+                "line": line,
+                "column": column,
+                "reason": re.sub(r" at line \S+,? col(umn)? \S+$", "", str(e).strip().split("\n")[0])
+            })
+
+    return declarations, errors
+
+
+def transform_tolerant(interface_data, debug=False, intern_table=None, positions=False):
+    declarations, errors = transform_declarations_tolerant(interface_data, debug, intern_table, positions)
+    return [format_json(declaration) for declaration in declarations], errors
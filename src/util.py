@@ -1,3 +1,6 @@
+import json
+from json.encoder import encode_basestring_ascii
+
 from lark import Token, Tree
 
 
@@ -156,4 +159,169 @@ def extract_return_type(elements):
                         out_arr.append("any")
 
                 return out_arr
-        return ""
\ No newline at end of file
+        return ""
+
+
+def iter_interfaces(declarations):
+        """
+        Yields the interfaces of a list of transformed declarations, including those nested in namespaces.
+
+        Parameters:
+        declarations (list): Dictionaries as returned by TsToJson.
+
+        Returns:
+        generator: (name, body) for every interface, where body is the dictionary of its
+        attributes, "description" and "extends".
+        """
+        for declaration in declarations:
+            if not isinstance(declaration, dict):
+                continue
+
+            if declaration.get("type") == "namespace":
+                yield from iter_interfaces(declaration.get("content", []))
+            elif len(declaration) == 1 and "function_name" not in declaration:
+                name, body = next(iter(declaration.items()))
+
+                if isinstance(body, dict):
+                    yield name, body
+
+
+def interface_members(body):
+        """
+        Returns the attributes of an interface body, i.e. everything but its description and extensions.
+        """
+        return {name: member for name, member in body.items() if isinstance(member, dict)}
+
+
+def declaration_kind(declaration):
+        """
+        Returns the kind of a transformed top-level declaration: "import", "function",
+        "namespace", "enum" or "interface".
+        """
+        if "import" in declaration:
+            return "import"
+        if "function_name" in declaration:
+            return "function"
+        if declaration.get("type") == "namespace":
+            return "namespace"
+        if "enum" in declaration:
+            return "enum"
+        return "interface"
+
+
+def declaration_name(declaration):
+        """
+        Returns the name of a transformed top-level declaration, None for imports.
+        """
+        kind = declaration_kind(declaration)
+
+        if kind == "import":
+            return None
+        if kind == "function":
+            return declaration["function_name"]
+        if kind == "namespace":
+            return declaration["name"]
+        if kind == "enum":
+            # TsToJson.enum maps the name of the enum to the type of its token
+            return next((key for key, value in declaration.items() if value == "CNAME"), None)
+
+        return next(iter(declaration))
+
+
+def declaration_tree_name(tree):
+        """
+        Returns the name of a top-level parse tree, as declaration_name returns it for
+        the transformed declaration, without transforming the tree.
+        """
+        if tree.data == "import_stmt":
+            return None
+
+        return extract_function_or_class_name(tree.children)
+
+
+def numbered_keys(names):
+        """
+        Returns a stable key for every name: the name itself, numbered if it occurs more
+        than once ("name#2"), None (e.g. for imports) becomes "<import>".
+        """
+        keys = []
+        seen = {}
+
+        for name in names:
+            name = "<import>" if name is None else name
+            seen[name] = seen.get(name, 0) + 1
+            keys.append(name if seen[name] == 1 else "{}#{}".format(name, seen[name]))
+
+        return keys
+
+
+def _json_key(key):
+    if isinstance(key, str):
+        return key
+    if key is True or key is False or key is None:
+        return json.dumps(key)
+    if isinstance(key, (int, float)):
+        return json.dumps(key)
+
+    raise TypeError("keys must be str, int, float, bool or None, not {}".format(type(key).__name__))
+
+
+def format_json(value):
+    """
+    Returns the same text as json.dumps(value, indent=4, sort_keys=True), without
+    recursion.
+
+    json.dumps encodes indented output with a recursive generator, so that types
+    nested a few hundred levels deep (which NonRecursiveTransformer transforms) raise
+    a RecursionError. This encoder keeps the parts still to write on a stack instead.
+    """
+    chunks = []
+    # every entry is either text to append or a (value, level) to encode
+    pending = [(value, 0)]
+
+    while pending:
+        item = pending.pop()
+
+        if type(item) is str:
+            chunks.append(item)
+            continue
+
+        value, level = item
+
+        if isinstance(value, str):
+            chunks.append(encode_basestring_ascii(value))
+        elif value is None:
+            chunks.append("null")
+        elif value is True:
+            chunks.append("true")
+        elif value is False:
+            chunks.append("false")
+        elif isinstance(value, (int, float)):
+            chunks.append(json.dumps(value))
+        elif isinstance(value, dict):
+            if not value:
+                chunks.append("{}")
+                continue
+
+            indent = "\n" + "    " * (level + 1)
+            items = sorted(value.items())
+            pending.append("\n" + "    " * level + "}")
+
+            for i in range(len(items) - 1, -1, -1):
+                pending.append((items[i][1], level + 1))
+                pending.append(("{" if i == 0 else ",") + indent + encode_basestring_ascii(_json_key(items[i][0])) + ": ")
+        elif isinstance(value, (list, tuple)):
+            if not value:
+                chunks.append("[]")
+                continue
+
+            indent = "\n" + "    " * (level + 1)
+            pending.append("\n" + "    " * level + "]")
+
+            for i in range(len(value) - 1, -1, -1):
+                pending.append((value[i], level + 1))
+                pending.append(("[" if i == 0 else ",") + indent)
+        else:
+            raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+    return "".join(chunks)
@@ -0,0 +1,428 @@
+import hashlib
+import importlib.util
+import json
+import os
+import re
+import tempfile
+
+from src.inheritance import InheritanceResolver
+
+# Bump whenever the generated code changes, so that cached validators are regenerated.
+GENERATOR_VERSION = 2
+
+_NUMBER_LITERAL = re.compile(r"-?\d+(\.\d+)?$")
+# Generic types that are objects in a payload, whatever their type arguments are
+_GENERIC_OBJECTS = ("Record", "Map", "Partial", "Required", "Readonly", "Pick", "Omit")
+_GENERIC_ARRAYS = ("Array", "ReadonlyArray")
+
+class ValidationError(ValueError):
+    def __init__(self, path, message):
+        self.path = path
+        self.message = message
+        super().__init__("{}: {}".format(path, message))
+
+
+def _members(resolver, name):
+    """
+    Returns the attributes of an interface including the inherited ones, without the
+    functions, since they can not be part of a JSON payload.
+    """
+    return {k: v for k, v in resolver.flattened(name).items() if not v.get("function")}
+
+
+def _index_signature(members):
+    for name, member in members.items():
+        if "indexed" in member:
+            return name, member
+    return None, None
+
+
+def _generic(name):
+    if name in _GENERIC_ARRAYS:
+        return "any", None, 1
+
+    if name in _GENERIC_OBJECTS:
+        return "name", "object", 0
+
+    # e.g. Promise or a generic interface, checked like the type without arguments
+    return "name", name, 0
+
+
+def _alternatives(type_spec):
+    """
+    Splits the "type" of an attribute into its alternatives. Every alternative is a tuple
+    (kind, value, dimensions), where kind is "name", "object" or "any" and dimensions is
+    the number of array dimensions. TsToJson emits "T", "[]" for arrays and "T[]" for the
+    arrays of a union after its first type. It drops the type arguments of generics and
+    emits "Record<K, V>" as "Record[]" too, always as the first type, see _generic.
+    """
+    if isinstance(type_spec, dict):
+        return [("object", type_spec, 0)]
+
+    alternatives = []
+
+    for item in type_spec:
+        if isinstance(item, dict):
+            alternatives.append(("any", None, 0))
+        elif not alternatives and item.endswith("[]") and not item.endswith("[][]") and item != "[]":
+            alternatives.append(_generic(item[:-2]))
+        elif item.startswith("[]") and item.strip("[]") == "" and alternatives:
+            kind, value, dimensions = alternatives[-1]
+            alternatives[-1] = (kind, value, dimensions + item.count("[]"))
+        else:
+            base = item
+            dimensions = 0
+
+            while base.endswith("[]"):
+                base = base[:-2]
+                dimensions += 1
+
+            alternatives.append(("name", base, dimensions))
+
+    return alternatives
+
+
+class _Walker:
+    """
+    Validates payloads by walking the transformed declarations. This is the reference
+    implementation of the generated validators and reports where a payload is invalid.
+    """
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+
+    def interface(self, name, value, path):
+        if type(value) is not dict:
+            return "{}: expected an object of type {}".format(path, name)
+
+        members = _members(self.resolver, name)
+        return self.members(members, value, path)
+
+    def members(self, members, value, path):
+        index_name, index = _index_signature(members)
+
+        for name, member in members.items():
+            if member is index:
+                continue
+
+            if name not in value:
+                if not member.get("optional"):
+                    return "{}.{}: is required".format(path, name)
+                continue
+
+            error = self.type(member.get("type", ["any"]), value[name], "{}.{}".format(path, name))
+
+            if error:
+                return error
+
+        if index is not None:
+            for key, item in value.items():
+                if key in members and members[key] is not index:
+                    continue
+
+                if "number" in index["indexed"].get("type", []) and not _NUMBER_LITERAL.match(key):
+                    return "{}.{}: expected a numeric key".format(path, key)
+
+                error = self.type(index.get("type", ["any"]), item, "{}.{}".format(path, key))
+
+                if error:
+                    return error
+
+        return None
+
+    def type(self, type_spec, value, path):
+        errors = [self.alternative(alternative, value, path) for alternative in _alternatives(type_spec)]
+
+        if not errors or None in errors:
+            return None
+
+        return errors[0] if len(errors) == 1 else "{}: does not match any of {}".format(path, type_spec)
+
+    def alternative(self, alternative, value, path):
+        kind, name, dimensions = alternative
+
+        if dimensions:
+            if type(value) is not list:
+                return "{}: expected an array".format(path)
+
+            for i, item in enumerate(value):
+                error = self.alternative((kind, name, dimensions - 1), item, "{}[{}]".format(path, i))
+
+                if error:
+                    return error
+
+            return None
+
+        if kind == "any":
+            return None
+
+        if kind == "object":
+            if type(value) is not dict:
+                return "{}: expected an object".format(path)
+            return self.members(name, value, path)
+
+        if name in self.resolver:
+            return self.interface(name, value, path)
+
+        if _matches_name(name, value):
+            return None
+
+        return "{}: expected {}".format(path, name)
+
+
+def _matches_name(name, value):
+    if name == "string" or name == "Date":
+        return type(value) is str
+    if name == "number":
+        return type(value) is int or type(value) is float
+    if name == "boolean":
+        return type(value) is bool
+    if name in ("null", "undefined", "void"):
+        return value is None
+    if name in ("object", "Object"):
+        return type(value) is dict
+    if name in ("true", "false"):
+        return value is (name == "true")
+    if len(name) > 1 and name[0] == name[-1] == '"':
+        return value == name[1:-1] and type(value) is str
+    if _NUMBER_LITERAL.match(name):
+        return type(value) is not bool and value == json.loads(name)
+
+    # any, unknown and every type we know nothing about
+    return True
+
+
+def _name_expression(name, var, predicates):
+    if name in predicates:
+        return "{}({})".format(predicates[name], var)
+    if name == "string" or name == "Date":
+        return "type({}) is str".format(var)
+    if name == "number":
+        return "(type({0}) is int or type({0}) is float)".format(var)
+    if name == "boolean":
+        return "type({}) is bool".format(var)
+    if name in ("null", "undefined", "void"):
+        return "{} is None".format(var)
+    if name in ("object", "Object"):
+        return "type({}) is dict".format(var)
+    if name in ("true", "false"):
+        return "{} is {}".format(var, name.capitalize())
+    if len(name) > 1 and name[0] == name[-1] == '"':
+        return "({} == {!r} and type({}) is str)".format(var, name[1:-1], var)
+    if _NUMBER_LITERAL.match(name):
+        return "(type({}) is not bool and {} == {!r})".format(var, var, json.loads(name))
+    return None
+
+
+class _Generator:
+    """
+    Generates the source of a module with one predicate function per interface.
+    """
+
+    def __init__(self, resolver):
+        self.resolver = resolver
+        self.predicates = {name: "_is_{}".format(i) for i, name in enumerate(sorted(resolver))}
+        self.functions = []
+        self.helpers = 0
+
+    def generate(self):
+        for name in sorted(self.resolver):
+            self.members_function(self.predicates[name], _members(self.resolver, name))
+
+        lines = ["# Generated validators, do not edit.",
+                 "import re",
+                 "",
+                 "_MISSING = object()",
+                 "_NUMBER_KEY = re.compile({!r})".format(_NUMBER_LITERAL.pattern),
+                 ""]
+
+        for function in self.functions:
+            lines.extend(function)
+            lines.append("")
+
+        lines.append("PREDICATES = {")
+
+        for name in sorted(self.resolver):
+            lines.append("    {!r}: {},".format(name, self.predicates[name]))
+
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def members_function(self, function_name, members):
+        index_name, index = _index_signature(members)
+        body = ["def {}(value):".format(function_name),
+                "    if type(value) is not dict:",
+                "        return False"]
+
+        for name, member in sorted(members.items()):
+            if member is index:
+                continue
+
+            expression = self.type_expression(member.get("type", ["any"]), "v", 0)
+            body.append("    v = value.get({!r}, _MISSING)".format(name))
+
+            if member.get("optional"):
+                if expression != "True":
+                    body.append("    if v is not _MISSING and not ({}):".format(expression))
+                    body.append("        return False")
+            else:
+                body.append("    if v is _MISSING:")
+                body.append("        return False")
+
+                if expression != "True":
+                    body.append("    if not ({}):".format(expression))
+                    body.append("        return False")
+
+        if index is not None:
+            known = tuple(sorted(k for k, v in members.items() if v is not index))
+            expression = self.type_expression(index.get("type", ["any"]), "v", 0)
+
+            if "number" in index["indexed"].get("type", []):
+                key_check = "_NUMBER_KEY.match(k) is None or "
+            else:
+                key_check = ""
+
+            if key_check or expression != "True":
+                body.append("    for k, v in value.items():")
+                body.append("        if k not in {!r} and ({}not ({})):".format(known, key_check, expression))
+                body.append("            return False")
+
+        body.append("    return True")
+        self.functions.append(body)
+
+    def type_expression(self, type_spec, var, depth):
+        expressions = []
+
+        for alternative in _alternatives(type_spec):
+            expression = self.alternative_expression(alternative, var, depth)
+
+            if expression == "True":
+                return "True"
+
+            expressions.append(expression)
+
+        if not expressions:
+            return "True"
+
+        return expressions[0] if len(expressions) == 1 else "(" + " or ".join(expressions) + ")"
+
+    def alternative_expression(self, alternative, var, depth):
+        kind, name, dimensions = alternative
+
+        if dimensions:
+            item = "x{}".format(depth)
+            inner = self.alternative_expression((kind, name, dimensions - 1), item, depth + 1)
+
+            if inner == "True":
+                return "type({}) is list".format(var)
+
+            return "(type({0}) is list and all({1} for {2} in {0}))".format(var, inner, item)
+
+        if kind == "any":
+            return "True"
+
+        if kind == "object":
+            self.helpers += 1
+            helper = "_object_{}".format(self.helpers)
+            self.members_function(helper, name)
+            return "{}({})".format(helper, var)
+
+        return _name_expression(name, var, self.predicates) or "True"
+
+
+def generate_source(declarations):
+    """
+    Generates the python source of the validators of all interfaces of the declarations.
+
+    Returns:
+    str: The source of a module that defines PREDICATES, a dictionary that maps every
+    interface name to a function returning whether a payload matches the interface.
+    """
+    return _Generator(InheritanceResolver(declarations)).generate()
+
+
+def _load_module(path):
+    spec = importlib.util.spec_from_file_location("_ts_validators_" + os.path.basename(path)[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class Validators:
+    """
+    Validators for the interfaces of a set of declarations.
+
+    validators["Name"](payload) raises a ValidationError that names the offending path if
+    the payload does not match the interface Name. validators.is_valid("Name", payload)
+    just returns whether it matches.
+
+    The checks are compiled to specialized python functions, which is several times
+    faster than walking the declarations for every payload. If a cache directory is
+    given, the generated module is stored there under the hash of the declarations and
+    reloaded (with its byte code) instead of generated on the next run.
+    """
+
+    def __init__(self, declarations, cache_dir=None):
+        self.resolver = InheritanceResolver(declarations)
+        self.walker = _Walker(self.resolver)
+
+        if cache_dir is None:
+            namespace = {}
+            exec(compile(_Generator(self.resolver).generate(), "<validators>", "exec"), namespace)
+            self.predicates = namespace["PREDICATES"]
+        else:
+            self.predicates = self._load_cached(declarations, cache_dir).PREDICATES
+
+        self._validators = {}
+
+    def _load_cached(self, declarations, cache_dir):
+        key = hashlib.sha256(json.dumps([GENERATOR_VERSION, declarations], sort_keys=True).encode("utf-8")).hexdigest()
+        path = os.path.join(cache_dir, "validators_{}.py".format(key[:32]))
+
+        if not os.path.isfile(path):
+            os.makedirs(cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+
+            with os.fdopen(fd, "w") as var:
+                var.write(_Generator(self.resolver).generate())
+
+            os.replace(tmp_path, path)
+
+        return _load_module(path)
+
+    def __contains__(self, name):
+        return name in self.predicates
+
+    def __iter__(self):
+        return iter(self.predicates)
+
+    def __getitem__(self, name):
+        validator = self._validators.get(name)
+
+        if validator is None:
+            predicate = self.predicates[name]
+
+            def validator(value):
+                if not predicate(value):
+                    # only failures pay for the walk that locates the error
+                    raise ValidationError(name, self.walker.interface(name, value, name) or "invalid payload")
+
+            self._validators[name] = validator
+
+        return validator
+
+    def is_valid(self, name, value):
+        return self.predicates[name](value)
+
+
+def validate(declarations, name, value):
+    """
+    Validates a payload against an interface by walking the declarations, without compiling validators.
+
+    Raises:
+    ValidationError: If the payload does not match the interface.
+    """
+    error = _Walker(InheritanceResolver(declarations)).interface(name, value, name)
+
+    if error:
+        raise ValidationError(name, error)
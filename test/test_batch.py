@@ -0,0 +1,113 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+from src import batch
+from src.batch import ParseHandler, process_file, read_source, run_batch
+from src.limits import ChartGuard, ChartLimitExceeded
+from src.parser import tsParser
+from src.pipeline import Pipeline
+from src.sqlite_store import file_hash
+
+
+class TestBatch(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.simple = self.write("simple.ts", "interface A { a: number; }")
+        self.broken = self.write("broken.ts", "type A = B;")
+        # classes are only understood by the Earley parser, whose chart the long union fills
+        self.earley_only = self.write("earley_only.ts", "namespace N { class C {} interface U { u: %s; } }" % " | ".join("T{}".format(i) for i in range(300)))
+        self.slow = self.write("slow.ts", "interface Slow { a: number; }")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+
+        with open(path, "w") as var:
+            var.write(content)
+
+        return path
+
+    def test_chart_guard(self):
+        with ChartGuard(tsParser, None) as guard:
+            tsParser.parse("interface A { a: number; }")
+
+        self.assertGreater(guard.items, 0)
+
+        with self.assertRaises(ChartLimitExceeded):
+            with ChartGuard(tsParser, 100):
+                tsParser.parse("interface A { a: number; }")
+
+        # the guard is removed again
+        tsParser.parse("interface A { a: number; }")
+
+    def slow_transform(self):
+        transform = batch.transform
+
+        def slow(content, *args, **kwargs):
+            # blocks until the time limit interrupts it, however fast the machine is
+            if "Slow" in content:
+                time.sleep(60)
+
+            return transform(content, *args, **kwargs)
+
+        return mock.patch.object(batch, "transform", slow)
+
+    def test_process_file_limits(self):
+        self.assertEqual(process_file(self.simple)["status"], "ok")
+        self.assertEqual(process_file(self.broken)["status"], "error")
+        self.assertEqual(process_file(self.earley_only, max_chart_items=1000)["status"], "ambiguity")
+
+        with self.slow_transform():
+            self.assertEqual(process_file(self.slow, timeout=0.05)["status"], "timeout")
+            self.assertEqual(process_file(self.simple, timeout=0.05)["status"], "ok")
+
+    def test_run_batch(self):
+        results = run_batch([self.simple, self.broken, self.earley_only], jobs=2, max_chart_items=1000)
+
+        self.assertEqual([r["status"] for r in results], ["ok", "error", "ambiguity"])
+        self.assertIn('"A"', results[0]["declarations"][0])
+        self.assertEqual(results[1]["declarations"], [])
+
+    def test_pipeline(self):
+        missing = os.path.join(self.directory, "missing.ts")
+        pipeline = Pipeline(capacity=1)
+        pipeline.stage("read", read_source)
+        pipeline.stage("parse", make_handler=ParseHandler, workers=2)
+        results = {r["file"]: r for r in pipeline.run([self.simple, self.broken, missing])}
+
+        self.assertEqual([results[path]["status"] for path in (self.simple, self.broken, missing)], ["ok", "error", "error"])
+        self.assertEqual(results[self.simple]["declarations"], process_file(self.simple)["declarations"])
+        self.assertEqual(results[self.simple]["size"], len("interface A { a: number; }"))
+
+    def test_read_source(self):
+        path = os.path.join(self.directory, "crlf.ts")
+
+        with open(path, "wb") as var:
+            var.write(b"interface A {\r\n    a: number;\r\n}\r\n")
+
+        task = read_source(path)
+
+        # the content is read like open(path, "r"), the hash is the one of the bytes it was read from
+        with open(path, "r") as var:
+            self.assertEqual(task["content"], var.read())
+
+        self.assertEqual(task["hash"], file_hash(path))
+        self.assertEqual(read_source(os.path.join(self.directory, "missing.ts")),
+                         {"file": os.path.join(self.directory, "missing.ts"), "content": None, "hash": None})
+
+    @unittest.skipUnless(multiprocessing.get_start_method() == "fork", "the workers have to inherit the patched transform")
+    def test_pipeline_timeout(self):
+        pipeline = Pipeline(capacity=1)
+        pipeline.stage("read", read_source)
+        pipeline.stage("parse", make_handler=lambda: ParseHandler(timeout=0.05), workers=2)
+
+        with self.slow_transform():
+            results = {r["file"]: r["status"] for r in pipeline.run([self.simple, self.slow])}
+
+        self.assertEqual(results, {self.simple: "ok", self.slow: "timeout"})
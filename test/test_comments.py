@@ -0,0 +1,54 @@
+import unittest
+from lark import Tree
+from src import fastpath
+from src.parser import tsParser
+from src.scanner import extract_comments
+from src.transformation import TsToJson
+
+
+def transformed(tree):
+    return [TsToJson().transform(child) for child in tree.children if isinstance(child, Tree)]
+
+
+class TestComments(unittest.TestCase):
+    def test_comments_are_blanked_out(self):
+        text = 'a /* x\n y */ b "c // d" // e\nf'
+        blanked, comments = extract_comments(text)
+
+        self.assertEqual(len(blanked), len(text))
+        self.assertEqual(blanked.split(), ["a", "b", '"c', "//", 'd"', "f"])
+        self.assertEqual(blanked.count("\n"), text.count("\n"))
+        self.assertEqual([(kind, value) for kind, start, end, value in comments],
+                         [("comment", "/* x\n y */"), ("inline_comment", "// e\n")])
+        self.assertEqual(extract_comments("a b"), ("a b", []))
+
+    def test_comments_are_attached_to_declarations(self):
+        idata = """
+            /** ignored */
+            /** doc */
+            export interface A extends B {
+                /** first */
+                readonly a?: number | string[]; // inline
+                [key: string]: { x: Array<string>; };
+                b: Date // last
+            }
+
+            export function f(a: string): void {
+                // not a description
+                call(a); /* neither */
+            }
+
+            /** enum */
+            enum E { X = 1 }
+        """
+        declarations = transformed(tsParser.parse(idata))
+
+        self.assertEqual(declarations[0]["A"]["description"], "doc")
+        self.assertEqual(declarations[0]["A"]["a"]["description"], "// inline\n")
+        self.assertEqual(declarations[0]["A"]["b"]["description"], "// last\n")
+        self.assertNotIn("description", declarations[0]["A"]["key"])
+        self.assertEqual(declarations[1]["description"], "")
+        self.assertEqual(declarations[2]["enum"], {"description": "enum"})
+
+        # the fast path parses comments itself, the outputs have to match
+        self.assertEqual(declarations, transformed(fastpath.parse(idata)))
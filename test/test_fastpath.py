@@ -0,0 +1,217 @@
+import json
+import random
+import unittest
+from lark.exceptions import LarkError
+from src import fastpath
+from src.parser import tsParser, tsLalrParser
+from src.scanner import split_declarations
+from src.transformation import TsToJson, transform
+
+
+NAMES = ["a", "b", "label", "type", "value2", "_x", "readonly", "const", "extends", "string", "Foo"]
+SIMPLE_TYPES = ["number", "string", "any", "Date", "X.Y", '"x"', "1", "boolean", "null"]
+
+
+class DeclarationFuzzer:
+    """
+    Generates random interface and enum declarations, most of them within the subset of
+    the fast path, some of them outside of it or not even valid for the grammar.
+    """
+
+    def __init__(self, seed):
+        self.random = random.Random(seed)
+
+    def ws(self):
+        return self.random.choice(["", " ", " ", "  ", "\n", "\n    ", "\t"])
+
+    def sp(self):
+        return self.random.choice([" ", " ", "\n", "  \t"])
+
+    def name(self):
+        return self.random.choice(NAMES)
+
+    def tstype(self, depth=0):
+        choice = self.random.random()
+
+        if depth > 2 or choice < 0.4:
+            return self.random.choice(SIMPLE_TYPES)
+        if choice < 0.5:
+            return self.random.choice(SIMPLE_TYPES) + self.ws() + "[]"
+        if choice < 0.7:
+            members = [self.random.choice(SIMPLE_TYPES) + self.random.choice(["", "", "[]"])
+                       for _ in range(self.random.randint(1, 4))]
+            head = self.random.choice([self.random.choice(SIMPLE_TYPES), "", "string[]"])
+            return head + "".join(self.ws() + "|" + self.ws() + m for m in members)
+        if choice < 0.8:
+            args = ("," + self.ws()).join(self.tstype(depth + 1) for _ in range(self.random.randint(1, 2)))
+            return self.random.choice(["Array", "Promise", "Map", ""]) + "<" + args + ">" + self.random.choice(["", "", "[]"])
+        if choice < 0.95:
+            properties = [self.name() + self.ws() + ":" + self.ws() + self.tstype(depth + 1)
+                          for _ in range(self.random.randint(0, 3))]
+            separators = [self.random.choice([";", ",", "; ", ";;", ""]) for _ in properties]
+            return "{" + self.ws() + "".join(p + s + self.ws() for p, s in zip(properties, separators)) + "}"
+        return self.random.choice(["() => void", "[string, number]", "A & B", "'single'"])
+
+    def comment(self):
+        return self.random.choice(["/** doc */", "/*\n * multi\n * line\n */", "/* * / */"])
+
+    def typedef(self):
+        parts = []
+
+        if self.random.random() < 0.2:
+            parts.append(self.comment() + self.ws())
+        if self.random.random() < 0.2:
+            parts.append(self.random.choice(["const", "readonly"]) + self.sp())
+
+        choice = self.random.random()
+
+        if choice < 0.7:
+            parts.append(self.name())
+        elif choice < 0.8:
+            parts.append("[" + self.ws() + self.name() + self.ws() + ":" + self.ws() + self.tstype(1) + self.ws() + "]")
+        else:
+            params = ("," + self.ws()).join(self.name() + ":" + self.ws() + self.tstype(1)
+                                           for _ in range(self.random.randint(0, 2)))
+            parts.append(self.random.choice([self.name(), ""]) + "(" + params + ")")
+
+        parts.append(self.random.choice(["", "", "?"]) + self.ws() + ":" + self.ws() + self.tstype())
+        parts.append(self.random.choice([";", ";", ",", "", ";;"]))
+
+        if self.random.random() < 0.2:
+            parts.append(self.ws().replace("\n", "") + self.random.choice(["// inline\n", "// inline"]))
+
+        return "".join(parts)
+
+    def interface(self):
+        head = "interface" + self.sp() + self.random.choice(NAMES[:5] + ["interface"])
+
+        if self.random.random() < 0.3:
+            head += self.sp() + "extends" + self.sp() + ("," + self.ws()).join(
+                self.random.choice(["Base", "Other", "X"]) for _ in range(self.random.randint(1, 2)))
+
+        body = "".join(self.ws() + self.typedef() + "\n" for _ in range(self.random.randint(0, 4)))
+        return head + self.ws() + "{" + body + self.ws() + "}"
+
+    def enum(self):
+        members = [self.random.choice(["A", "B", "c1"]) + self.ws() + "=" + self.ws() +
+                   self.random.choice(["1", '"x"', "A.B", "-1", "'y'"]) + self.random.choice([",", "", ", "])
+                   for _ in range(self.random.randint(0, 3))]
+        return "enum" + self.sp() + self.random.choice(["E", "enum"]) + self.ws() + "{" + self.ws() + self.ws().join(members) + self.ws() + "}"
+
+    def declaration(self):
+        text = self.random.choice([self.interface, self.interface, self.enum])()
+
+        if self.random.random() < 0.3:
+            text = "export" + self.sp() + text
+        if self.random.random() < 0.3:
+            text = self.comment() + self.ws() + text
+
+        return text + self.random.choice(["", "", ";", " extra"])
+
+
+def output(children):
+    try:
+        return [json.dumps(TsToJson().transform(child), sort_keys=True) for child in children]
+    except LarkError as e:
+        # both parsers have to hand the same tree to the transformer, thus fail the same way
+        return str(e)
+
+
+def earley_output(text):
+    try:
+        children = tsParser.parse(text).children
+    except LarkError:
+        return None
+
+    return output(children)
+
+
+class TestFastPath(unittest.TestCase):
+    def test_fast_path_is_used(self):
+        idata = """
+            /** doc */
+            export interface A extends B {
+                readonly a?: number | string; // inline
+                [key: string]: { x: Array<string>; };
+                f(d: Date): void;
+            }
+        """
+        self.assertEqual(fastpath.parse_declaration(idata.strip()).data, "int")
+
+        with self.assertRaises(fastpath.Unsupported):
+            fastpath.parse_declaration("export function f(): void {}")
+
+    def test_fallback_for_other_declarations(self):
+        idata = """
+            interface A { a: number; }
+            export function f(a: string): void {}
+            enum E { A = 1 }
+        """
+        tree = fastpath.parse(idata)
+
+        self.assertEqual([child.data for child in tree.children], ["int", "function_decl", "enum"])
+        self.assertEqual(transform(idata), [json.dumps(TsToJson().transform(child), indent=4, sort_keys=True)
+                                            for start, end in split_declarations(idata)
+                                            for child in tsParser.parse(idata[start:end]).children])
+
+    def test_errors_are_reported_by_the_earley_parser(self):
+        with self.assertRaises(LarkError):
+            transform("interface A { a: number; } type B = A;")
+
+    def test_differential_fuzzing(self):
+        fuzzer = DeclarationFuzzer(1)
+        accepted = 0
+
+        for _ in range(500):
+            text = fuzzer.declaration()
+
+            try:
+                tree = fastpath.parse_declaration(text)
+            except fastpath.Unsupported:
+                continue
+
+            accepted += 1
+            self.assertEqual(output([tree]), earley_output(text), text)
+
+        self.assertGreater(accepted, 30)
+
+    def test_lalr_parser_matches_earley(self):
+        # within the fast path subset the Earley parser is unambiguous
+        fuzzer = DeclarationFuzzer(2)
+        accepted = 0
+
+        for _ in range(500):
+            text = fuzzer.declaration()
+
+            try:
+                fastpath.parse_declaration(text)
+            except fastpath.Unsupported:
+                continue
+
+            accepted += 1
+            self.assertEqual(output(tsLalrParser.parse(text).children), earley_output(text), text)
+
+        self.assertGreater(accepted, 30)
+
+        for text in [
+            'import { A, B } from "./a";',
+            'import * as X from "./b";',
+            "/** doc */ export async function f(a: string[], b?: number = 5): Promise<string> { if (a) { b(); } }",
+            "function f(options: ExtendedData[], divider: number = 5): a[] | null {}",
+            "function f(): { a: number; b: string } { return { a: 1 }; }",
+            "export namespace N { enum E { A = 1 } interface I { f(d: Date): void; } function f(): void {} }"
+        ]:
+            self.assertEqual(output(tsLalrParser.parse(text).children), earley_output(text), text)
+
+    def test_lalr_parser_is_used_before_earley(self):
+        idata = "export namespace N { function f(): void {} interface I { a: number; } }"
+        namespace = TsToJson().transform(fastpath.parse_statement(idata)[0])
+
+        # the Earley parser reads the interface as part of the return type of f
+        self.assertEqual([declaration.get("function_name", "I" in declaration) for declaration in namespace["content"]],
+                         ["f", True])
+
+        with self.assertRaises(LarkError):
+            tsLalrParser.parse("export class C {}")
+
+        self.assertEqual(fastpath.parse_statement("export class C {}")[0].data, "class_decl")
@@ -0,0 +1,93 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+from src import incremental
+from src.incremental import OutputManifest, declaration_keys
+from src.transformation import transform
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ts_interface_parser.py")
+
+
+class TestIncremental(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def test_declaration_keys(self):
+        declarations = [json.loads(j) for j in transform('import * as a from "./a"; import * as b from "./b"; interface A { a: number; }')]
+        self.assertEqual(declaration_keys(declarations), ["<import>", "<import>#2", "A"])
+
+    def test_delta(self):
+        manifest = OutputManifest(self.output)
+        first = transform("interface A { a: number; } interface B { b: number; }")
+
+        delta = manifest.update("a.ts", "1", "a.ts.json", first)
+        self.assertEqual((delta["added"], delta["written"]), (["A", "B"], True))
+        manifest.save()
+
+        manifest = OutputManifest(self.output)
+        self.assertTrue(manifest.is_current("a.ts", "1", "a.ts.json"))
+        self.assertFalse(manifest.is_current("a.ts", "2", "a.ts.json"))
+        self.assertFalse(manifest.is_current("a.ts", "1", "declarations.jsonl"))
+
+        delta = manifest.update("a.ts", "2", "a.ts.json", transform("interface A {\n    a: number;\n}\ninterface B { b: number; }"))
+        self.assertEqual(delta, {"added": [], "changed": [], "removed": [], "written": False, "moved_from": None})
+
+        delta = manifest.update("a.ts", "3", "a.ts.json", transform("interface A { a: string; } interface C { c: number; }"))
+        self.assertEqual(delta, {"added": ["C"], "changed": ["A"], "removed": ["B"], "written": True, "moved_from": None})
+
+        # a reordering changes the output, but no declaration
+        delta = manifest.update("a.ts", "4", "a.ts.json", transform("interface C { c: number; } interface A { a: string; }"))
+        self.assertEqual(delta, {"added": [], "changed": [], "removed": [], "written": True, "moved_from": None})
+
+        self.assertEqual(manifest.remove("a.ts"), ["C", "A"])
+        self.assertNotIn("a.ts", manifest.files)
+
+    def test_parser_version_and_options(self):
+        manifest = OutputManifest(self.output, options={"tolerant": False, "positions": False})
+        manifest.update("a.ts", "1", "a.ts.json", transform("interface A { a: number; }"))
+        manifest.save()
+
+        self.assertTrue(OutputManifest(self.output, options={"tolerant": False, "positions": False}).is_current("a.ts", "1", "a.ts.json"))
+        # the output of other options or another version of the parser is not kept
+        self.assertFalse(OutputManifest(self.output, options={"tolerant": False, "positions": True}).is_current("a.ts", "1", "a.ts.json"))
+
+        with mock.patch.object(incremental, "_parser_version", "upgraded"):
+            self.assertFalse(OutputManifest(self.output, options={"tolerant": False, "positions": False}).is_current("a.ts", "1", "a.ts.json"))
+
+    def batch(self, *options):
+        sources = [os.path.join(self.output, name) for name in ("a.ts", "b.ts")]
+
+        for path, name in zip(sources, ("A", "B")):
+            with open(path, "w") as var:
+                var.write("interface %s { a: number; }" % name)
+
+        return subprocess.run([sys.executable, SCRIPT] + sources + ["--output-dir", os.path.join(self.output, "out"), "-j", "1"] +
+                              list(options), stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True).stderr
+
+    def test_deleted_output(self):
+        self.batch()
+        os.remove(os.path.join(self.output, "out", "a.ts.json"))
+
+        # the unchanged source is processed again, since its output is gone
+        self.assertIn("1 unchanged files skipped, 1 outputs written", self.batch())
+
+        with open(os.path.join(self.output, "out", "a.ts.json"), "r") as var:
+            self.assertIn('"A"', var.read())
+
+        self.batch("--format", "declarations")
+        os.remove(os.path.join(self.output, "out", "a.ts", "A.json"))
+
+        self.assertIn("1 unchanged files skipped, 1 outputs written", self.batch("--format", "declarations"))
+        self.assertTrue(os.path.isfile(os.path.join(self.output, "out", "a.ts", "A.json")))
+
+
+if __name__ == '__main__':
+    unittest.main()
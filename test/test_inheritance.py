@@ -0,0 +1,70 @@
+import unittest
+from src.inheritance import InheritanceResolver, InheritanceCycle
+from src.transformation import transform_declarations
+
+
+class TestInheritance(unittest.TestCase):
+    def setUp(self):
+        self.resolver = InheritanceResolver()
+        self.resolver.update_file("base.ts", transform_declarations("""
+            interface Base { id: number; name: string; }
+            interface Named extends Base { name: number; }
+        """))
+        self.resolver.update_file("message.ts", transform_declarations("""
+            interface Message extends Named, External { body: string; }
+            interface Other { x: number; }
+        """))
+
+    def test_flattened(self):
+        self.assertEqual(list(self.resolver.flattened("Message")), ["id", "name", "body"])
+        self.assertEqual(self.resolver.flattened("Message")["name"], {"type": ["number"]})
+        self.assertEqual(self.resolver.bases("Message"), ["Named", "External", "Base"])
+
+    def test_memoized(self):
+        first = self.resolver.flattened("Message")
+        self.assertIs(self.resolver.flattened("Message"), first)
+        self.assertIn("Named", self.resolver.cache)
+
+    def test_invalidation(self):
+        self.resolver.flattened("Message")
+        self.resolver.flattened("Other")
+
+        self.resolver.update_file("base.ts", transform_declarations("""
+            interface Base { id: string; }
+            interface Named extends Base { name: number; }
+        """))
+
+        self.assertEqual(set(self.resolver.cache), {"Other"})
+        self.assertEqual(self.resolver.flattened("Message")["id"], {"type": ["string"]})
+
+        self.resolver.update_file("message.ts", transform_declarations("interface Other { x: number; }"))
+        self.assertNotIn("Message", self.resolver)
+
+        self.resolver.update_file("external.ts", transform_declarations("interface External { ext: number; }"))
+        self.resolver.flattened("Named")
+        self.assertEqual(self.resolver.flattened("Named"), {"id": {"type": ["string"]}, "name": {"type": ["number"]}})
+
+    def test_cycle(self):
+        self.resolver.update(transform_declarations("""
+            interface A extends B { a: number; }
+            interface B extends C { b: number; }
+            interface C extends A { c: number; }
+        """))
+
+        with self.assertRaises(InheritanceCycle) as context:
+            self.resolver.flattened("A")
+
+        self.assertEqual(context.exception.chain, ["A", "B", "C", "A"])
+
+    def test_deep_hierarchy(self):
+        # deeper than the recursion limit
+        source = "interface I0 { a0: number; }\n" + "".join(
+            "interface I{} extends I{} {{ a{}: number; }}\n".format(i, i - 1, i) for i in range(1, 3000))
+        resolver = InheritanceResolver(transform_declarations(source))
+
+        self.assertEqual(len(resolver.flattened("I2999")), 3000)
+        self.assertEqual(len(resolver.cache), 3000)
+
+
+if __name__ == '__main__':
+    unittest.main()
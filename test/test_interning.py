@@ -0,0 +1,44 @@
+import unittest
+from src.interning import InternTable
+from src.transformation import transform, transform_declarations
+
+
+class TestInterning(unittest.TestCase):
+    idata = """
+        interface Point {
+            x: number;
+            y: number;
+            label?: string;
+        }
+
+        interface Circle extends Point {
+            radius: number;
+            label: string;
+        }
+    """
+
+    def test_output_is_unchanged(self):
+        self.assertEqual(transform(self.idata, intern_table=InternTable()), transform(self.idata))
+
+    def test_type_lists_are_shared(self):
+        table = InternTable()
+        point, circle = transform_declarations(self.idata, intern_table=table)
+
+        self.assertIs(point["Point"]["x"]["type"], point["Point"]["y"]["type"])
+        self.assertIs(point["Point"]["x"]["type"], circle["Circle"]["radius"]["type"])
+        self.assertIs(point["Point"]["label"]["type"], circle["Circle"]["label"]["type"])
+
+    def test_shared_across_files(self):
+        table = InternTable()
+        first = transform_declarations(self.idata, intern_table=table)
+        second = transform_declarations(self.idata, intern_table=table)
+
+        self.assertIs(first[0]["Point"]["x"]["type"], second[0]["Point"]["x"]["type"])
+        self.assertIs(list(first[1]["Circle"])[0], list(second[1]["Circle"])[0])
+
+    def test_tstype_memoization(self):
+        table = InternTable()
+        transform_declarations(self.idata, intern_table=table)
+
+        self.assertEqual(table.misses, 2)
+        self.assertEqual(table.hits, 3)
@@ -0,0 +1,57 @@
+import unittest
+from src.transformation import parse_lazy, transform, transform_declarations
+from src.incremental import declaration_keys
+
+
+class TestLazy(unittest.TestCase):
+    def setUp(self):
+        self.content = """
+            import { B } from "./b";
+
+            /** doc */
+            export interface A {
+                a: number;
+            }
+
+            export namespace N {
+                enum E { X = 1 }
+            }
+
+            export function f(a: string): void {}
+
+            interface A {
+                b?: string[];
+            }
+        """
+
+    def test_declarations_are_transformed_on_access(self):
+        declarations = parse_lazy(self.content)
+
+        self.assertEqual(len(declarations), 5)
+        self.assertEqual(declarations.transformed, 0)
+
+        self.assertEqual(declarations["A"], {"A": {"description": "doc", "a": {"type": ["number"]}}})
+        self.assertIs(declarations[1], declarations["A"])
+        self.assertEqual(declarations.transformed, 1)
+
+        self.assertEqual(declarations[-1], declarations["A#2"])
+        self.assertEqual(declarations.transformed, 2)
+
+        with self.assertRaises(IndexError):
+            declarations[5]
+
+        with self.assertRaises(KeyError):
+            declarations["missing"]
+
+    def test_same_as_transform(self):
+        declarations = parse_lazy(self.content)
+        expected = transform_declarations(self.content)
+
+        self.assertEqual(declarations.keys(), declaration_keys(expected))
+        self.assertEqual(declarations.keys(), ["<import>", "A", "N", "f", "A#2"])
+        self.assertEqual(list(declarations), expected)
+        self.assertEqual(declarations[1:3], expected[1:3])
+        self.assertEqual(dict(declarations.items()), dict(zip(declarations.keys(), expected)))
+        self.assertEqual([declarations.formatted(i) for i in range(len(declarations))], transform(self.content))
+        self.assertIn("N", declarations)
+        self.assertIsNone(declarations.get("missing"))
@@ -0,0 +1,48 @@
+import unittest
+from src.memory import MemoryProfiler, format_report, profile_source, current_rss
+from src.transformation import transform_declarations
+
+
+class TestMemory(unittest.TestCase):
+    def setUp(self):
+        self.content = "\n".join("""
+            /** doc */
+            export interface A{0} {{
+                a: number;
+                b?: string[];
+            }}
+            export function f{0}(a: string): void {{ return; }}
+        """.format(i) for i in range(50))
+
+    def test_stages_are_recorded(self):
+        with MemoryProfiler(top=3) as profiler:
+            declarations = profile_source(profiler, self.content, "a.ts")
+
+        self.assertEqual(declarations, transform_declarations(self.content))
+        self.assertEqual([r["stage"] for r in profiler.records], ["parse", "transform", "serialize"])
+
+        for record in profiler.records:
+            self.assertEqual((record["source"], record["size"]), ("a.ts", len(self.content)))
+            self.assertGreaterEqual(record["peak"], record["retained"])
+            self.assertLessEqual(len(record["top"]), 3)
+
+        parse, transform, serialize = profiler.records
+        # the tree is kept until the declarations are transformed, the JSON strings are not kept
+        self.assertGreater(parse["retained"], 0)
+        self.assertGreater(transform["retained"], 0)
+        self.assertLess(serialize["retained"], serialize["peak"])
+        self.assertTrue(parse["top"])
+
+        if current_rss() is not None:
+            self.assertGreater(parse["rss_peak"], 0)
+
+    def test_format_report(self):
+        with MemoryProfiler(top=2) as profiler:
+            for count in (1, 2):
+                profile_source(profiler, self.content * count, "{}.ts".format(count))
+
+        report = format_report(profiler.records, 2)
+
+        self.assertIn("parse: max peak", report)
+        self.assertIn("peak bytes per input byte", report)
+        self.assertEqual(report.count("2.ts"), 3)
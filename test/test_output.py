@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from src.incremental import OutputManifest, declaration_keys
+from src.output import ArchiveError, DeclarationOutput, FILE_MODE, JsonlArchive, JsonlOutput, JsonOutput, merge_archives, write_atomic
+from src.transformation import transform
+
+
+class TestOutput(unittest.TestCase):
+    def setUp(self):
+        self.output = tempfile.mkdtemp()
+        self.jsons = transform('import * as a from "./a"; interface A { a: number; } /** a  b\n   c */ interface B { b: "x"; }')
+        self.keys = declaration_keys([json.loads(j) for j in self.jsons])
+
+    def tearDown(self):
+        shutil.rmtree(self.output)
+
+    def files(self):
+        return sorted(os.path.relpath(os.path.join(d, f), self.output) for d, _, fs in os.walk(self.output) for f in fs)
+
+    def test_json_output(self):
+        writer = JsonOutput(self.output)
+        writer.write("dir/a.ts", self.jsons, self.keys)
+        writer.close()
+
+        with open(os.path.join(self.output, "dir", "a.ts.json")) as var:
+            self.assertEqual([json.dumps(d, indent=4, sort_keys=True) for d in json.load(var)], self.jsons)
+
+        self.assertEqual(self.files(), ["dir/a.ts.json"])
+
+    def test_declaration_output(self):
+        writer = DeclarationOutput(self.output, batch_size=2)
+        writer.write("a.ts", self.jsons, self.keys)
+        writer.close()
+
+        self.assertEqual(self.files(), ["a.ts/A.json", "a.ts/B.json", "a.ts/_import_.json"])
+
+        writer = DeclarationOutput(self.output, durable=True)
+        writer.write("a.ts", self.jsons[1:2], ["A"], {"added": [], "changed": ["A"], "removed": ["B", "<import>"], "written": True})
+        writer.close()
+
+        self.assertEqual(self.files(), ["a.ts/A.json"])
+
+    def test_has(self):
+        writer = DeclarationOutput(self.output)
+        writer.write("a.ts", self.jsons, self.keys)
+        writer.close()
+        os.remove(os.path.join(self.output, "a.ts", "B.json"))
+
+        # a single missing declaration makes the output incomplete
+        self.assertTrue(writer.has("a.ts", ["A"]))
+        self.assertFalse(writer.has("a.ts", self.keys))
+
+        writer.write("a.ts", self.jsons, self.keys, {"added": [], "changed": [], "removed": [], "written": True, "rewrite": True})
+        writer.close()
+
+        self.assertTrue(writer.has("a.ts", self.keys))
+
+    def test_format_switch(self):
+        manifest = OutputManifest(self.output)
+
+        for writer_class, files in ((JsonOutput, ["a.ts.json"]),
+                                    (DeclarationOutput, ["a.ts/A.json", "a.ts/B.json", "a.ts/_import_.json"]),
+                                    (JsonOutput, ["a.ts.json"])):
+            writer = writer_class(self.output)
+            delta = manifest.update("a.ts", "1", writer.location("a.ts"), self.jsons)
+            writer.write("a.ts", self.jsons, self.keys, delta)
+            writer.close()
+
+            # all declarations are written again and the output of the other format is removed
+            self.assertEqual([f for f in self.files() if not f.startswith(".")], files)
+
+    def test_file_mode(self):
+        write_atomic(os.path.join(self.output, "a.json"), "[]")
+        writer = JsonlOutput(self.output)
+        writer.close()
+
+        for name in ("a.json", "declarations.jsonl", "declarations.jsonl.idx"):
+            self.assertEqual(os.stat(os.path.join(self.output, name)).st_mode & 0o777, FILE_MODE)
+
+    def test_jsonl_archive(self):
+        writer = JsonlOutput(self.output)
+        writer.write("a.ts", self.jsons, self.keys)
+        writer.write("b.ts", self.jsons[1:], self.keys[1:])
+        writer.close()
+
+        with open(os.path.join(self.output, "declarations.jsonl")) as var:
+            lines = [json.loads(line) for line in var]
+
+        self.assertEqual([(l["source"], l["key"]) for l in lines],
+                         [("a.ts", "<import>"), ("a.ts", "A"), ("a.ts", "B"), ("b.ts", "A"), ("b.ts", "B")])
+
+        with JsonlArchive(os.path.join(self.output, "declarations.jsonl")) as archive:
+            self.assertEqual(archive.get("b.ts", "B"), json.loads(self.jsons[2]))
+            self.assertEqual(archive.declarations("a.ts"), [json.loads(j) for j in self.jsons])
+
+        # unchanged sources are copied from the previous archive
+        writer = JsonlOutput(self.output)
+        self.assertTrue(writer.has("b.ts"))
+        writer.keep("b.ts")
+        writer.close()
+
+        with JsonlArchive(os.path.join(self.output, "declarations.jsonl")) as archive:
+            self.assertEqual(list(archive.sources), ["b.ts"])
+            self.assertEqual(archive.keys("b.ts"), ["A", "B"])
+
+        merge_archives(self.output, [os.path.join(self.output, "declarations.jsonl")] * 2, "merged.jsonl")
+
+        with JsonlArchive(os.path.join(self.output, "merged.jsonl")) as archive:
+            self.assertEqual(len(archive.raw("b.ts")), 4)
+
+        with open(os.path.join(self.output, "declarations.jsonl"), "a") as var:
+            var.write("\n")
+
+        with self.assertRaises(ArchiveError):
+            JsonlArchive(os.path.join(self.output, "declarations.jsonl"))
+
+    def test_jsonl_abort(self):
+        writer = JsonlOutput(self.output)
+        writer.write("a.ts", self.jsons, self.keys)
+        writer.close()
+        archive = self.files()
+
+        # a failed batch leaves neither a temporary file nor a changed archive behind
+        writer = JsonlOutput(self.output)
+        writer.write("b.ts", self.jsons, self.keys)
+        writer.abort()
+        self.assertEqual(self.files(), archive)
+
+        with self.assertRaises(OSError):
+            merge_archives(self.output, [os.path.join(self.output, "declarations.jsonl"), os.path.join(self.output, "missing.jsonl")], "merged.jsonl")
+
+        self.assertEqual(self.files(), archive)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,10 @@
 import json
+import sys
 import unittest
 import re
 from ts_interface_parser import transform
+from src.transformation import transform_declarations
+from src.util import format_json
 
 
 class TestParser(unittest.TestCase):
@@ -407,7 +410,7 @@ class TestParser(unittest.TestCase):
             }
         }
 }"""
-       # self.assertEqualJSON(transform(idata)[0], target)
+        self.assertEqualJSON(transform(idata)[0], target)
 
     def test_indexable_readonly_types(self):
         idata = """
@@ -569,7 +572,7 @@ class TestParser(unittest.TestCase):
             }
         }
 }"""
-        # self.assertEqualJSON(transform(idata)[0], target)
+        self.assertEqualJSON(transform(idata)[0], target)
 
     def test_nested_types(self):
         idata = """
@@ -591,4 +594,46 @@ class TestParser(unittest.TestCase):
                 }
         }
 }"""
-        # self.assertEqualJSON(transform(idata)[0], target)
+        self.assertEqualJSON(transform(idata)[0], target)
+
+    def test_long_union(self):
+        members = ["T{}".format(i) for i in range(1000)]
+        idata = """
+			interface Generated {
+                value: %s;
+            }
+        """ % " | ".join(members)
+
+        result = json.loads(transform(idata)[0])
+
+        self.assertEqual(result["Generated"]["value"]["type"], members)
+
+    def test_deeply_nested_types(self):
+        depth = 500
+        idata = """
+			interface Generated {
+                value: %s string %s;
+            }
+        """ % ("{ x: " * depth, "}" * depth)
+
+        declaration = transform_declarations(idata)[0]
+        result = declaration["Generated"]["value"]
+
+        for _ in range(depth):
+            result = result["type"]["x"]
+
+        self.assertEqual(result, {"type": ["string"]})
+
+        # transform serializes without recursion, json.dumps only gets as deep with a higher limit
+        formatted = transform(idata)[0]
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(10 * depth + limit)
+
+        try:
+            self.assertEqual(formatted, json.dumps(declaration, indent=4, sort_keys=True))
+        finally:
+            sys.setrecursionlimit(limit)
+
+    def test_format_json(self):
+        for value in [{}, [], "ä\n\"", {"b": [1, 2.5, None, True, {}, []], "a": {"c": ("x", -1)}}, {2: "x", 1: None}]:
+            self.assertEqual(format_json(value), json.dumps(value, indent=4, sort_keys=True))
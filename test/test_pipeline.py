@@ -0,0 +1,67 @@
+import threading
+import time
+import unittest
+from src.pipeline import Pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def test_stages(self):
+        pipeline = Pipeline(capacity=2)
+        pipeline.stage("double", lambda x: x * 2, workers=3)
+        pipeline.stage("increment", lambda x: x + 1)
+
+        self.assertEqual(sorted(pipeline.run(range(100))), [2 * x + 1 for x in range(100)])
+        self.assertEqual([(name, workers, items) for name, workers, items, busy in pipeline.utilization()],
+                         [("double", 3, 100), ("increment", 1, 100)])
+        self.assertIn("bottleneck: ", pipeline.format_utilization())
+        # a pipeline can be run again
+        self.assertEqual(list(pipeline.run([1])), [3])
+
+    def test_backpressure(self):
+        produced = []
+
+        def items():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        def slow(x):
+            time.sleep(0.01)
+            return x
+
+        pipeline = Pipeline(capacity=2).stage("fast", lambda x: x, workers=2).stage("slow", slow)
+        results = pipeline.run(items())
+        next(results)
+        time.sleep(0.2)
+
+        # the source is only read as far as the queues and threads hold items
+        self.assertLess(len(produced), 20)
+        results.close()
+
+        fast, slow_stage = pipeline.utilization()
+        self.assertLess(slow_stage[2], 1000)
+        self.assertGreater(slow_stage[3], fast[3])
+
+    def test_errors(self):
+        def fail(x):
+            if x == 5:
+                raise ValueError("five")
+
+            return x
+
+        closed = []
+
+        class Handler:
+            def __call__(self, x):
+                return x
+
+            def close(self):
+                closed.append(threading.current_thread())
+
+        pipeline = Pipeline(capacity=1).stage("fail", fail).stage("handler", make_handler=Handler, workers=2)
+
+        with self.assertRaises(ValueError):
+            list(pipeline.run(range(10)))
+
+        # every thread closed its handler
+        self.assertEqual(len(closed), 2)
@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from src.limits import ChartGuard
+from src.parser import tsParser
+from src.pool import ParserPool, Parsers, PoolExhausted
+from src.transformation import transform_declarations
+
+
+class TestPool(unittest.TestCase):
+    def setUp(self):
+        self.sources = ["""
+            export interface A{0} {{ a: number; b?: string[]; }}
+            export function f{0}(a: string): void {{ return; }}
+            namespace N{0} {{ enum E {{ X = {0} }} }}
+            export function g{0}(): A | B | C {{}}
+        """.format(i) for i in range(16)]
+
+    def run_threads(self, pool, threads=8):
+        results = {}
+        in_use = set()
+        lock = threading.Lock()
+        conflicts = []
+
+        def work(i):
+            with pool.parsers() as parsers:
+                with lock:
+                    if id(parsers) in in_use:
+                        conflicts.append(i)
+                    in_use.add(id(parsers))
+
+                time.sleep(0.001)
+
+                with lock:
+                    in_use.discard(id(parsers))
+
+            results[i] = pool.transform_declarations(self.sources[i])
+
+        workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+
+        for worker in workers:
+            worker.start()
+
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(conflicts, [])
+        return results
+
+    def test_modes(self):
+        for mode in ("shared", "free_threaded"):
+            pool = ParserPool(max_instances=3, mode=mode)
+            results = self.run_threads(pool, 16)
+
+            self.assertEqual(results, {i: transform_declarations(s) for i, s in enumerate(self.sources)}, mode)
+            self.assertLessEqual(pool.created, 3)
+
+        with self.assertRaises(ValueError):
+            ParserPool(mode="unknown")
+
+    def test_exhausted(self):
+        for mode in ("shared", "free_threaded"):
+            # the parsers are held until the thread is done, so it gives up at once
+            pool = ParserPool(max_instances=1, mode=mode, timeout=0)
+            errors = []
+
+            def work():
+                try:
+                    pool.parse("interface A { a: number; }")
+                except PoolExhausted as e:
+                    errors.append(e)
+
+            with pool.parsers():
+                worker = threading.Thread(target=work)
+                worker.start()
+                worker.join()
+
+            self.assertEqual(len(errors), 1, mode)
+            self.assertEqual(pool.parse("interface A { a: number; }").children[0].data, "int")
+
+    def test_instances_are_independent(self):
+        parsers = Parsers()
+
+        self.assertIsNot(parsers.earley.parser, tsParser.parser)
+
+        with ChartGuard(parsers.earley, None) as guard:
+            parsers.earley.parse("interface A { a: number; }")
+
+        self.assertGreater(guard.items, 0)
+        self.assertFalse(hasattr(tsParser.parser.parser, "predict_and_complete") and
+                         "predict_and_complete" in vars(tsParser.parser.parser))
+
+    def test_free_threaded(self):
+        pool = ParserPool(max_instances=2, mode="free_threaded", timeout=0)
+        acquired = []
+        errors = []
+
+        def work():
+            try:
+                with pool.parsers() as parsers:
+                    acquired.append(parsers)
+            except PoolExhausted as e:
+                errors.append(e)
+
+        # all instances are built up front
+        self.assertEqual(pool.created, 2)
+
+        with pool.parsers() as held:
+            # a thread whose preferred instance is taken uses the other one
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+
+            self.assertEqual(len(acquired), 1)
+            self.assertIsNot(acquired[0], held)
+
+            with pool.parsers() as other:
+                self.assertIsNot(other, held)
+                worker = threading.Thread(target=work)
+                worker.start()
+                worker.join()
+
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(pool.created, 2)
+
@@ -0,0 +1,82 @@
+import unittest
+from src import fastpath
+from src.parser import tsParser
+from src.positions import LineIndex
+from src.transformation import transform_declarations, transform_declarations_tolerant
+
+
+def spanned(text, span):
+    index = LineIndex(text)
+    line, column, end_line, end_column = span
+    return text[index.starts[line - 1] + column - 1:index.starts[end_line - 1] + end_column - 1]
+
+
+class TestPositions(unittest.TestCase):
+    def setUp(self):
+        self.idata = """import { B } from "./b";
+
+/** doc */
+export interface A extends B {
+    /** first */
+    readonly a?: number | string[]; // inline
+    [key: string]: { x: Array<string>; };
+    g: Array<Array<string>>
+}
+
+export function f(a: string): void {
+    call(a);
+}
+"""
+
+    def test_line_index(self):
+        index = LineIndex("ab\ncd\n\ne")
+
+        self.assertEqual(index.line_and_column(0), (1, 1))
+        self.assertEqual(index.line_and_column(2), (1, 3))
+        self.assertEqual(index.line_and_column(3), (2, 1))
+        self.assertEqual(index.line_and_column(7), (4, 1))
+        self.assertEqual(index.span(3, 5), [2, 1, 2, 3])
+
+    def test_spans(self):
+        declarations = transform_declarations(self.idata, positions=True)
+        interface = declarations[1]["A"]
+
+        self.assertEqual(spanned(self.idata, declarations[0]["@span"]), 'import { B } from "./b";')
+        self.assertTrue(spanned(self.idata, interface["@span"]).startswith("export interface A"))
+        self.assertEqual(spanned(self.idata, interface["a"]["@span"]), "a?: number | string[]")
+        self.assertEqual(spanned(self.idata, interface["key"]["@span"]), "[key: string]: { x: Array<string>; }")
+        self.assertEqual(spanned(self.idata, interface["g"]["@span"]), "g: Array<Array<string>>")
+        self.assertEqual(interface["g"]["@span"][:2], [8, 5])
+        self.assertEqual(spanned(self.idata, declarations[2]["@span"]), "export function f(a: string): void {\n    call(a);\n}")
+
+        # without positions, the output does not change
+        for declaration in transform_declarations(self.idata):
+            self.assertNotIn("@span", declaration)
+            self.assertNotIn("@span", declaration.get("A", {}))
+
+    def test_member_named_span(self):
+        idata = "interface A {\n    span: string;\n    b: number;\n}\n\nenum E { span = 1 }\n"
+        interface, enum = transform_declarations(idata, positions=True)
+
+        # the spans do not replace members or values named span
+        self.assertEqual(interface["A"]["span"]["type"], ["string"])
+        self.assertEqual(spanned(idata, interface["A"]["span"]["@span"]), "span: string")
+        self.assertTrue(spanned(idata, interface["A"]["@span"]).startswith("interface A"))
+        self.assertEqual(enum["span"], transform_declarations(idata)[1]["span"])
+        self.assertEqual(spanned(idata, enum["@span"]), "enum E { span = 1 }")
+
+    def test_tolerant_spans(self):
+        idata = self.idata.replace("call(a);", "call(a);\n}\n\nexport interface Broken {{")
+        declarations, errors = transform_declarations_tolerant(idata, positions=True)
+
+        self.assertEqual(spanned(idata, declarations[1]["A"]["a"]["@span"]), "a?: number | string[]")
+        self.assertEqual(declarations[1]["A"]["@span"], transform_declarations(self.idata, positions=True)[1]["A"]["@span"])
+        self.assertEqual(len(errors), 1)
+
+    def test_earley_spans(self):
+        spans = []
+        fastpath.parse(self.idata, spans=spans)
+
+        # the declarations found by the scanner span the same text as the ones of tsParser
+        self.assertEqual([(start, end) for offset, start, end in spans],
+                         [(child.meta.start_pos, child.meta.end_pos) for child in tsParser.parse(self.idata).children])
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.project import load_project, resolve_import
+
+
+class TestProject(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.main = self.write("main.ts", """
+            import { Message } from "./messages";
+            import * as lib from "./lib";
+            import { x } from "external";
+            export interface Request extends Message { id: number; }
+        """)
+        self.messages = self.write("messages.ts", """
+            import { Base } from "./lib/index";
+            export interface Message extends Base { body: string; }
+        """)
+        self.lib = self.write(os.path.join("lib", "index.ts"), """
+            import { Message } from "../messages";
+            export interface Base { sender: string; }
+        """)
+        self.types = self.write(os.path.join("lib", "types.d.ts"), "export interface T { t: number; }")
+        self.extra = self.write("extra.ts", """
+            import type { T } from './lib/types';
+            export interface Extra extends T { e: number; }
+        """)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, "w") as var:
+            var.write(content)
+
+        return path
+
+    def test_resolve_import(self):
+        self.assertEqual(resolve_import(self.main, "./messages"), self.messages)
+        self.assertEqual(resolve_import(self.main, "./messages.js"), self.messages)
+        self.assertEqual(resolve_import(self.main, "./lib"), self.lib)
+        self.assertEqual(resolve_import(self.main, "./lib/types"), self.types)
+        self.assertIsNone(resolve_import(self.main, "./missing"))
+        self.assertIsNone(resolve_import(self.main, "external"))
+
+    def test_load_project(self):
+        project = load_project([self.main], jobs=2)
+
+        self.assertEqual(project.failed(), [])
+        self.assertEqual(set(project.files), {self.main, self.messages, self.lib})
+        self.assertEqual(project.external[self.main], ["external"])
+        self.assertEqual(project.symbols, {"Request": self.main, "Message": self.messages, "Base": self.lib})
+        self.assertLess(project.order.index(self.messages), project.order.index(self.main))
+        self.assertEqual(list(project.resolver.flattened("Request")), ["sender", "body", "id"])
+        self.assertEqual(project.symbol("Base"), {"Base": {"sender": {"type": ["string"]}}})
+
+    def test_tolerant_imports(self):
+        # "import type" is not supported by the grammar, its file is only found in the tolerant mode
+        self.assertEqual(load_project([self.extra]).failed()[0]["file"], self.extra)
+
+        project = load_project([self.extra], tolerant=True)
+
+        self.assertEqual(project.order, [self.types, self.extra])
+        self.assertEqual(list(project.resolver.flattened("Extra")), ["t", "e"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from src.scanner import split_declarations
+from src.transformation import transform, transform_tolerant
+
+
+class TestRecovery(unittest.TestCase):
+    idata = """
+        /**
+         * A point
+         */
+        export interface Point {
+            x: number;
+        }
+
+        // not a declaration the grammar understands
+        const origin = { x: 0 };
+
+        interface Circle {
+            radius: number;
+        }
+        type Alias = Point;
+    """
+
+    def test_split_declarations(self):
+        spans = [self.idata[start:end] for start, end in split_declarations(self.idata)]
+
+        self.assertEqual(len(spans), 4)
+        self.assertTrue(spans[0].startswith("/**"))
+        self.assertTrue(spans[0].endswith("}"))
+        self.assertEqual(spans[1], "const origin = { x: 0 };")
+        self.assertEqual(spans[3], "type Alias = Point;")
+
+    def test_resync_at_declaration_keyword(self):
+        idata = """
+            type Alias = Point
+            /** doc */
+            interface A { a: number; }
+            const x = 1
+            export
+            interface B { b: string; }
+        """
+        spans = [idata[start:end] for start, end in split_declarations(idata)]
+
+        self.assertEqual(spans[0], "type Alias = Point")
+        self.assertTrue(spans[1].startswith("/** doc */"))
+        self.assertEqual(spans[2], "const x = 1")
+        self.assertTrue(spans[3].startswith("export\n"))
+
+        declarations, errors = transform_tolerant(idata)
+
+        self.assertEqual(len(declarations), 2)
+        self.assertEqual(len(errors), 2)
+
+    def test_braces_in_strings_and_comments(self):
+        idata = """
+            function f(): void { const s = "}"; /* } */ }
+            interface A { a: number; }
+        """
+        self.assertEqual(len(split_declarations(idata)), 2)
+
+    def test_tolerant_transform(self):
+        declarations, errors = transform_tolerant(self.idata)
+
+        self.assertEqual(len(declarations), 2)
+        self.assertIn('"Point"', declarations[0])
+        self.assertIn('"Circle"', declarations[1])
+
+        self.assertEqual([(e["line"], e["column"]) for e in errors], [(10, 9), (15, 9)])
+        self.assertEqual(self.idata[errors[1]["start"]:errors[1]["end"]], "type Alias = Point;")
+        self.assertEqual(errors[0]["reason"], "No terminal defined for 'c'")
+
+    def test_clean_input_matches_strict_mode(self):
+        idata = """
+            interface A extends B {
+                a?: string | number; // inline
+            }
+            enum E { A = 1 }
+        """
+        self.assertEqual(transform_tolerant(idata), (transform(idata), []))
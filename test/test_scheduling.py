@@ -0,0 +1,76 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.scheduling import TimingDatabase, format_efficiency, lpt_order, makespan, parallel_efficiency, prescan
+
+
+class TestScheduling(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "timings.json")
+        self.files = {
+            "interfaces.ts": "/** doc */\nexport interface A { a: string; }\n" * 20,
+            "class.ts": "export class C {\n" + "    public m(a: string): void { call(a); }\n" * 5 + "}\n",
+            "small.ts": "import { A } from \"./a\";\n"
+        }
+
+        for name, content in self.files.items():
+            with open(os.path.join(self.directory, name), "w") as var:
+                var.write(content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def estimates(self, timings):
+        return {name: timings.estimate(name, os.path.join(self.directory, name)) for name in sorted(self.files)}
+
+    def test_prescan(self):
+        constructs = prescan(self.files["interfaces.ts"] + self.files["class.ts"] + "declare const x: number;")
+
+        self.assertEqual(sorted(constructs), ["class", "interface", "other"])
+        # comments and whitespace between the statements are not counted
+        self.assertEqual(constructs["interface"], 20 * len("export interface A { a: string; }"))
+
+    def test_estimates_and_order(self):
+        timings = TimingDatabase(self.path)
+        estimates = self.estimates(timings)
+
+        # the class is much smaller, but has to be parsed by the Earley parser
+        self.assertGreater(len(self.files["interfaces.ts"]), len(self.files["class.ts"]))
+        self.assertEqual(lpt_order(sorted(self.files), estimates), ["class.ts", "interfaces.ts", "small.ts"])
+
+        timings.record("interfaces.ts", 2.0)
+        timings.record("class.ts", 1.0)
+        timings.save()
+
+        with open(os.path.join(self.directory, "interfaces.ts"), "a") as var:
+            var.write(self.files["interfaces.ts"])
+
+        timings = TimingDatabase(self.path)
+        estimates = self.estimates(timings)
+
+        # the recorded durations, scaled by the size of the file
+        self.assertAlmostEqual(estimates["interfaces.ts"], 4.0)
+        self.assertAlmostEqual(estimates["class.ts"], 1.0)
+        self.assertEqual(lpt_order(sorted(self.files), estimates), ["interfaces.ts", "class.ts", "small.ts"])
+        # unseen files are scaled by how the recorded files compared to their estimate
+        self.assertGreater(timings.scale(), 1.0)
+
+        with open(self.path, "w") as var:
+            var.write("{")
+
+        self.assertEqual(TimingDatabase(self.path).files, {})
+
+    def test_efficiency(self):
+        given = [1.0, 1.0, 1.0, 3.0]
+        scheduled = sorted(given, reverse=True)
+
+        self.assertEqual(makespan(given, 2), 4.0)
+        self.assertEqual(makespan(scheduled, 2), 3.0)
+        self.assertEqual(makespan(given, 8), 3.0)
+        self.assertAlmostEqual(parallel_efficiency(scheduled, 2, 3.0), 1.0)
+        self.assertAlmostEqual(parallel_efficiency(given, 2, 4.0), 0.75)
+        self.assertEqual(format_efficiency(scheduled, 2, 3.0, given),
+                         "parallel efficiency 100% (6.00s of parsing in 3.00s on 2 workers), "
+                         "3.00s expected in this order and 4.00s in the given order")
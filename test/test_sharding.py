@@ -0,0 +1,83 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.sharding import ShardError, parse_shard, select_shard, shard_by_size, write_partial_manifest, merge_manifests
+
+
+class TestSharding(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = []
+
+        for i in range(40):
+            path = os.path.join(self.directory, "f{}.ts".format(i))
+
+            with open(path, "w") as var:
+                var.write("x" * (i * i + 1))
+
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+
+        for spec in ["4/4", "-1/2", "1", "a/b", "0/0"]:
+            with self.assertRaises(ShardError):
+                parse_shard(spec)
+
+    def test_partition(self):
+        for strategy in ["hash", "size"]:
+            shards = [select_shard(self.paths + self.paths[:3], i, 3, strategy) for i in range(3)]
+
+            self.assertEqual(sorted(sum(shards, [])), sorted(self.paths))
+            # the assignment does not depend on the order of the input
+            self.assertEqual(select_shard(list(reversed(self.paths)), 1, 3, strategy), list(reversed(shards[1])))
+
+    def test_size_balance(self):
+        loads = [sum(os.path.getsize(p) for p in shard) for shard in shard_by_size(self.paths, 4)]
+
+        self.assertLess(max(loads) - min(loads), max(os.path.getsize(p) for p in self.paths))
+
+    def test_merge(self):
+        write_partial_manifest(self.directory, 0, 2, "size", 3, {"a.ts": {"status": "ok"}, "b.ts": {"status": "ok"}})
+
+        with self.assertRaisesRegex(ShardError, "Missing shards 1"):
+            merge_manifests(self.directory)
+
+        write_partial_manifest(self.directory, 1, 2, "size", 3, {"b.ts": {"status": "ok"}})
+
+        with self.assertRaisesRegex(ShardError, "b.ts was processed by shards 0 and 1"):
+            merge_manifests(self.directory)
+
+        write_partial_manifest(self.directory, 1, 2, "size", 3, {"c.ts": {"status": "error"}})
+        manifest = merge_manifests(self.directory)
+
+        self.assertEqual(manifest["files"]["c.ts"], {"status": "error", "shard": 1})
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, "manifest.json")))
+
+    def test_shard_count_change(self):
+        for i in range(2):
+            write_partial_manifest(self.directory, i, 2, "size", 2, {"f{}.ts".format(i): {"status": "ok"}})
+
+        stale = ["declarations.shard-1-of-2.jsonl", "declarations.shard-1-of-2.jsonl.idx", ".ts_interface_parser.json.shard-0-of-2"]
+
+        for name in stale:
+            open(os.path.join(self.directory, name), "w").close()
+
+        for i in range(3):
+            write_partial_manifest(self.directory, i, 3, "size", 3, {"f{}.ts".format(i): {"status": "ok"}})
+
+        # the files of the run with 2 shards are gone, the ones of the new run are merged
+        self.assertEqual(merge_manifests(self.directory)["count"], 3)
+
+        for name in stale + ["manifest.shard-0-of-2.json", "manifest.shard-1-of-2.json"]:
+            self.assertFalse(os.path.exists(os.path.join(self.directory, name)))
+
+        self.assertTrue(os.path.isfile(os.path.join(self.directory, "f0.ts")))
+
+
+if __name__ == '__main__':
+    unittest.main()
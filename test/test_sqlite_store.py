@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.sqlite_store import DeclarationStore, type_names
+from src.transformation import transform_declarations
+
+
+class TestSqliteStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = DeclarationStore(os.path.join(self.directory, "declarations.db"))
+        self.store.update_files([
+            ("a.ts", "1", transform_declarations("""
+                import { Message } from "./b";
+                interface Request extends Message { id: number; payload: { m: Message[]; }; }
+                namespace N { interface Inner { m?: Message | null; } }
+            """)),
+            ("b.ts", "1", transform_declarations("""
+                interface Message { body: string; send(to: Address): void; }
+                interface Address { [key: string]: string; }
+            """))
+        ])
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def test_type_names(self):
+        self.assertEqual(type_names(["string", "[]", "Message[]", "null"]), ["string", "Message", "null"])
+        self.assertEqual(type_names({"a": {"type": ["A"]}, "b": {"type": ["B", "[]"]}}), ["A", "B"])
+
+    def test_queries(self):
+        self.assertEqual(self.store.interfaces_using("Message"),
+                         [("a.ts", "Request", None), ("a.ts", "Request", "payload"), ("a.ts", "Inner", "m")])
+        self.assertEqual(self.store.interfaces_using("Message", ["member"]),
+                         [("a.ts", "Request", "payload"), ("a.ts", "Inner", "m")])
+        self.assertEqual(self.store.interfaces_using("Address"), [("b.ts", "Message", "send")])
+
+        path, namespace, declaration = self.store.declarations_named("Inner", "interface")[0]
+        self.assertEqual((path, namespace), ("a.ts", "N"))
+        self.assertEqual(declaration, {"Inner": {"m": {"optional": True, "type": ["Message", "null"]}}})
+
+    def test_update(self):
+        self.assertTrue(self.store.is_current("a.ts", "1"))
+        self.assertEqual(self.store.update_file("b.ts", "1", []), None)
+        self.assertEqual(len(self.store.declarations_named("Message")), 1)
+
+        updated = self.store.update_files([("a.ts", "1", []), ("b.ts", "2", transform_declarations("interface Other { m: Message; }"))])
+
+        self.assertEqual(updated, 1)
+        self.assertEqual(self.store.declarations_named("Message"), [])
+        self.assertEqual([r[1] for r in self.store.interfaces_using("Message")], ["Request", "Request", "Inner", "Other"])
+
+        self.store.remove_file("a.ts")
+        self.assertEqual(self.store.interfaces_using("Message"), [("b.ts", "Other", "m")])
+        self.assertEqual(self.store.connection.execute("SELECT COUNT(*) FROM members").fetchone()[0], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from src import fastpath
+from src.parser import tsParser
+from src.stress import CONSTRUCTS, fit_exponent, run_stress, scale
+
+
+class TestStress(unittest.TestCase):
+    def test_fit_exponent(self):
+        sizes = [100, 200, 400, 800]
+
+        self.assertAlmostEqual(fit_exponent(sizes, [3e-6 * s ** 2 for s in sizes]), 2.0)
+        self.assertAlmostEqual(fit_exponent(sizes, [5e-3 * s for s in sizes]), 1.0)
+        self.assertIsNone(fit_exponent([100], [1.0]))
+
+        # parses dominated by constant costs are ignored
+        self.assertAlmostEqual(fit_exponent(sizes, [1e-4, 1e-4, 4.0, 16.0], 0.001), 2.0)
+
+    def test_constructs_are_valid(self):
+        for name, construct in sorted(CONSTRUCTS.items()):
+            text = construct(4)
+
+            self.assertEqual(fastpath.parse(text).children[0].data, tsParser.parse(text).children[0].data, name)
+            self.assertGreater(len(construct(8)), len(text))
+
+    def test_flagging(self):
+        calls = []
+
+        def parse(text):
+            calls.append(text)
+
+        result = scale("long_enum", parse, start=4, steps=3, repeat=1)
+
+        self.assertEqual(len(result["sizes"]), 3)
+        self.assertEqual([len(text) for text in calls], result["sizes"])
+
+        results = run_stress(["long_enum"], "lalr", threshold=-1, start=4, steps=3, repeat=1)
+
+        self.assertEqual([r["construct"] for r in results], ["long_enum"])
+        self.assertTrue(results[0]["flagged"])
@@ -0,0 +1,112 @@
+import os
+import shutil
+import tempfile
+import unittest
+from src.transformation import transform_declarations
+from src.validators import Validators, ValidationError, generate_source, validate
+
+
+INTERFACES = """
+export interface Message extends Envelope {
+    readonly id: number;
+    kind: "request" | "response";
+    tags?: string[];
+    payload: { name: string; args: Array<string>; };
+    [key: string]: any;
+    send(to: string): void;
+}
+
+interface Envelope {
+    sender: string | null;
+    sent?: Date;
+}
+
+interface Table {
+    [row: number]: Envelope;
+}
+"""
+
+VALID = {
+    "id": 1,
+    "kind": "request",
+    "sender": None,
+    "payload": {"name": "n", "args": ["a", "b"]},
+    "extra": [1, 2]
+}
+
+
+class TestValidators(unittest.TestCase):
+    def setUp(self):
+        self.declarations = transform_declarations(INTERFACES)
+        self.validators = Validators(self.declarations)
+
+    def assertAgree(self, name, value, valid):
+        self.assertEqual(self.validators.is_valid(name, value), valid, value)
+
+        if valid:
+            self.validators[name](value)
+            validate(self.declarations, name, value)
+        else:
+            with self.assertRaises(ValidationError):
+                self.validators[name](value)
+            with self.assertRaises(ValidationError):
+                validate(self.declarations, name, value)
+
+    def test_valid_payloads(self):
+        self.assertAgree("Message", VALID, True)
+        self.assertAgree("Message", dict(VALID, tags=[], sent="2020-01-01", sender="me"), True)
+        self.assertAgree("Envelope", {"sender": "me"}, True)
+        self.assertAgree("Table", {"1": {"sender": None}, "20": {"sender": "x"}}, True)
+
+    def test_invalid_payloads(self):
+        self.assertAgree("Message", [], False)
+        self.assertAgree("Message", dict(VALID, id="1"), False)
+        self.assertAgree("Message", dict(VALID, id=True), False)
+        self.assertAgree("Message", dict(VALID, kind="other"), False)
+        self.assertAgree("Message", dict(VALID, tags=["a", 1]), False)
+        self.assertAgree("Message", dict(VALID, payload={"name": "n", "args": "a"}), False)
+        self.assertAgree("Message", {k: v for k, v in VALID.items() if k != "sender"}, False)
+        self.assertAgree("Table", {"row": {"sender": None}}, False)
+        self.assertAgree("Table", {"1": {}}, False)
+
+    def test_generics(self):
+        self.declarations = transform_declarations(
+            "interface G { r: Record<string, string>; m: Map<string, number>; p?: Promise<number>; a: Array<string>; }")
+        self.validators = Validators(self.declarations)
+
+        # the type arguments are not part of the output, but generics are no arrays
+        self.assertAgree("G", {"r": {"x": "y"}, "m": {"a": 1}, "p": 1, "a": ["x"]}, True)
+        self.assertAgree("G", {"r": {}, "m": {}, "a": []}, True)
+        self.assertAgree("G", {"r": [], "m": {}, "a": []}, False)
+        self.assertAgree("G", {"r": {}, "m": [], "a": []}, False)
+        self.assertAgree("G", {"r": {}, "m": {}, "a": {}}, False)
+
+    def test_error_names_the_path(self):
+        with self.assertRaises(ValidationError) as context:
+            self.validators["Message"](dict(VALID, payload={"name": 1, "args": []}))
+
+        self.assertIn("Message.payload.name", str(context.exception))
+
+    def test_cached_validators(self):
+        cache_dir = tempfile.mkdtemp()
+
+        try:
+            first = Validators(self.declarations, cache_dir)
+            files = [f for f in os.listdir(cache_dir) if f.endswith(".py")]
+            second = Validators(self.declarations, cache_dir)
+
+            self.assertEqual(len(files), 1)
+            self.assertEqual([f for f in os.listdir(cache_dir) if f.endswith(".py")], files)
+            with open(os.path.join(cache_dir, files[0])) as var:
+                self.assertEqual(var.read(), generate_source(self.declarations))
+            self.assertTrue(first.is_valid("Message", VALID))
+            self.assertTrue(second.is_valid("Message", VALID))
+
+            Validators(transform_declarations("interface A { a: number; }"), cache_dir)
+            self.assertEqual(len([f for f in os.listdir(cache_dir) if f.endswith(".py")]), 2)
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,22 +3,447 @@
 
 import os
 import sys
+import glob
+import json
+import time
 import argparse
 
-from src.transformation import transform
+from src.batch import ParseHandler, format_output, read_source, run_batch
+from src.project import load_project
+from src.sqlite_store import DeclarationStore, file_hash
+from src.memory import MemoryProfiler, format_report, profile_source
+from src.pipeline import Pipeline
+from src.scheduling import TIMINGS, TimingDatabase, format_efficiency, lpt_order
+from src.incremental import MANIFEST, OutputManifest, declaration_keys
+from src.output import FORMATS, JsonlOutput, merge_archives, write_atomic
+from src.sharding import ShardError, STRATEGIES, parse_shard, select_shard, write_partial_manifest, merge_manifests
+from src.transformation import transform, transform_tolerant
+from src.util import format_json
+
+
+def report(result):
+    """
+    Writes the skipped declarations and the failure of a file to stderr.
+
+    Returns:
+    bool: True if the file failed.
+    """
+    for error in result["errors"]:
+        sys.stderr.write("{}:{}:{}: {}\n".format(result["file"], error["line"], error["column"], error["reason"]))
+
+    if result["status"] == "ok":
+        return False
+
+    sys.stderr.write("{}: {} after {:.2f}s: {} (size: {}, chart items: {})\n".format(
+        result["file"], result["status"], result["duration"], result["reason"], result["size"], result["chart_items"]))
+    return True
+
+
+def open_output(args, shard=None):
+    """
+    Returns the writer of the output format, see src.output.
+    """
+    if args.format == "jsonl" and shard is not None:
+        return JsonlOutput(args.output_dir, args.durable, "declarations.shard-{}-of-{}.jsonl".format(*shard[:2]))
+
+    return FORMATS[args.format](args.output_dir, args.durable)
+
+
+def output_keys(formatted_jsons):
+    return declaration_keys([json.loads(j) for j in formatted_jsons])
+
+
+def input_root(paths):
+    return os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in paths])
+
+
+def batch(args, root=None, shard=None):
+    """
+    Processes several files in worker processes and reports every file that failed.
+
+    The declarations are written to the output directory in the chosen format (see
+    src.output) if one is given and printed otherwise. If the files are one shard
+    (index, count, strategy, number of files of all shards) of a larger batch, a
+    partial manifest of the shard is written as well.
+
+    Unless args.force is set, an output directory keeps a manifest of the previous
+    runs: unchanged files are skipped, outputs are only rewritten if a declaration was
+    added, changed or removed, and the delta is reported on stderr.
+
+    The files expected to take longest are started first, see src.scheduling. The
+    durations are kept in args.timings or the output directory for the next runs, and
+    the parallel efficiency of the batch is reported on stderr.
+
+    The files are read, parsed, recorded in the manifest and written by the stages of a
+    pipeline (see src.pipeline): args.readers threads read the next files while
+    args.jobs worker processes parse, and args.writers threads write the outputs. The
+    utilization of every stage is reported on stderr.
+
+    Returns:
+    int: The exit code, 1 if any file failed.
+    """
+    root = root or input_root(args.file)
+    failed = 0
+    printed = {}
+    entries = {}
+    sources = {path: os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/") for path in args.file}
+    paths = args.file
+    manifest = None
+    writer = None
+    hashes = {}
+    # sources whose output is missing or incomplete, e.g. deleted by hand, are written in full
+    missing = set()
+    totals = {"added": 0, "changed": 0, "removed": 0, "written": 0}
+
+    try:
+        if args.output_dir:
+            manifest = OutputManifest(args.output_dir, MANIFEST if shard is None else "{}.shard-{}-of-{}".format(MANIFEST, *shard[:2]),
+                                      {"tolerant": args.tolerant, "positions": args.positions})
+            writer = open_output(args, shard)
+
+            if not args.force:
+                hashes = {path: file_hash(path) for path in paths}
+                missing = {sources[path] for path in paths
+                           if not writer.has(sources[path], list(manifest.files.get(sources[path], {}).get("declarations", [])))}
+                paths = [path for path in paths if not (manifest.is_current(sources[path], hashes[path], writer.location(sources[path]))
+                                                        and sources[path] not in missing)]
+
+            for path in args.file:
+                if path not in paths:
+                    writer.keep(sources[path])
+                    entry = manifest.files[sources[path]]
+                    entries[sources[path]] = {"status": "ok", "reason": None, "declarations": len(entry["declarations"]), "output": entry["output"]}
+
+            for source in set(manifest.files).difference(sources.values()):
+                if not os.path.isfile(os.path.join(root, source)):
+                    writer.remove(source)
+                    removed = manifest.remove(source)
+                    totals["removed"] += len(removed)
+                    sys.stderr.write("{}: removed, -{}\n".format(source, len(removed)))
+
+        timings_path = args.timings
+
+        if timings_path is None and args.output_dir:
+            timings_path = os.path.join(args.output_dir, TIMINGS if shard is None else "{}.shard-{}-of-{}".format(TIMINGS, *shard[:2]))
+
+        timings = TimingDatabase(timings_path)
+        estimates = {path: timings.estimate(sources[path], path) for path in paths}
+        unscheduled = paths
+        paths = lpt_order(paths, estimates)
+        durations = {}
+        jobs = args.jobs or os.cpu_count() or 1
+
+        def read(path):
+            task = read_source(path)
+
+            if writer is not None:
+                # the manifest records the content that is parsed, even if the file changed
+                # since it was compared to the manifest
+                hashes[path] = task["hash"]
+
+            return task
+
+        def update(result):
+            # the manifest is not thread-safe, this stage has a single thread
+            if result["status"] == "ok":
+                source = sources[result["file"]]
+                result["output"] = writer.location(source)
+                result["delta"] = manifest.update(source, hashes[result["file"]], result["output"], result["declarations"])
+
+                if source in missing:
+                    result["delta"]["written"] = result["delta"]["rewrite"] = True
+
+            return result
+
+        def write(result):
+            source = sources[result["file"]]
+
+            if result["status"] != "ok":
+                if writer.has(source):
+                    # the last good output of the file is kept until the file parses again
+                    writer.keep(source)
+            else:
+                writer.write(source, result["declarations"], output_keys(result["declarations"]), None if args.force else result["delta"])
+
+            return result
+
+        pipeline = Pipeline(capacity=2 * jobs)
+        pipeline.stage("read", read, workers=args.readers)
+        pipeline.stage("parse", workers=max(1, min(jobs, len(paths))), make_handler=lambda: ParseHandler(
+            args.timeout, args.memory_limit, args.max_chart_items, args.tolerant, args.positions))
+
+        if writer is not None:
+            pipeline.stage("manifest", update)
+            pipeline.stage("write", write, workers=args.writers if writer.parallel_writes else 1)
+
+        started = time.time()
+
+        for result in pipeline.run(paths):
+            source = sources[result["file"]]
+            durations[result["file"]] = result["duration"] or 0.0
+            timings.record(source, result["duration"])
+            entry = {"status": result["status"], "reason": result["reason"], "declarations": len(result["declarations"]), "output": None}
+            entries[source] = entry
+
+            if report(result):
+                failed += 1
+            elif writer is None:
+                printed[result["file"]] = result["declarations"]
+            else:
+                entry["output"] = result["output"]
+                delta = result["delta"]
+
+                for key in totals:
+                    totals[key] += len(delta[key]) if key != "written" else delta[key]
+
+                if delta["added"] or delta["changed"] or delta["removed"]:
+                    sys.stderr.write("{}: {}\n".format(source, ", ".join(
+                        ["+" + k for k in delta["added"]] + ["~" + k for k in delta["changed"]] + ["-" + k for k in delta["removed"]])))
+
+        wall = time.time() - started
+        timings.save()
+
+        if paths:
+            sys.stderr.write(format_efficiency([durations[path] for path in paths], jobs, wall,
+                                               [durations[path] for path in unscheduled]) + "\n")
+            sys.stderr.write(pipeline.format_utilization() + "\n")
+
+        for path in args.file:
+            if path in printed:
+                print("// {}".format(path))
+                print(format_output(printed[path]))
+
+        if writer is not None:
+            writer.close()
+    except BaseException:
+        # the temporary files of an unfinished output are removed, the last complete
+        # output stays in place
+        if writer is not None:
+            writer.abort()
+
+        raise
+
+    if writer is not None:
+        manifest.save()
+        sys.stderr.write("{} unchanged files skipped, {} outputs written, {} declarations added, {} changed, {} removed\n".format(
+            len(args.file) - len(paths), totals["written"], totals["added"], totals["changed"], totals["removed"]))
+
+    if shard is not None:
+        write_partial_manifest(args.output_dir, *shard, files=entries)
+
+    sys.stderr.write("{} files processed, {} failed\n".format(len(paths), failed))
+    return 1 if failed else 0
+
+
+def merge(argv):
+    """
+    The merge subcommand, combines the partial manifests of all shards of a batch.
+
+    Returns:
+    int: The exit code, 1 if the shards are incomplete or any file failed.
+    """
+    parser = argparse.ArgumentParser(prog="ts_interface_parser.py merge", description="Merge the partial manifests of a sharded batch")
+    parser.add_argument('output', help="The output directory shared by all shards")
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = merge_manifests(args.output)
+    except ShardError as e:
+        sys.stderr.write("{}\n".format(e))
+        return 1
+
+    archives = sorted(glob.glob(os.path.join(args.output, "declarations.shard-*-of-{}.jsonl".format(manifest["count"]))))
+
+    if archives:
+        merge_archives(args.output, archives)
+
+    failed = sorted(path for path, entry in manifest["files"].items() if entry["status"] != "ok")
+
+    for path in failed:
+        entry = manifest["files"][path]
+        sys.stderr.write("{}: {} in shard {}: {}\n".format(path, entry["status"], entry["shard"], entry["reason"]))
+
+    sys.stderr.write("{} shards merged, {} files, {} failed\n".format(manifest["count"], manifest["total"], len(failed)))
+    return 1 if failed else 0
+
+
+def project(args):
+    """
+    Processes the given entry files and every local file they (indirectly) import.
+
+    The output is the same as for a batch, in dependency order. Names declared by
+    several files and unresolved imports are reported on stderr.
+
+    Returns:
+    int: The exit code, 1 if any file failed.
+    """
+    loaded = load_project(args.file, args.jobs, args.timeout, args.memory_limit, args.max_chart_items, args.tolerant)
+    root = input_root(loaded.order)
+    writer = open_output(args) if args.output_dir else None
+    failed = 0
+
+    for path in loaded.order:
+        result = loaded.files[path]
+
+        if report(result):
+            failed += 1
+            continue
+
+        formatted_jsons = [format_json(declaration) for declaration in result["declarations"]]
+
+        if writer is not None:
+            source = os.path.relpath(os.path.abspath(path), root).replace(os.sep, "/")
+            writer.write(source, formatted_jsons, output_keys(formatted_jsons))
+        else:
+            print("// {}".format(path))
+            print(format_output(formatted_jsons))
+
+    if writer is not None:
+        writer.close()
+
+    for path in loaded.order:
+        for specifier in loaded.external[path]:
+            if specifier.startswith("."):
+                sys.stderr.write("{}: can not resolve import {}\n".format(path, specifier))
+
+    for name, paths in loaded.duplicates.items():
+        sys.stderr.write("{} is declared in {}\n".format(name, ", ".join(paths)))
+
+    sys.stderr.write("{} files processed, {} failed, {} symbols\n".format(len(loaded.order), failed, len(loaded.symbols)))
+    return 1 if failed else 0
+
+
+def sqlite(args):
+    """
+    Stores the declarations of the files (or of the project) in a SQLite database.
+
+    Outside of the project mode, files whose content did not change since they were
+    stored are not parsed again.
+
+    Returns:
+    int: The exit code, 1 if any file failed.
+    """
+    with DeclarationStore(args.sqlite) as store:
+        hashes = {path: file_hash(path) for path in args.file}
+
+        if args.project:
+            loaded = load_project(args.file, args.jobs, args.timeout, args.memory_limit, args.max_chart_items, args.tolerant)
+            results = [loaded.files[path] for path in loaded.order]
+            hashes = {path: file_hash(path) for path in loaded.order}
+        else:
+            stored = store.hashes()
+            changed = [path for path in args.file if stored.get(os.path.abspath(path)) != hashes[path]]
+            results = run_batch(changed, args.jobs, args.timeout, args.memory_limit, args.max_chart_items, args.tolerant, args.positions)
+
+            for result in results:
+                result["declarations"] = [json.loads(declaration) for declaration in result["declarations"]]
+
+        failed = [result for result in results if report(result)]
+        updated = store.update_files((os.path.abspath(result["file"]), hashes[result["file"]], result["declarations"])
+                                     for result in results if result["status"] == "ok")
+
+    sys.stderr.write("{} files, {} updated, {} failed\n".format(len(hashes), updated, len(failed)))
+    return 1 if failed else 0
+
+
+def profile_memory(args):
+    """
+    Parses and transforms the files one after another in this process and reports the
+    peak and retained memory of every stage per file, the largest allocation sites and
+    the RSS of the process on stderr. The declarations are printed as for a batch.
+
+    Returns:
+    int: The exit code, 1 if any file failed.
+    """
+    failed = 0
+
+    with MemoryProfiler(top=args.profile_top) as profiler:
+        for path in args.file:
+            with open(path, "r") as var:
+                content = var.read()
+
+            try:
+                declarations = profile_source(profiler, content, path)
+            except Exception as e:
+                sys.stderr.write("{}: {}\n".format(path, str(e).strip().split("\n")[0]))
+                failed += 1
+                continue
+
+            print("// {}".format(path))
+            print(format_output([format_json(declaration) for declaration in declarations]))
+
+    sys.stderr.write(format_report(profiler.records, args.profile_top) + "\n")
+    return 1 if failed else 0
+
 
 if __name__ == "__main__":
+    if sys.argv[1:2] == ["merge"]:
+        sys.exit(merge(sys.argv[2:]))
+
     parser = argparse.ArgumentParser(description="Typescript Interface Parser")
-    parser.add_argument('file', metavar='file', type=str, help='The path to the file that ONLY contains the typescript interface')
+    parser.add_argument('file', metavar='file', type=str, nargs='+', help='The path to the file that ONLY contains the typescript interface. Several files are processed as a batch')
     parser.add_argument('-p', '--parse_tree', action='store_true', help="Pretty print the parse tree")
-    parser.add_argument('-o', '--output', default=False, help="Write the json to an output file")
+    parser.add_argument('-o', '--output', default=False, help="Write the json of a single file to this output file")
+    parser.add_argument('--output-dir', default=None, help="Write the outputs of a batch (or project) to this directory, also processes a single file as a batch")
+    parser.add_argument('-t', '--tolerant', action='store_true', help="Skip declarations that can not be parsed and report them on stderr")
+    parser.add_argument('--positions', action='store_true', help="Add the span (line, column, end line, end column) of every declaration and member to the output")
+    parser.add_argument('--project', action='store_true', help="Treat the files as entry points and also process all local files they import")
+    parser.add_argument('--sqlite', default=None, help="Store the declarations in this SQLite database, unchanged files are skipped")
+    parser.add_argument('--format', choices=sorted(FORMATS), default="json", help="Output format of a batch: one JSON file per input (default), one JSON file per declaration or a single JSON lines archive")
+    parser.add_argument('--durable', action='store_true', help="Flush the outputs of a batch to disk before they are renamed into place")
+    parser.add_argument('--force', action='store_true', help="Process all files of a batch and rewrite all outputs, even if they did not change since the last run")
+    parser.add_argument('--shard', default=None, help="Only process the shard INDEX/COUNT (INDEX from 0) of the files and write its partial manifest to the output directory")
+    parser.add_argument('--shard-strategy', choices=sorted(STRATEGIES), default="size", help="Balance the shards by file size or assign files by a hash of their path (default: size)")
+    parser.add_argument('--profile-memory', action='store_true', help="Process the files in this process and report the memory of every parse and transform stage and its largest allocation sites on stderr")
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N', help="Number of allocation sites reported by --profile-memory (default: 10)")
+    parser.add_argument('--timings', default=None, help="Keep the parse durations of a batch in this file, to start the files expected to take longest first (default: in the output directory)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="Number of worker processes of a batch (default: number of CPUs)")
+    parser.add_argument('--readers', type=int, default=2, help="Number of threads of a batch that read the files ahead of the worker processes (default: 2)")
+    parser.add_argument('--writers', type=int, default=2, help="Number of threads of a batch that write the outputs, if the output format allows it (default: 2)")
+    parser.add_argument('--timeout', type=float, default=None, help="Per-file wall-clock limit of a batch in seconds")
+    parser.add_argument('--memory-limit', type=float, default=None, help="Per-worker memory limit of a batch in megabytes")
+    parser.add_argument('--max-chart-items', type=int, default=None, help="Abort a file of a batch once the Earley chart exceeds this number of items")
 
     args = parser.parse_args()
 
-    if not os.path.isfile(args.file):
-        print("File {} does not exists".format(args.file))
-        sys.exit(0)
+    for file in args.file:
+        if not os.path.isfile(file):
+            print("File {} does not exists".format(file))
+            sys.exit(0)
+
+    batch_mode = (len(args.file) > 1 or args.output_dir or args.shard or args.project or args.jobs or args.timeout or
+                  args.memory_limit or args.max_chart_items)
+
+    if args.output and batch_mode:
+        parser.error("-o writes the output of a single file, use --output-dir for a batch")
+
+    if args.profile_memory:
+        sys.exit(profile_memory(args))
+
+    if args.sqlite:
+        sys.exit(sqlite(args))
+
+    if args.project:
+        sys.exit(project(args))
 
+    if args.shard:
+        if not args.output_dir:
+            parser.error("--shard requires an output directory (--output-dir)")
+
+        try:
+            index, count = parse_shard(args.shard)
+        except ShardError as e:
+            parser.error(str(e))
+
+        root = input_root(args.file)
+        total = len(set(args.file))
+        args.file = select_shard(args.file, index, count, args.shard_strategy)
+        sys.exit(batch(args, root, (index, count, args.shard_strategy, total)))
+
+    if batch_mode:
+        sys.exit(batch(args))
+
+    args.file = args.file[0]
     content = None
 
     with open(args.file, "r") as var:
@@ -28,10 +453,15 @@ if __name__ == "__main__":
         print("File is empty")
         sys.exit(0)
 
-    formatted_output = transform(content, args.parse_tree)
+    if args.tolerant:
+        formatted_output, errors = transform_tolerant(content, args.parse_tree, positions=args.positions)
+
+        for error in errors:
+            sys.stderr.write("{}:{}:{}: {}\n".format(args.file, error["line"], error["column"], error["reason"]))
+    else:
+        formatted_output = transform(content, args.parse_tree, positions=args.positions)
 
     if not args.output:
         print(formatted_output)
     else:
-        with open(args.output, "w") as var:
-            var.write(formatted_output)
+        write_atomic(args.output, format_output(formatted_output))